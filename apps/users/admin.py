@@ -1,5 +1,123 @@
 from django.contrib import admin
-from django.contrib.auth.admin import UserAdmin
-from .models import User
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import User, UserProfile, Address, MarketingSegment, ShippingZone, ShippingZoneRule
+from .paginators import EstimatedCountPaginator, primary_ordering
+from .search import get_search_backend
+from .sharding import enabled, fanout, shard_for
 
-admin.site.register(User, UserAdmin)
\ No newline at end of file
+class UserProfileInline(admin.StackedInline):
+    model = UserProfile
+    can_delete = False
+    extra = 0
+    fields = ('avatar', 'bio', 'website')
+
+class ShardedChangeList(ChangeList):
+    """Changelist whose rows are merged from every user shard (see sharding.fanout)"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        if enabled() and isinstance(self.result_list, QuerySet):
+            # Short lists skip the paginator and come back as the queryset of one database.
+            self.result_list = list(fanout(self.result_list, primary_ordering(self.result_list)))
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    list_display = (
+        'email', 'username', 'first_name', 'last_name',
+        'is_staff', 'is_verified', 'accepts_marketing', 'date_joined'
+    )
+    # Only columns of users_user: no joins or DISTINCT queries over related tables.
+    list_filter = ('is_staff', 'is_active', 'is_verified', 'accepts_marketing', 'date_joined')
+    # Documents what the search box matches: the columns of the search index
+    # (search.SEARCH_COLUMNS), queried in get_search_results().
+    search_fields = (
+        'username', 'first_name', 'last_name', 'email', 'phone',
+        'addresses__city', 'addresses__postal_code',
+    )
+    ordering = ('-date_joined',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    search_results_limit = 1000
+    inlines = (UserProfileInline,)
+    # Addresses are unbounded: the change form links to their filtered changelist instead of an inline.
+    readonly_fields = ('address_list',)
+
+    def get_fieldsets(self, request, obj=None):
+        fieldsets = super().get_fieldsets(request, obj)
+        if obj is None:
+            return fieldsets
+        return (*fieldsets, ('Addresses', {'fields': ('address_list',)}))
+
+    @admin.display(description='Addresses')
+    def address_list(self, obj):
+        count = obj.addresses.count()
+        url = reverse('admin:users_address_changelist')
+        return format_html('<a href="{}?user__id__exact={}">{} address(es)</a>', url, obj.pk, count)
+
+    def get_changelist(self, request, **kwargs):
+        return ShardedChangeList
+
+    def get_object(self, request, object_id, from_field=None):
+        """Users are read from the shard of their id"""
+        if from_field is not None:
+            return super().get_object(request, object_id, from_field)
+        try:
+            object_id = User._meta.pk.to_python(object_id)
+        except ValidationError:
+            return None
+        return self.get_queryset(request).using(shard_for(object_id)).filter(pk=object_id).first()
+
+    def get_formset_kwargs(self, request, obj, inline, prefix):
+        kwargs = super().get_formset_kwargs(request, obj, inline, prefix)
+        if obj is not None and obj._state.db:
+            # Inline rows (the profile) live on the user's shard.
+            kwargs['queryset'] = kwargs['queryset'].using(obj._state.db)
+        return kwargs
+
+    def get_inlines(self, request, obj):
+        """Related rows are only loaded on the change form of an existing user"""
+        if obj is None:
+            return ()
+        return super().get_inlines(request, obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Resolve the search box through the full-text index instead of icontains scans"""
+        if not search_term:
+            return queryset, False
+        ids = get_search_backend().search(search_term, limit=self.search_results_limit)
+        return queryset.filter(pk__in=ids), False
+
+
+@admin.register(Address)
+class AddressAdmin(admin.ModelAdmin):
+    list_display = ('street_address', 'city', 'postal_code', 'country', 'type', 'is_default', 'is_active')
+    list_filter = ('type', 'is_active', 'is_default')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('fingerprint', 'created_at', 'updated_at')
+
+
+@admin.register(MarketingSegment)
+class MarketingSegmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'customer_group', 'country', 'refreshed_at')
+    readonly_fields = ('refreshed_at', 'created_at')
+
+
+class ShippingZoneRuleInline(admin.TabularInline):
+    model = ShippingZoneRule
+    extra = 0
+    fields = ('country', 'state', 'postal_code_start', 'postal_code_end', 'priority')
+
+
+@admin.register(ShippingZone)
+class ShippingZoneAdmin(admin.ModelAdmin):
+    list_display = ('name', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    inlines = (ShippingZoneRuleInline,)
@@ -0,0 +1,52 @@
+"""
+Archival of long-inactive addresses.
+
+Deleting an address through the API only deactivates it. This job moves
+addresses that stayed inactive for ADDRESS_ARCHIVE_AFTER_DAYS to the
+ArchivedAddress table in small chunks, one short transaction per chunk, so
+the addresses table only keeps rows customers can still use.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Address, ArchivedAddress
+
+ARCHIVED_FIELDS = [
+    'user_id', 'type', 'street_address', 'apartment', 'city', 'state',
+    'postal_code', 'country', 'delivery_instructions', 'created_at', 'updated_at',
+]
+
+
+def archive_inactive_addresses(older_than=None, chunk_size=500, pause=0.0):
+    """Move addresses inactive for longer than `older_than` to ArchivedAddress. Returns the count."""
+    if older_than is None:
+        older_than = timedelta(days=settings.ADDRESS_ARCHIVE_AFTER_DAYS)
+    cutoff = timezone.now() - older_than
+    archived = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                Address.objects
+                .filter(is_active=False, updated_at__lt=cutoff)
+                .order_by('updated_at', 'pk')[:chunk_size]
+            )
+            if not chunk:
+                return archived
+            ArchivedAddress.objects.bulk_create(
+                [
+                    ArchivedAddress(
+                        original_id=address.pk,
+                        **{field: getattr(address, field) for field in ARCHIVED_FIELDS}
+                    )
+                    for address in chunk
+                ],
+                ignore_conflicts=True
+            )
+            Address.objects.filter(pk__in=[address.pk for address in chunk]).delete()
+        archived += len(chunk)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,108 @@
+"""
+Marketing audience materialization.
+
+Segment memberships are written to SegmentMember in chunks so campaigns read
+a snapshot instead of scanning users_user. After the first build, refreshes
+only re-evaluate users (and address owners) updated since the segment
+watermark. Hard-deleted addresses leave no trace behind, so a periodic full
+rebuild is still recommended.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Address, SegmentMember, User
+
+
+def audience_queryset(segment):
+    """Users that currently belong to the segment."""
+    queryset = User.objects.filter(accepts_marketing=True, is_verified=True, is_active=True)
+    if segment.customer_group_id:
+        queryset = queryset.filter(
+            Exists(User.customer_groups.through.objects.filter(
+                user_id=OuterRef('pk'),
+                customergroup_id=segment.customer_group_id,
+            ))
+        )
+    if segment.country:
+        queryset = queryset.filter(
+            Exists(Address.objects.filter(
+                user_id=OuterRef('pk'),
+                country__iexact=segment.country,
+                is_active=True,
+            ))
+        )
+    return queryset
+
+
+def chunked_pks(queryset, field, chunk_size):
+    """Yield lists of distinct values of `field`, walking its index in keyset order."""
+    last = None
+    while True:
+        chunk_queryset = queryset
+        if last is not None:
+            chunk_queryset = chunk_queryset.filter(**{f'{field}__gt': last})
+        chunk = list(
+            chunk_queryset.order_by(field).values_list(field, flat=True).distinct()[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def sync_members(segment, user_ids):
+    """Make the snapshot match the audience for the given users. Returns (added, removed)."""
+    eligible = set(audience_queryset(segment).filter(pk__in=user_ids).values_list('pk', flat=True))
+    with transaction.atomic():
+        removed, _ = (
+            SegmentMember.objects
+            .filter(segment=segment, user_id__in=user_ids)
+            .exclude(user_id__in=eligible)
+            .delete()
+        )
+        existing = set(
+            SegmentMember.objects
+            .filter(segment=segment, user_id__in=eligible)
+            .values_list('user_id', flat=True)
+        )
+        SegmentMember.objects.bulk_create(
+            [SegmentMember(segment=segment, user_id=pk) for pk in eligible - existing],
+            ignore_conflicts=True
+        )
+    return len(eligible - existing), removed
+
+
+def refresh_segment(segment, chunk_size=1000, full=False):
+    """
+    Refresh the materialized members of a segment.
+
+    The first refresh (or `full=True`) rebuilds the snapshot from the partial
+    audience index; later ones only look at rows changed since the watermark.
+    Returns the number of members added and removed.
+    """
+    started = timezone.now()
+    added = removed = 0
+
+    if full or segment.refreshed_at is None:
+        SegmentMember.objects.filter(segment=segment).delete()
+        for chunk in chunked_pks(audience_queryset(segment), 'pk', chunk_size):
+            SegmentMember.objects.bulk_create(
+                [SegmentMember(segment=segment, user_id=pk) for pk in chunk],
+                ignore_conflicts=True
+            )
+            added += len(chunk)
+    else:
+        watermark = segment.refreshed_at
+        sources = [(User.objects.filter(updated_at__gte=watermark), 'pk')]
+        if segment.country:
+            sources.append((Address.objects.filter(updated_at__gte=watermark), 'user_id'))
+        for queryset, field in sources:
+            for chunk in chunked_pks(queryset, field, chunk_size):
+                chunk_added, chunk_removed = sync_members(segment, chunk)
+                added += chunk_added
+                removed += chunk_removed
+
+    segment.refreshed_at = started
+    segment.save(update_fields=['refreshed_at'])
+    return added, removed
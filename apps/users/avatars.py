@@ -0,0 +1,117 @@
+"""Avatar processing: size-capped uploads and resized, content-addressed variants."""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+# Longest side in pixels for every generated variant.
+AVATAR_VARIANT_SIZES = {
+    'small': 64,
+    'medium': 256,
+}
+
+# Output extension -> Pillow format name.
+AVATAR_VARIANT_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+AVATAR_ALLOWED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
+
+
+def get_max_upload_size():
+    return getattr(settings, 'AVATAR_MAX_UPLOAD_SIZE', 2 * 1024 * 1024)
+
+
+def validate_avatar_size(file):
+    """Reject uploads over the cap without decoding them."""
+    max_size = get_max_upload_size()
+    if file.size > max_size:
+        raise serializers.ValidationError(
+            f'The avatar can not be larger than {max_size // 1024} KB.'
+        )
+
+
+def content_digest(file, chunk_size=64 * 1024):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def variant_path(digest, size, extension):
+    return f'avatars/variants/{digest[:2]}/{digest}-{size}.{extension}'
+
+
+def process_avatar(profile):
+    """
+    Generate the resized variants of a profile avatar.
+
+    Variants are stored under the digest of the original upload, so identical
+    uploads share the same files and are only encoded once. Uploads that can
+    not be decoded are dropped from the profile. Writes are conditional on the
+    avatar this job read: a newer upload is left to its own job.
+    """
+    from .models import UserProfile
+
+    if not profile.avatar:
+        return {}
+    processed = UserProfile.objects.using(profile._state.db).filter(pk=profile.pk, avatar=profile.avatar.name)
+
+    storage = profile.avatar.storage
+    variants = {}
+    try:
+        with profile.avatar.open('rb') as file:
+            digest = content_digest(file)
+            image = Image.open(file)
+            image = ImageOps.exif_transpose(image).convert('RGB')
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        if processed.update(avatar='', avatar_variants={}):
+            profile.avatar.delete(save=False)
+            profile.avatar_variants = {}
+        return {}
+
+    for name, size in AVATAR_VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size))
+        variants[name] = {}
+        for extension, image_format in AVATAR_VARIANT_FORMATS.items():
+            path = variant_path(digest, size, extension)
+            if not storage.exists(path):
+                buffer = BytesIO()
+                resized.save(buffer, format=image_format, quality=85)
+                path = storage.save(path, ContentFile(buffer.getvalue()))
+            variants[name][extension] = path
+
+    if processed.update(avatar_variants=variants):
+        profile.avatar_variants = variants
+    return variants
+
+
+def pending_avatars():
+    """Profiles with an uploaded avatar whose variants were not generated yet."""
+    from .models import UserProfile
+
+    return (
+        UserProfile.objects
+        .exclude(avatar='')
+        .exclude(avatar__isnull=True)
+        .filter(avatar_variants={})
+    )
+
+
+def variant_urls(profile):
+    """Public URLs of the generated variants, keyed by size name and extension."""
+    if not profile.avatar_variants:
+        return {}
+    storage = profile._meta.get_field('avatar').storage
+    return {
+        name: {extension: storage.url(path) for extension, path in formats.items()}
+        for name, formats in profile.avatar_variants.items()
+    }
@@ -0,0 +1,134 @@
+"""
+Incremental change feed for users, profiles and addresses.
+
+Signals append a ChangeLogEntry for every save and delete, and bulk code paths
+that bypass signals call record_changes() themselves. The entry id is a
+monotonic sequence, so consumers sync with "everything after checkpoint N":
+the feed returns the current state of each changed object, or a tombstone
+when it no longer exists. Checkpoints are opaque to consumers.
+
+Entry ids are allocated when a transaction inserts them, not when it
+commits, so a reader could see id N + 1 before id N commits and move its
+checkpoint past N for good. Pages therefore stop at the first entry younger
+than CHANGE_FEED_VISIBILITY_LAG seconds: every transaction that inserted a
+lower id is assumed to have committed (or rolled back) by then.
+"""
+import base64
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Address, ChangeLogEntry, User, UserProfile
+
+FEED_MODELS = {
+    'user': User,
+    'profile': UserProfile,
+    'address': Address,
+}
+
+KIND_BY_MODEL = {model: kind for kind, model in FEED_MODELS.items()}
+
+
+def feed_serializers():
+    # Imported here: serializers depend on modules that record feed changes.
+    from .serializers import AddressChangeSerializer, UserChangeSerializer, UserProfileChangeSerializer
+
+    return {
+        'user': UserChangeSerializer,
+        'profile': UserProfileChangeSerializer,
+        'address': AddressChangeSerializer,
+    }
+
+
+class InvalidCheckpoint(ValueError):
+    pass
+
+
+def record_changes(kind, object_ids, deleted=False):
+    """Append feed entries for objects changed outside of the ORM save/delete signals."""
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(kind=kind, object_id=object_id, deleted=deleted)
+        for object_id in object_ids
+    ])
+
+
+def encode_checkpoint(sequence):
+    return base64.urlsafe_b64encode(f'v1:{sequence}'.encode()).decode().rstrip('=')
+
+
+def decode_checkpoint(checkpoint):
+    if not checkpoint:
+        return 0
+    try:
+        padded = checkpoint + '=' * (-len(checkpoint) % 4)
+        version, sequence = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        if version != 'v1':
+            raise ValueError(version)
+        return int(sequence)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise InvalidCheckpoint(checkpoint) from error
+
+
+def read_changes(checkpoint=None, limit=500):
+    """
+    Changes after `checkpoint`, at most `limit` log entries.
+
+    Returns (changes, next_checkpoint, has_more). Objects changed several
+    times inside the page are reported once, with their current state.
+    Entries younger than the visibility lag are left for a later read.
+    """
+    sequence = decode_checkpoint(checkpoint)
+    horizon = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_VISIBILITY_LAG)
+    entries = list(ChangeLogEntry.objects.filter(pk__gt=sequence).order_by('pk')[:limit + 1])
+    for position, entry in enumerate(entries):
+        if entry.created_at > horizon:
+            # Lower ids may still be uncommitted; nothing after this point is served yet.
+            entries = entries[:position]
+            break
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return [], encode_checkpoint(sequence), False
+
+    # Last entry wins; keep the order of each object's latest change.
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.kind, entry.object_id), None)
+        latest[(entry.kind, entry.object_id)] = entry
+
+    current = {}
+    for kind, model in FEED_MODELS.items():
+        ids = [object_id for entry_kind, object_id in latest if entry_kind == kind]
+        if ids:
+            current[kind] = model.objects.in_bulk(ids)
+
+    serializers = feed_serializers()
+    changes = []
+    for (kind, object_id), entry in latest.items():
+        instance = current.get(kind, {}).get(object_id)
+        if instance is None:
+            changes.append({'type': kind, 'id': object_id, 'deleted': True, 'data': None})
+        else:
+            changes.append({
+                'type': kind,
+                'id': object_id,
+                'deleted': False,
+                'data': serializers[kind](instance).data,
+            })
+    return changes, encode_checkpoint(entries[-1].pk), has_more
+
+
+def prune_change_log(older_than):
+    """Delete entries older than `older_than`; consumers must sync more often than that."""
+    cutoff = timezone.now() - older_than
+    # Entries are appended in time order, so the oldest kept entry bounds a primary key range.
+    boundary = (
+        ChangeLogEntry.objects.filter(created_at__gte=cutoff)
+        .order_by('pk').values_list('pk', flat=True).first()
+    )
+    stale = ChangeLogEntry.objects.all()
+    if boundary is not None:
+        stale = stale.filter(pk__lt=boundary)
+    deleted, _ = stale.delete()
+    return deleted
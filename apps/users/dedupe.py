@@ -0,0 +1,71 @@
+"""
+Duplicate address detection.
+
+Every address stores a fingerprint of its normalized street, apartment, city,
+state, postal code, country and type (normalization.address_fingerprint).
+Creating an address that matches an active one of the same user reuses it, and
+dedupe_addresses() folds the duplicates already in the table: per group of
+active addresses with the same user and fingerprint it keeps the oldest one
+(inheriting the default flag) and soft-archives the rest.
+"""
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .changefeed import record_changes
+from .models import Address
+from .outbox import emit
+
+
+def find_duplicate(user, data):
+    """Active address of `user` matching the address fields in `data` (type included), or None."""
+    fingerprint = Address(user=user, **data).compute_fingerprint()
+    return user.addresses.active().filter(fingerprint=fingerprint).order_by('pk').first()
+
+
+def duplicate_groups(chunk_size):
+    """(user_id, fingerprint, kept pk) of groups with more than one active address."""
+    return (
+        Address.objects.active()
+        .values('user_id', 'fingerprint')
+        .annotate(copies=Count('pk'), keep=Min('pk'))
+        .filter(copies__gt=1)
+        .order_by('user_id', 'fingerprint')[:chunk_size]
+    )
+
+
+def dedupe_addresses(chunk_size=500):
+    """Archive the duplicate active addresses. Returns (groups, archived)."""
+    groups_done = 0
+    archived = 0
+    while True:
+        with transaction.atomic():
+            groups = list(duplicate_groups(chunk_size))
+            if not groups:
+                return groups_done, archived
+            keep_ids = [group['keep'] for group in groups]
+            duplicates = list(
+                Address.objects.active()
+                .filter(
+                    user_id__in={group['user_id'] for group in groups},
+                    fingerprint__in={group['fingerprint'] for group in groups},
+                )
+                .exclude(pk__in=keep_ids)
+                .values_list('pk', 'user_id', 'fingerprint', 'is_default')
+            )
+            keys = {(group['user_id'], group['fingerprint']): group['keep'] for group in groups}
+            duplicates = [row for row in duplicates if (row[1], row[2]) in keys]
+            # A group keeps the default flag if any of its copies had it.
+            inherit_default = {
+                keys[(user_id, fingerprint)]: user_id
+                for _, user_id, fingerprint, is_default in duplicates if is_default
+            }
+            duplicate_ids = [row[0] for row in duplicates]
+            now = timezone.now()
+            Address.objects.filter(pk__in=duplicate_ids).update(is_active=False, is_default=False, updated_at=now)
+            Address.objects.filter(pk__in=inherit_default).update(is_default=True, updated_at=now)
+            record_changes('address', [*duplicate_ids, *inherit_default])
+            for address_id, user_id in inherit_default.items():
+                emit('address.default_changed', user_id, {'user_id': user_id, 'address_id': address_id})
+        groups_done += len(groups)
+        archived += len(duplicate_ids)
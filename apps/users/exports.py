@@ -0,0 +1,260 @@
+"""
+Per-user data export (access requests).
+
+The archive is a zip written as a stream: user.json, addresses.json and
+archived_addresses.json are serialized on the fly, one object at a time, and
+the avatar file is copied in storage chunks, so memory use does not grow with
+the account. Small accounts get the stream directly in the response; larger
+ones (DATA_EXPORT_INLINE_MAX_ADDRESSES, DATA_EXPORT_INLINE_MAX_BYTES) are
+built by a background job into a DataExport file, which supports HTTP Range
+requests so interrupted downloads can resume.
+
+Background exports are requested with POST; a user with a pending or
+unexpired export gets that one back instead of a new one. Files expire
+DATA_EXPORT_TTL_DAYS after they are built and purge_expired_exports()
+(the purge_data_exports command) deletes them with their rows.
+"""
+import json
+import os
+import re
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .jobs import enqueue_on_commit
+from .models import ArchivedAddress, DataExport
+from .serializers import AddressSerializer, UserExportSerializer
+
+CHUNK_SIZE = 64 * 1024
+
+ARCHIVED_ADDRESS_FIELDS = [
+    'original_id', 'type', 'street_address', 'apartment', 'city', 'state', 'postal_code',
+    'country', 'delivery_instructions', 'created_at', 'updated_at', 'archived_at',
+]
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class StreamBuffer:
+    """Write-only file for zipfile: collects the written bytes until they are drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def encode(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+
+
+def json_array(items):
+    """Encode an iterable as a JSON array, one item at a time."""
+    yield b'['
+    for index, item in enumerate(items):
+        yield (b',\n' if index else b'\n') + encode(item)
+    yield b'\n]\n'
+
+
+def file_chunks(field_file):
+    field_file.open('rb')
+    try:
+        yield from field_file.chunks(CHUNK_SIZE)
+    finally:
+        field_file.close()
+
+
+def export_entries(user):
+    """(name, compression, chunks) of every file in the archive of `user`."""
+    yield 'user.json', zipfile.ZIP_DEFLATED, [encode(UserExportSerializer(user).data)]
+    addresses = user.addresses.order_by('pk').iterator(chunk_size=200)
+    yield 'addresses.json', zipfile.ZIP_DEFLATED, json_array(
+        AddressSerializer(address).data for address in addresses
+    )
+    archived = ArchivedAddress.objects.filter(user=user).order_by('pk').values(*ARCHIVED_ADDRESS_FIELDS)
+    yield 'archived_addresses.json', zipfile.ZIP_DEFLATED, json_array(archived.iterator(chunk_size=200))
+
+    profile = getattr(user, 'profile', None)
+    if profile is not None and profile.avatar:
+        # Images are already compressed.
+        name = f'avatar/{os.path.basename(profile.avatar.name)}'
+        yield name, zipfile.ZIP_STORED, file_chunks(profile.avatar)
+
+
+def stream_export(user):
+    """Yield the zip archive of `user` in chunks."""
+    buffer = StreamBuffer()
+    date_time = timezone.now().timetuple()[:6]
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, compression, chunks in export_entries(user):
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = compression
+            with archive.open(info, 'w', force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def export_filename(user):
+    return f'techmarket-data-{user.pk}.zip'
+
+
+def needs_background(user):
+    """Whether the archive of `user` is too large to stream inline."""
+    if user.addresses.count() + user.archived_addresses.count() > settings.DATA_EXPORT_INLINE_MAX_ADDRESSES:
+        return True
+    profile = getattr(user, 'profile', None)
+    return bool(profile and profile.avatar and profile.avatar.size > settings.DATA_EXPORT_INLINE_MAX_BYTES)
+
+
+def streaming_export_response(user):
+    response = StreamingHttpResponse(
+        (chunk for chunk in stream_export(user) if chunk), content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(user)}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def build_export(export):
+    """Write the archive of the export's user to its file, through a temporary file."""
+    with tempfile.TemporaryFile() as tmp:
+        for chunk in stream_export(export.user):
+            tmp.write(chunk)
+        export.size = tmp.tell()
+        tmp.seek(0)
+        export.file.save(f'{export.user_id}-{export.pk}.zip', File(tmp), save=False)
+    export.status = 'ready'
+    export.completed_at = timezone.now()
+    export.save(update_fields=['file', 'size', 'status', 'completed_at'])
+
+
+def requested_range(request, size, etag):
+    """(start, end) of a single satisfiable byte range, None for the whole file, or False."""
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_chunks(field_file, start, end):
+    field_file.open('rb')
+    try:
+        field_file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = field_file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        field_file.close()
+
+
+def download_response(request, export):
+    """The export file, or the requested byte range of it (206)."""
+    etag = f'"export-{export.pk}-{export.size}"'
+    filename = export_filename(export.user)
+    byte_range = requested_range(request, export.size, etag)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{export.size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(export.file.open('rb'), as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            range_chunks(export.file, start, end), status=206, content_type='application/zip'
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{export.size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def expiry_cutoff():
+    """Exports completed before this moment are expired."""
+    return timezone.now() - timedelta(days=settings.DATA_EXPORT_TTL_DAYS)
+
+
+def current_exports():
+    """Exports that are being built or can still be downloaded."""
+    return DataExport.objects.filter(
+        Q(status='pending', created_at__gte=expiry_cutoff()) | Q(status='ready', completed_at__gte=expiry_cutoff())
+    )
+
+
+def current_export(user):
+    return current_exports().filter(user=user).order_by('-created_at').first()
+
+
+def request_export(user):
+    """
+    The current export of `user`, or a new pending DataExport built by the
+    job queue after commit. Returns (export, created).
+    """
+    export = current_export(user)
+    if export is not None:
+        return export, False
+    export = DataExport.objects.create(user=user)
+    enqueue_on_commit('users.build_data_export', {'export_id': export.pk})
+    return export, True
+
+
+def purge_expired_exports(batch_size=200):
+    """Delete the files and rows of expired, failed and abandoned exports. Returns the number deleted."""
+    cutoff = expiry_cutoff()
+    expired = DataExport.objects.filter(
+        Q(completed_at__lt=cutoff) | Q(completed_at__isnull=True, created_at__lt=cutoff)
+    ).order_by('pk')
+    deleted = 0
+    while True:
+        exports = list(expired[:batch_size])
+        if not exports:
+            return deleted
+        for export in exports:
+            if export.file:
+                export.file.delete(save=False)
+        DataExport.objects.filter(pk__in=[export.pk for export in exports]).delete()
+        deleted += len(exports)
@@ -0,0 +1,110 @@
+"""
+In-process customer group catalog.
+
+CustomerGroup rows are few and rarely change, so every process keeps an
+immutable snapshot of them. The snapshot is tagged with a version stored in
+the database (versions.py); saving or deleting a group writes a new version
+and every process rebuilds its snapshot once it sees it, at most
+SNAPSHOT_VERSION_TTL seconds later. Reading the catalog costs one cache get
+and, once per TTL, one query.
+"""
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType
+
+from .models import CustomerGroup, User
+from .sharding import users_by_shard
+from .versions import bump_version, get_version
+
+CATALOG_VERSION_NAME = 'customer-groups'
+
+
+@dataclass(frozen=True)
+class GroupInfo:
+    id: int
+    name: str
+    description: str
+    discount_percentage: Decimal
+    is_active: bool
+
+
+class GroupCatalog:
+    """Immutable snapshot of every customer group, keyed by id."""
+
+    def __init__(self, version, groups):
+        self.version = version
+        self.groups = MappingProxyType({group.id: group for group in groups})
+
+    def get(self, group_id):
+        return self.groups.get(group_id)
+
+    def for_ids(self, group_ids):
+        return [self.groups[group_id] for group_id in sorted(group_ids) if group_id in self.groups]
+
+    def best_discount(self, group_ids):
+        """Highest discount among the active groups in `group_ids`."""
+        return max(
+            (
+                self.groups[group_id].discount_percentage
+                for group_id in group_ids
+                if group_id in self.groups and self.groups[group_id].is_active
+            ),
+            default=Decimal('0'),
+        )
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def catalog_version():
+    return get_version(CATALOG_VERSION_NAME)
+
+
+def invalidate_catalog():
+    """Publish a new catalog version; every process reloads once it sees it."""
+    bump_version(CATALOG_VERSION_NAME)
+
+
+def load_catalog(version):
+    groups = [
+        GroupInfo(*row) for row in CustomerGroup.objects.order_by('pk').values_list(
+            'id', 'name', 'description', 'discount_percentage', 'is_active'
+        )
+    ]
+    return GroupCatalog(version, groups)
+
+
+def get_catalog():
+    global _catalog
+    version = catalog_version()
+    catalog = _catalog
+    if catalog is not None and version is not None and catalog.version == version:
+        return catalog
+    with _lock:
+        if _catalog is None or version is None or _catalog.version != version:
+            _catalog = load_catalog(version)
+        return _catalog
+
+
+def group_ids_by_user(user_ids):
+    """Customer group ids of many users, in one query over the m2m table (per shard)."""
+    user_ids = list(user_ids)
+    memberships = {user_id: set() for user_id in user_ids}
+    for shard, shard_user_ids in users_by_shard(user_ids).items():
+        rows = User.customer_groups.through.objects.using(shard).filter(user_id__in=shard_user_ids).values_list(
+            'user_id', 'customergroup_id'
+        )
+        for user_id, group_id in rows:
+            memberships[user_id].add(group_id)
+    return memberships
+
+
+def best_discount_for(user_ids):
+    """Effective discount_percentage of each user (0 when not in any active group)."""
+    catalog = get_catalog()
+    return {
+        user_id: catalog.best_discount(group_ids)
+        for user_id, group_ids in group_ids_by_user(user_ids).items()
+    }
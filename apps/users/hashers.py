@@ -0,0 +1,67 @@
+"""
+Password hashers with work factors taken from settings.
+
+The calibrate_password_hashers command measures this host and prints the
+PASSWORD_HASHER_PARAMETERS to use. Hashes keep Django's algorithm names, so
+existing passwords stay valid, and Django's check_password() rehashes a
+stored password on the next successful login whenever its parameters (or the
+preferred algorithm) differ from the configured ones.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+def hasher_parameter(algorithm, name, default):
+    parameters = getattr(settings, 'PASSWORD_HASHER_PARAMETERS', {}).get(algorithm, {})
+    return parameters.get(name, default)
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return hasher_parameter(self.algorithm, 'iterations', PBKDF2PasswordHasher.iterations)
+
+
+class CalibratedScryptPasswordHasher(ScryptPasswordHasher):
+
+    @property
+    def work_factor(self):
+        return hasher_parameter(self.algorithm, 'work_factor', ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return hasher_parameter(self.algorithm, 'block_size', ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return hasher_parameter(self.algorithm, 'parallelism', ScryptPasswordHasher.parallelism)
+
+    @property
+    def maxmem(self):
+        return scrypt_maxmem(self.work_factor, self.block_size)
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    # Needs argon2-cffi (pip install django[argon2]).
+
+    @property
+    def time_cost(self):
+        return hasher_parameter(self.algorithm, 'time_cost', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return hasher_parameter(self.algorithm, 'memory_cost', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return hasher_parameter(self.algorithm, 'parallelism', Argon2PasswordHasher.parallelism)
+
+
+def scrypt_maxmem(work_factor, block_size):
+    """Memory limit for hashlib.scrypt: its 128 * r * N bytes, with headroom."""
+    return 2 * 128 * block_size * work_factor
@@ -0,0 +1,127 @@
+"""
+Idempotency-Key support for create endpoints.
+
+A client that retries a POST with the same Idempotency-Key header gets the
+response of the first execution back (marked with Idempotent-Replayed) and
+the view does not run again: no password hashing, no uniqueness checks, no
+inserts. Keys are rows of IdempotencyKey, unique on (scope, owner, key), so
+concurrent duplicates on any worker race on one insert and only the winner
+executes; the others wait for its result instead of executing in parallel.
+A record holds a fingerprint of the request, so a key reused with another
+body is rejected, and the response for IDEMPOTENCY_KEY_TTL seconds. A claim
+whose request died is taken over after IDEMPOTENCY_LOCK_TIMEOUT seconds.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def request_fingerprint(request):
+    """Keyed hash of what the request asks for (the body may contain a password)."""
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return salted_hmac('users.idempotency', f'{request.method}\n{request.path}\n{body}').hexdigest()
+
+
+def record_lookup(scope, request, key):
+    owner = request.user.pk if request.user.is_authenticated else 'anonymous'
+    return {'scope': scope, 'owner': str(owner), 'key_hash': hashlib.sha256(key.encode()).hexdigest()}
+
+
+def claim(lookup, fingerprint):
+    """Insert the running record of a key; False if another request holds it."""
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                **lookup,
+                fingerprint=fingerprint,
+                locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def stale_records(now=None):
+    """Expired records, and claims of requests that died while running."""
+    now = now or timezone.now()
+    return IdempotencyKey.objects.filter(Q(expires_at__lte=now) | Q(state='running', locked_until__lte=now))
+
+
+def purge_expired_keys():
+    deleted, _ = stale_records().delete()
+    return deleted
+
+
+def replay(record):
+    response = Response(record.data, status=record.status, headers=record.headers)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(request, scope, execute):
+    """Run `execute()` once per Idempotency-Key and replay its response to retries."""
+    key = request.headers.get(HEADER)
+    if not key:
+        return execute()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response({HEADER: [f'At most {MAX_KEY_LENGTH} characters']}, status=status.HTTP_400_BAD_REQUEST)
+
+    lookup = record_lookup(scope, request, key)
+    fingerprint = request_fingerprint(request)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while not claim(lookup, fingerprint):
+        record = IdempotencyKey.objects.filter(**lookup).first()
+        if record is None:
+            continue
+        if stale_records().filter(pk=record.pk).delete()[0]:
+            # Expired, or its request died: the next claim starts over.
+            continue
+        if record.fingerprint != fingerprint:
+            return Response(
+                {HEADER: ['This key was already used for a different request']},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.state == 'done':
+            return replay(record)
+        if time.monotonic() >= deadline:
+            return Response(
+                {HEADER: ['A request with this key is still in progress']},
+                status=status.HTTP_409_CONFLICT
+            )
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        response = execute()
+    except Exception:
+        IdempotencyKey.objects.filter(**lookup).delete()
+        raise
+    if response.status_code >= 500:
+        # Let the client retry a server error.
+        IdempotencyKey.objects.filter(**lookup).delete()
+        return response
+    IdempotencyKey.objects.filter(**lookup).update(
+        state='done',
+        status=response.status_code,
+        data=json.loads(json.dumps(response.data, cls=JSONEncoder)),
+        headers={name: response[name] for name in ('Location',) if response.has_header(name)},
+        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    )
+    return response
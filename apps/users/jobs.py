@@ -0,0 +1,212 @@
+"""
+Database-backed background jobs.
+
+Jobs are rows in the Job table, so they need no broker and run locally with
+the run_jobs management command. Workers claim jobs with a lease: SELECT ...
+FOR UPDATE SKIP LOCKED where the backend supports it, and a conditional
+UPDATE in every case, so a job whose worker died is claimed again once its
+lease expires. Every claim counts as an attempt, so a job that keeps killing
+its worker is marked failed after max_attempts claims like any other failing
+job. Failed jobs are retried with exponential backoff.
+
+Handlers are registered by name:
+
+    @register('users.send_welcome')
+    def send_welcome(payload): ...
+
+Batch handlers receive the payloads of every claimed job with the same name
+in a single call, so similar work (e.g. one bulk insert) is grouped.
+
+Periodic handlers are registered with an interval (seconds, or a callable
+returning them). The queue schedules their next run itself once a run
+succeeds or gives up, outside of the handler's transaction, so a failing run
+does not end the chain; schedule_periodic() starts a chain unless one is
+already pending or running.
+"""
+import logging
+import random
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+RETRY_BASE_DELAY = 10 # Seconds before the first retry, doubled on every attempt.
+RETRY_MAX_DELAY = 60 * 60
+
+
+class Handler:
+
+    def __init__(self, func, batch, interval=None):
+        self.func = func
+        self.batch = batch
+        self.interval = interval
+
+    def next_run(self):
+        interval = self.interval() if callable(self.interval) else self.interval
+        return timezone.now() + timedelta(seconds=interval)
+
+
+def register(name, batch=False, interval=None):
+    """Register the handler of a job name; with an interval the job is periodic."""
+    def decorator(func):
+        _handlers[name] = Handler(func, batch, interval)
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=5):
+    """Insert a job now, as part of the current transaction."""
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_on_commit(name, payload=None, **kwargs):
+    """Insert a job once the current transaction commits, so the request never waits on it."""
+    transaction.on_commit(lambda: enqueue(name, payload, **kwargs))
+
+
+def schedule_periodic(name, payload=None):
+    """Start the chain of a periodic job unless a run is already pending or running."""
+    if Job.objects.filter(name=name, status__in=['pending', 'running']).exists():
+        return None
+    return enqueue(name, payload)
+
+
+def schedule_next(names):
+    """Enqueue the next run of the periodic jobs among `names` whose current run ended."""
+    for name in set(names):
+        handler = get_handler(name)
+        if handler is not None and handler.interval is not None:
+            enqueue(name, run_at=handler.next_run())
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds."""
+    delay = min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claimable(now):
+    return (
+        Q(status='pending', run_at__lte=now) |
+        Q(status='running', locked_until__lt=now, attempts__lt=F('max_attempts'))
+    )
+
+
+def abandon_expired(now):
+    """Mark as failed the jobs whose lease expired on their last attempt (their worker died)."""
+    expired = Job.objects.filter(status='running', locked_until__lt=now, attempts__gte=F('max_attempts'))
+    rows = list(expired.values_list('pk', 'name'))
+    if not rows:
+        return 0
+    Job.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+        status='failed',
+        locked_by='',
+        locked_until=None,
+        last_error='Lease expired on the last attempt; the worker did not finish the job.',
+    )
+    schedule_next(name for _, name in rows)
+    return len(rows)
+
+
+def claim_jobs(worker_id, limit=100, lease_seconds=300, names=None):
+    """Lease up to `limit` due jobs to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        abandon_expired(now)
+        queryset = Job.objects.filter(claimable(now))
+        if names:
+            queryset = queryset.filter(name__in=names)
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.order_by('run_at', 'pk').values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        # Re-checking the condition makes the UPDATE the lease on backends without SKIP LOCKED.
+        Job.objects.filter(claimable(now), pk__in=ids).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+    return list(
+        Job.objects.filter(pk__in=ids, status='running', locked_by=worker_id).order_by('run_at', 'pk')
+    )
+
+
+def complete(jobs):
+    Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+
+
+def fail(jobs, error):
+    """Schedule a retry, or mark the jobs as failed once they run out of attempts."""
+    now = timezone.now()
+    for job in jobs:
+        job.last_error = error
+        job.locked_by = ''
+        job.locked_until = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_at = now + timedelta(seconds=retry_delay(job.attempts))
+    Job.objects.bulk_update(jobs, ['status', 'run_at', 'last_error', 'locked_by', 'locked_until'])
+
+
+def run_jobs(jobs):
+    """Run claimed jobs, grouping the ones with batch handlers. Returns (succeeded, failed)."""
+    by_name = defaultdict(list)
+    for job in jobs:
+        by_name[job.name].append(job)
+
+    groups = []
+    for name, named_jobs in by_name.items():
+        handler = get_handler(name)
+        if handler is not None and handler.batch:
+            groups.append((handler, named_jobs))
+        else:
+            groups.extend((handler, [job]) for job in named_jobs)
+
+    succeeded = failed = 0
+    for handler, group in groups:
+        try:
+            if handler is None:
+                raise LookupError(f'No handler registered for job {group[0].name!r}')
+            with transaction.atomic():
+                if handler.batch:
+                    handler.func([job.payload for job in group])
+                else:
+                    handler.func(group[0].payload)
+        except Exception:
+            logger.exception('Job %s failed', group[0].name)
+            fail(group, traceback.format_exc(limit=5))
+            failed += len(group)
+            # Runs that will be retried keep the chain going themselves.
+            schedule_next(job.name for job in group if job.status == 'failed')
+        else:
+            complete(group)
+            succeeded += len(group)
+            schedule_next(job.name for job in group)
+    return succeeded, failed
+
+
+def run_pending(worker_id, limit=100, lease_seconds=300, names=None):
+    """Claim and run one batch of due jobs. Returns (succeeded, failed)."""
+    return run_jobs(claim_jobs(worker_id, limit, lease_seconds, names))
@@ -0,0 +1,129 @@
+"""
+Coalesced last_login writes.
+
+Issuing a token does not update users_user. The login time is kept in an
+in-process buffer and written for every buffered user in one
+UPDATE ... SET last_login = CASE id WHEN ... END statement when the buffer
+reaches LOGIN_TRACKING_MAX_BUFFER users, when the process exits, and at most
+LOGIN_TRACKING_MAX_STALENESS seconds after the first buffered login: by the
+next login past that window or, in processes that called start() (wsgi.py,
+asgi.py), by a daemon thread that flushes once per window even when no
+other login comes. last_login can therefore lag by up to the staleness
+window, and a process that is killed (not stopped) loses at most the logins
+of its last window.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .models import User
+from .sharding import users_by_shard
+
+logger = logging.getLogger(__name__)
+
+
+class LoginTracker:
+
+    def __init__(self, max_staleness=None, max_buffer=None):
+        self.max_staleness = max_staleness
+        self.max_buffer = max_buffer
+        self.buffer = {}
+        self.first_buffered = None
+        self.lock = threading.Lock()
+        self.background = False
+        self.flusher = None
+        self.flusher_pid = None
+        self.stopping = threading.Event()
+
+    def get_max_staleness(self):
+        if self.max_staleness is not None:
+            return self.max_staleness
+        return getattr(settings, 'LOGIN_TRACKING_MAX_STALENESS', 60)
+
+    def get_max_buffer(self):
+        if self.max_buffer is not None:
+            return self.max_buffer
+        return getattr(settings, 'LOGIN_TRACKING_MAX_BUFFER', 1000)
+
+    def start(self):
+        """Flush from a background thread once per staleness window."""
+        # The thread starts with the first buffered login, so a server that
+        # forks its workers after loading the application gets one per worker.
+        self.background = True
+        self.stopping.clear()
+
+    def stop(self):
+        self.background = False
+        self.stopping.set()
+
+    def ensure_flusher(self):
+        # Called with the lock held. Threads do not survive fork: check the pid too.
+        if self.flusher is not None and self.flusher.is_alive() and self.flusher_pid == os.getpid():
+            return
+        self.flusher = threading.Thread(target=self.run_flusher, name='login-tracker-flush', daemon=True)
+        self.flusher_pid = os.getpid()
+        self.flusher.start()
+
+    def run_flusher(self):
+        while not self.stopping.wait(self.get_max_staleness()):
+            if not self.buffer:
+                continue
+            try:
+                self.flush()
+            finally:
+                # This thread's own connection; requests never reuse it.
+                connections.close_all()
+
+    def record(self, user, when=None):
+        """Buffer a login of `user`; flushes when the buffer is due."""
+        when = when or timezone.now()
+        user.last_login = when
+        with self.lock:
+            if self.background:
+                self.ensure_flusher()
+            self.buffer[user.pk] = when
+            if self.first_buffered is None:
+                self.first_buffered = time.monotonic()
+            due = (
+                len(self.buffer) >= self.get_max_buffer()
+                or time.monotonic() - self.first_buffered >= self.get_max_staleness()
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered login, one UPDATE per shard. Returns the number of users."""
+        with self.lock:
+            pending, self.buffer = self.buffer, {}
+            self.first_buffered = None
+        written = 0
+        for shard, user_ids in users_by_shard(pending).items():
+            try:
+                User.objects.using(shard).filter(pk__in=user_ids).update(
+                    last_login=Case(
+                        *[When(pk=pk, then=Value(pending[pk])) for pk in user_ids],
+                        output_field=DateTimeField(),
+                    )
+                )
+            except Exception:
+                logger.exception('Could not write %s buffered logins', len(user_ids))
+                with self.lock:
+                    # Newer logins buffered meanwhile win.
+                    self.buffer = {**{pk: pending[pk] for pk in user_ids}, **self.buffer}
+                    if self.first_buffered is None:
+                        self.first_buffered = time.monotonic()
+                continue
+            written += len(user_ids)
+        return written
+
+
+login_tracker = LoginTracker()
+
+atexit.register(login_tracker.flush)
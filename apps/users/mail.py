@@ -0,0 +1,46 @@
+"""Outbound mail dispatch, run from the job worker rather than the request thread."""
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from .jobs import enqueue_on_commit, register
+from .models import User
+from .verification import verification_url
+
+
+def send_messages(messages, batch_size=None):
+    """Send messages over a single backend connection, in batches. Returns the number sent."""
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    sent = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for start in range(0, len(messages), batch_size):
+            sent += connection.send_messages(messages[start:start + batch_size]) or 0
+    finally:
+        connection.close()
+    return sent
+
+
+def verification_message(user):
+    return EmailMessage(
+        subject='Verify your email',
+        body=(
+            f'Hi {user.first_name or user.username},\n\n'
+            f'Please confirm your email address by opening this link:\n\n'
+            f'{verification_url(user)}\n'
+        ),
+        to=[user.email],
+    )
+
+
+def queue_verification_email(user):
+    enqueue_on_commit('users.send_verification_email', {'user_id': user.pk})
+
+
+@register('users.send_verification_email', batch=True)
+def send_verification_emails(payloads):
+    users = User.objects.filter(
+        pk__in={payload['user_id'] for payload in payloads},
+        is_verified=False,
+    )
+    send_messages([verification_message(user) for user in users])
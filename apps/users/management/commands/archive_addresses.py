@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.archival import archive_inactive_addresses
+from apps.users.jobs import schedule_periodic
+
+
+class Command(BaseCommand):
+    help = 'Move long-inactive addresses to the archive table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ADDRESS_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks.')
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Schedule the periodic archival job in the job queue instead of running now.'
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            schedule_periodic('users.archive_inactive_addresses')
+            self.stdout.write('Address archival is scheduled.')
+            return
+
+        started = time.monotonic()
+        archived = archive_inactive_addresses(
+            older_than=timedelta(days=options['days']),
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+        )
+        self.stdout.write(f'Archived {archived} addresses in {time.monotonic() - started:.2f}s.')
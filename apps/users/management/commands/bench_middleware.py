@@ -0,0 +1,64 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+FULL_STACK = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+NO_MIDDLEWARE = []
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of each middleware profile on an API route.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per round.')
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument(
+            '--path', default='/users/me/',
+            help='Route to request (the default answers 401 without touching the database).'
+        )
+
+    def handle(self, *args, **options):
+        profiles = [
+            ('full stack', FULL_STACK),
+            ('path-scoped (settings.MIDDLEWARE)', settings.MIDDLEWARE),
+            ('no middleware (floor)', NO_MIDDLEWARE),
+        ]
+        # 4xx responses would otherwise be logged on every request.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        clients = []
+        for name, middleware in profiles:
+            with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']):
+                # Client() loads the middleware chain once, like a worker does.
+                client = Client()
+                client.get(options['path'])
+            clients.append((name, middleware, client))
+
+        # Best of several interleaved rounds, to keep warm-up and noise out of the comparison.
+        best = {name: float('inf') for name, _, _ in clients}
+        for _ in range(options['rounds']):
+            for name, middleware, client in clients:
+                with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']):
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        client.get(options['path'])
+                    elapsed = time.perf_counter() - started
+                best[name] = min(best[name], elapsed / options['requests'] * 1e6)
+        results = list(best.items())
+
+        floor = results[-1][1]
+        for name, per_request in results:
+            self.stdout.write(
+                f'{name:<36} {per_request:8.1f} us/request  (+{per_request - floor:.1f} us middleware)'
+            )
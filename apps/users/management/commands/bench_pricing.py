@@ -0,0 +1,51 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from apps.users import pricing
+
+
+class Command(BaseCommand):
+    help = 'Benchmark batch pricing against the per-item Decimal reference.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1_000_000, help='Number of price points.')
+        parser.add_argument('--users', type=int, default=10_000, help='Distinct user ids.')
+        parser.add_argument(
+            '--reference-size', type=int, default=100_000,
+            help='Price points priced with the Decimal reference (extrapolated to --size).'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        size = options['size']
+        user_ids = [rng.randrange(1, options['users'] + 1) for _ in range(size)]
+        prices = [rng.randrange(0, 10_000_000) for _ in range(size)]
+        # Synthetic discounts, so the benchmark does not depend on database content.
+        discounts = {
+            user_id: Decimal(rng.randrange(0, 5001)) / 100
+            for user_id in range(1, options['users'] + 1)
+        }
+
+        backend = 'numpy' if pricing.np is not None else 'pure python'
+        started = time.perf_counter()
+        fast = pricing.price_batch(user_ids, prices, discounts)
+        fast_elapsed = time.perf_counter() - started
+
+        reference_size = min(options['reference_size'], size)
+        started = time.perf_counter()
+        reference = pricing.price_batch_reference(
+            user_ids[:reference_size], prices[:reference_size], discounts
+        )
+        reference_elapsed = (time.perf_counter() - started) * size / max(reference_size, 1)
+
+        if list(fast[:reference_size]) != reference:
+            self.stderr.write('Batch pricing does not match the reference implementation.')
+
+        self.stdout.write(f'price points:     {size:,}')
+        self.stdout.write(f'batch ({backend}): {fast_elapsed * 1000:.1f} ms')
+        self.stdout.write(f'decimal reference: {reference_elapsed * 1000:.1f} ms (extrapolated)')
+        self.stdout.write(f'speedup:          {reference_elapsed / fast_elapsed:.1f}x')
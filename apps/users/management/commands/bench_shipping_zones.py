@@ -0,0 +1,63 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users import zones
+
+COUNTRIES = ['USA', 'Canada', 'Mexico', 'Germany', 'France']
+STATES = [f'State {number}' for number in range(20)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark compiled shipping zone resolution against the naive rule loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rules', type=int, default=5_000, help='Number of zone rules.')
+        parser.add_argument('--zones', type=int, default=50, help='Distinct zone ids.')
+        parser.add_argument('--addresses', type=int, default=100_000, help='Addresses to resolve.')
+        parser.add_argument(
+            '--reference-size', type=int, default=2_000,
+            help='Addresses resolved with the naive loop (extrapolated to --addresses).'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Synthetic rules, so the benchmark does not depend on database content.
+        rules = []
+        for rule_id in range(1, options['rules'] + 1):
+            start = rng.randrange(0, 99_000)
+            rules.append(zones.ZoneRule.create(
+                rule_id, rng.randrange(1, options['zones'] + 1), rng.choice(COUNTRIES),
+                rng.choice(STATES) if rng.random() < 0.5 else '',
+                start, start + rng.randrange(0, 5_000), rng.randrange(0, 3),
+            ))
+        locations = [
+            (rng.choice(COUNTRIES), rng.choice(STATES), rng.randrange(0, 100_000))
+            for _ in range(options['addresses'])
+        ]
+
+        started = time.perf_counter()
+        index = zones.ZoneIndex('bench', rules)
+        compile_elapsed = time.perf_counter() - started
+
+        backend = 'numpy' if zones.np is not None else 'bisect'
+        started = time.perf_counter()
+        fast = index.resolve_many(locations)
+        fast_elapsed = time.perf_counter() - started
+
+        reference_size = min(options['reference_size'], len(locations))
+        started = time.perf_counter()
+        reference = [zones.resolve_reference(rules, *location) for location in locations[:reference_size]]
+        reference_elapsed = (time.perf_counter() - started) * len(locations) / max(reference_size, 1)
+
+        if fast[:reference_size] != reference:
+            self.stderr.write('Compiled zone resolution does not match the naive rule loop.')
+
+        self.stdout.write(f'rules:            {len(rules):,}')
+        self.stdout.write(f'addresses:        {len(locations):,}')
+        self.stdout.write(f'compile:          {compile_elapsed * 1000:.1f} ms')
+        self.stdout.write(f'batch ({backend}):  {fast_elapsed * 1000:.1f} ms')
+        self.stdout.write(f'naive rule loop:  {reference_elapsed * 1000:.1f} ms (extrapolated)')
+        self.stdout.write(f'speedup:          {reference_elapsed / fast_elapsed:.1f}x')
@@ -0,0 +1,132 @@
+import os
+import statistics
+import time
+from pprint import pformat
+
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+from django.core.management.base import BaseCommand
+
+from apps.users.hashers import scrypt_maxmem
+
+PASSWORD = 'correct horse battery staple'
+
+# Never go below these, whatever the budget (OWASP password storage minimums).
+MINIMUMS = {
+    'pbkdf2_sha256': {'iterations': 600_000},
+    'scrypt': {'work_factor': 2 ** 14},
+    'argon2': {'time_cost': 2},
+}
+
+HASHER_PATHS = {
+    'pbkdf2_sha256': 'apps.users.hashers.CalibratedPBKDF2PasswordHasher',
+    'scrypt': 'apps.users.hashers.CalibratedScryptPasswordHasher',
+    'argon2': 'apps.users.hashers.CalibratedArgon2PasswordHasher',
+}
+
+# Stock algorithms of other Django defaults: kept last so their hashes still verify and get upgraded.
+LEGACY_HASHER_PATHS = [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
+def argon2_available():
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Pick password hasher work factors that fit a latency budget on this host.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250, help='Latency budget of one hash.')
+        parser.add_argument('--rounds', type=int, default=3, help='Timed hashes per measurement (median).')
+        parser.add_argument(
+            '--prefer', choices=sorted(HASHER_PATHS),
+            help='Hasher used for new hashes (default: argon2 when installed, else pbkdf2_sha256).'
+        )
+
+    def handle(self, *args, **options):
+        self.rounds = options['rounds']
+        target = options['target_ms'] / 1000
+        cores = os.cpu_count() or 1
+
+        calibrations = {
+            'pbkdf2_sha256': self.calibrate_pbkdf2,
+            'scrypt': self.calibrate_scrypt,
+        }
+        if argon2_available():
+            calibrations['argon2'] = self.calibrate_argon2
+        else:
+            self.stdout.write('argon2: skipped (argon2-cffi is not installed)')
+
+        parameters = {}
+        self.stdout.write(f'Budget {target * 1000:.0f} ms per hash, {cores} cores:')
+        for algorithm, calibrate in calibrations.items():
+            chosen, elapsed = calibrate(target)
+            parameters[algorithm] = chosen
+            per_core = 1 / elapsed
+            settings_text = ', '.join(f'{name}={value}' for name, value in chosen.items())
+            self.stdout.write(
+                f'  {algorithm:<14} {settings_text:<44} {elapsed * 1000:7.1f} ms  '
+                f'{per_core:6.1f} logins/s/core  {per_core * cores:7.1f} logins/s'
+            )
+            if elapsed > target * 1.1:
+                self.stdout.write(f'    above budget: the minimum for {algorithm} is slower than the target here.')
+
+        preferred = options['prefer'] or ('argon2' if 'argon2' in parameters else 'pbkdf2_sha256')
+        order = [preferred] + [algorithm for algorithm in HASHER_PATHS if algorithm != preferred]
+        self.stdout.write('\nSettings:')
+        self.stdout.write('PASSWORD_HASHERS = ' + pformat([HASHER_PATHS[algorithm] for algorithm in order] + LEGACY_HASHER_PATHS))
+        self.stdout.write('PASSWORD_HASHER_PARAMETERS = ' + pformat(parameters))
+
+    def measure(self, hasher):
+        salt = hasher.salt()
+        timings = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            hasher.encode(PASSWORD, salt)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def calibrate_pbkdf2(self, target):
+        # Cost is linear in the iterations: time a probe and scale it.
+        hasher = PBKDF2PasswordHasher()
+        hasher.iterations = 100_000
+        per_iteration = self.measure(hasher) / hasher.iterations
+        iterations = int(target / per_iteration) // 10_000 * 10_000
+        hasher.iterations = max(iterations, MINIMUMS['pbkdf2_sha256']['iterations'])
+        return {'iterations': hasher.iterations}, self.measure(hasher)
+
+    def calibrate_scrypt(self, target):
+        # Memory-hard: N doubles the memory and the time, so step by powers of two.
+        hasher = ScryptPasswordHasher()
+        hasher.block_size = 8
+        hasher.parallelism = 1
+        work_factor = MINIMUMS['scrypt']['work_factor']
+        hasher.work_factor, hasher.maxmem = work_factor, scrypt_maxmem(work_factor, hasher.block_size)
+        elapsed = self.measure(hasher)
+        while elapsed * 2 <= target:
+            work_factor *= 2
+            hasher.work_factor, hasher.maxmem = work_factor, scrypt_maxmem(work_factor, hasher.block_size)
+            elapsed = self.measure(hasher)
+        chosen = {'work_factor': work_factor, 'block_size': hasher.block_size, 'parallelism': hasher.parallelism}
+        return chosen, elapsed
+
+    def calibrate_argon2(self, target):
+        # Memory and lanes stay at Django's defaults; passes fill the budget.
+        hasher = Argon2PasswordHasher()
+        hasher.time_cost = MINIMUMS['argon2']['time_cost']
+        elapsed = self.measure(hasher)
+        while elapsed * (hasher.time_cost + 1) / hasher.time_cost <= target:
+            hasher.time_cost += 1
+            elapsed = self.measure(hasher)
+        chosen = {
+            'time_cost': hasher.time_cost,
+            'memory_cost': hasher.memory_cost,
+            'parallelism': hasher.parallelism,
+        }
+        return chosen, elapsed
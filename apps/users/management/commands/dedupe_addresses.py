@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.dedupe import dedupe_addresses
+
+
+class Command(BaseCommand):
+    help = 'Archive duplicate active addresses (same user and fingerprint), keeping the oldest.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Duplicate groups per transaction.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        groups, archived = dedupe_addresses(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            f'Archived {archived} duplicate addresses in {groups} groups '
+            f'in {time.monotonic() - started:.2f}s.'
+        )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.avatars import pending_avatars, process_avatar
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized variants of newly uploaded avatars.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new uploads instead of exiting.'
+        )
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = 0
+            for profile in pending_avatars().order_by('pk')[:options['batch_size']]:
+                process_avatar(profile)
+                processed += 1
+            if processed:
+                self.stdout.write(f'Processed {processed} avatars.')
+            if not options['loop']:
+                break
+            if processed < options['batch_size']:
+                time.sleep(options['interval'])
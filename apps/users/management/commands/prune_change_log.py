@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.changefeed import prune_change_log
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed entries older than the retention period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHANGE_LOG_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = prune_change_log(timedelta(days=options['days']))
+        self.stdout.write(f'Deleted {deleted} change log entries.')
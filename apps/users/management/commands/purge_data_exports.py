@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.exports import purge_expired_exports
+
+
+class Command(BaseCommand):
+    help = 'Delete the files and rows of expired data exports.'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_exports()
+        self.stdout.write(f'Deleted {deleted} data exports.')
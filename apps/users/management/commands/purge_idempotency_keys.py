@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete expired Idempotency-Key records and abandoned claims.'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(f'Deleted {deleted} idempotency keys.')
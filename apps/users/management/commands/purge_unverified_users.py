@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.retention import purge_unverified_users, stale_unverified_users
+
+
+class Command(BaseCommand):
+    help = 'Delete accounts that never verified their email, in small chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.UNVERIFIED_ACCOUNT_RETENTION_DAYS)
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument(
+            '--pause-factor', type=float, default=1.0,
+            help='Sleep this many times the duration of the last chunk between chunks.'
+        )
+        parser.add_argument('--max-pause', type=float, default=5.0, help='Longest pause between chunks (seconds).')
+        parser.add_argument('--max-chunks', type=int, help='Stop after this many chunks (resumable).')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the accounts to purge.')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days'])
+        if options['dry_run']:
+            self.stdout.write(f'{stale_unverified_users(older_than).count()} unverified accounts to purge.')
+            return
+
+        stats = purge_unverified_users(
+            older_than=older_than,
+            chunk_size=options['chunk_size'],
+            pause_factor=options['pause_factor'],
+            max_pause=options['max_pause'],
+            max_chunks=options['max_chunks'],
+        )
+        self.stdout.write(f'Purged {stats}.')
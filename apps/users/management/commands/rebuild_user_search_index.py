@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.users.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text user search index from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.monotonic()
+        with transaction.atomic():
+            indexed = backend.rebuild(chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Indexed {indexed} users with {type(backend).__name__} in {elapsed:.2f}s.'
+        )
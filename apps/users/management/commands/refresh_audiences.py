@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.audiences import refresh_segment
+from apps.users.models import MarketingSegment
+
+
+class Command(BaseCommand):
+    help = 'Refresh the materialized members of the marketing segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segment', type=int, action='append', help='Segment id (repeatable).')
+        parser.add_argument('--full', action='store_true', help='Rebuild instead of refreshing incrementally.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        segments = MarketingSegment.objects.order_by('pk')
+        if options['segment']:
+            segments = segments.filter(pk__in=options['segment'])
+        for segment in segments:
+            started = time.monotonic()
+            added, removed = refresh_segment(
+                segment,
+                chunk_size=options['chunk_size'],
+                full=options['full']
+            )
+            self.stdout.write(
+                f'{segment.name}: +{added} -{removed} in {time.monotonic() - started:.2f}s'
+            )
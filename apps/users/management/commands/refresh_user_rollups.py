@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.jobs import schedule_periodic
+from apps.users.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recount the analytics rollups of the users changed since the last refresh.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Schedule the periodic refresh job in the job queue instead of running now.'
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            schedule_periodic('users.refresh_user_rollups')
+            self.stdout.write('Rollup refresh is scheduled.')
+            return
+
+        started = time.monotonic()
+        days = refresh_rollups()
+        self.stdout.write(f'Refreshed {days} signup days in {time.monotonic() - started:.2f}s.')
@@ -0,0 +1,41 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.users.outbox import Relay, purge_published
+
+
+class Command(BaseCommand):
+    help = 'Publish outbox events to the configured sink.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Idle polling interval in seconds.')
+        parser.add_argument('--report-every', type=float, default=60.0, help='Seconds between throughput reports.')
+        parser.add_argument('--keep-days', type=int, default=7, help='Days to keep published events.')
+
+    def handle(self, *args, **options):
+        self.relay = relay = Relay(max_batch_size=options['batch_size'])
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        last_report = time.monotonic()
+        while not relay.stopping.is_set():
+            published = relay.stats.published
+            relay.drain()
+            if options['once']:
+                break
+            if time.monotonic() - last_report >= options['report_every']:
+                purge_published(timedelta(days=options['keep_days']))
+                self.stdout.write(str(relay.stats))
+                last_report = time.monotonic()
+            if relay.stats.published == published:
+                relay.wait(options['sleep'])
+        self.stdout.write(str(relay.stats))
+
+    def stop(self, signum, frame):
+        """Finish the current batch, then exit"""
+        self.relay.stop()
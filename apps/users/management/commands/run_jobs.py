@@ -0,0 +1,43 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run the database-backed background job worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the due jobs once and exit.')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--lease', type=int, default=300, help='Lease duration in seconds.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Idle polling interval in seconds.')
+        parser.add_argument('--name', action='append', dest='names', help='Only run these job names.')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while not self.stopping:
+            succeeded, failed = run_pending(
+                worker_id,
+                limit=options['batch_size'],
+                lease_seconds=options['lease'],
+                names=options['names'],
+            )
+            if succeeded or failed:
+                self.stdout.write(f'{succeeded} jobs done, {failed} failed.')
+            if options['once']:
+                break
+            if succeeded + failed < options['batch_size']:
+                time.sleep(options['sleep'])
+
+    def stop(self, signum, frame):
+        """Finish the current batch, then exit"""
+        self.stopping = True
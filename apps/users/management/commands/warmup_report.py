@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: setup, optional warm-up, then the first request.
+STARTUP_SCRIPT = '''
+import json, logging, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+setup = time.perf_counter() - started
+warm = 0.0
+if sys.argv[1] == '1':
+    from config.warmup import warm_up
+    warm = warm_up()
+from django.test import Client
+from django.test.utils import override_settings
+logging.getLogger('django.request').setLevel(logging.ERROR)
+with override_settings(ALLOWED_HOSTS=['testserver']):
+    client = Client()
+    request_started = time.perf_counter()
+    client.get(sys.argv[2])
+    first = time.perf_counter() - request_started
+    request_started = time.perf_counter()
+    client.get(sys.argv[2])
+    second = time.perf_counter() - request_started
+print(json.dumps({'setup': setup, 'warm_up': warm, 'first': first, 'second': second}))
+'''
+
+
+def memory_usage():
+    """Rss, Pss, shared and private memory of this process in kB (Linux only)."""
+    usage = {}
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                usage[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': usage.get('Rss', 0),
+        'pss': usage.get('Pss', 0),
+        'shared': usage.get('Shared_Clean', 0) + usage.get('Shared_Dirty', 0),
+        'private': usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Report startup time and per-worker memory with and without the warm-up hook.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Workers to fork for the memory report.')
+        parser.add_argument('--requests', type=int, default=50, help='Requests served by each worker.')
+        parser.add_argument('--path', default='/users/me/')
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup') or not hasattr(os, 'fork'):
+            raise CommandError('The memory report needs Linux (/proc/self/smaps_rollup and fork).')
+
+        self.stdout.write('Startup (fresh interpreter):')
+        for warm in (False, True):
+            result = self.measure_startup(warm, options['path'])
+            label = 'warm-up' if warm else 'lazy'
+            self.stdout.write(
+                f'  {label:<8} setup {result["setup"] * 1000:7.1f} ms  '
+                f'warm-up {result["warm_up"] * 1000:7.1f} ms  '
+                f'first request {result["first"] * 1000:7.1f} ms  '
+                f'second request {result["second"] * 1000:6.1f} ms'
+            )
+
+        self.stdout.write(f'Per-worker memory after {options["requests"]} requests (kB):')
+        for warm in (False, True):
+            workers = self.measure_workers(warm, options['workers'], options['requests'], options['path'])
+            label = 'warm-up + gc.freeze' if warm else 'lazy'
+            for index, usage in enumerate(workers):
+                self.stdout.write(
+                    f'  {label:<20} worker {index}: rss {usage["rss"]:7d}  pss {usage["pss"]:7d}  '
+                    f'shared {usage["shared"]:7d}  private {usage["private"]:7d}'
+                )
+
+    def measure_startup(self, warm, path):
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT, '1' if warm else '0', path],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def measure_workers(self, warm, count, requests, path):
+        """Fork `count` workers from a parent process and collect their memory usage."""
+        reader, writer = os.pipe()
+        parent = os.fork()
+        if parent == 0:
+            # Master process of this measurement: warm up (or not), then fork the workers.
+            os.close(reader)
+            if warm:
+                from config.warmup import warm_up
+                warm_up()
+            children = []
+            pipes = []
+            for _ in range(count):
+                child_reader, child_writer = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(child_reader)
+                    self.serve(requests, path)
+                    os.write(child_writer, json.dumps(memory_usage()).encode())
+                    os._exit(0)
+                os.close(child_writer)
+                children.append(pid)
+                pipes.append(child_reader)
+            results = []
+            for pid, pipe in zip(children, pipes):
+                with os.fdopen(pipe) as file:
+                    results.append(json.loads(file.read()))
+                os.waitpid(pid, 0)
+            os.write(writer, json.dumps(results).encode())
+            os._exit(0)
+        os.close(writer)
+        with os.fdopen(reader) as file:
+            results = json.loads(file.read())
+        os.waitpid(parent, 0)
+        return results
+
+    def serve(self, requests, path):
+        import logging
+
+        from django.test import Client
+        from django.test.utils import override_settings
+
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            for _ in range(requests):
+                client.get(path)
@@ -0,0 +1,156 @@
+"""
+Migration operations that keep large tables writable while they run.
+
+AddIndexOnline builds an index without blocking writes where the backend can:
+CREATE INDEX CONCURRENTLY on PostgreSQL (an invalid index left by an
+interrupted build is dropped and rebuilt on the next run) and ALGORITHM=INPLACE,
+LOCK=NONE on MySQL. Other backends (SQLite) get a plain CREATE INDEX.
+
+BackfillColumn fills a new column in primary key ranges, one transaction
+per range, sleeping after each range in proportion to the time it took (like
+retention.purge_unverified_users). Progress is stored in BackfillCheckpoint in
+the same transaction as the range, so a failed or interrupted migration
+resumes after the last committed range. Rows created while it runs must
+already be filled by the application (e.g. in save()).
+
+Both only pay off in migrations declared with `atomic = False`; otherwise
+every range commits with the whole migration.
+"""
+import time
+
+from django.db import NotSupportedError, transaction
+from django.db.migrations.operations import AddIndex
+from django.db.migrations.operations.base import Operation
+from django.db.models import Min
+from django.utils import timezone
+
+
+class AddIndexOnline(AddIndex):
+    """AddIndex that does not lock the table for writes."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        vendor = schema_editor.connection.vendor
+        if vendor == 'postgresql':
+            self.ensure_not_atomic(schema_editor)
+            valid = self.postgresql_index_state(schema_editor)
+            if valid:
+                return
+            if valid is not None:
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            schema_editor.add_index(model, self.index, concurrently=True)
+        elif vendor == 'mysql':
+            if self.index.contains_expressions and not schema_editor.connection.features.supports_expression_indexes:
+                return
+            statement = self.index.create_sql(model, schema_editor)
+            schema_editor.execute(f'{statement} ALGORITHM=INPLACE LOCK=NONE', params=None)
+        else:
+            schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor == 'postgresql':
+            self.ensure_not_atomic(schema_editor)
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, self.index)
+
+    def describe(self):
+        return f'{super().describe()} without blocking writes'
+
+    def ensure_not_atomic(self, schema_editor):
+        if schema_editor.connection.in_atomic_block:
+            raise NotSupportedError(
+                'AddIndexOnline can not run inside a transaction; set atomic = False on the migration.'
+            )
+
+    def postgresql_index_state(self, schema_editor):
+        """True if the index exists, False if a previous build left it invalid, None if missing."""
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s',
+                [self.index.name],
+            )
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
+
+class BackfillColumn(Operation):
+    """
+    Run `fill(queryset)` over the rows of `model_name`, one primary key range at a time.
+
+    `fill` receives a queryset of the historical model limited to one range
+    and writes the column (usually with update() or bulk_update()). `name`
+    identifies the backfill in BackfillCheckpoint together with the model.
+    """
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, model_name, name, fill, batch_size=1000, pause_factor=1.0, max_pause=5.0):
+        self.model_name = model_name
+        self.name = name
+        self.fill = fill
+        self.batch_size = batch_size
+        self.pause_factor = pause_factor
+        self.max_pause = max_pause
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'name': self.name, 'fill': self.fill}
+        if self.batch_size != 1000:
+            kwargs['batch_size'] = self.batch_size
+        if self.pause_factor != 1.0:
+            kwargs['pause_factor'] = self.pause_factor
+        if self.max_pause != 5.0:
+            kwargs['max_pause'] = self.max_pause
+        return (self.__class__.__name__, [], kwargs)
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def checkpoint_name(self, app_label):
+        return f'{app_label}.{self.model_name}.{self.name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        alias = schema_editor.connection.alias
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(alias, model):
+            return
+        checkpoints = to_state.apps.get_model('users', 'BackfillCheckpoint')._base_manager.using(alias)
+        checkpoint, _ = checkpoints.get_or_create(name=self.checkpoint_name(app_label))
+        if checkpoint.completed_at is not None:
+            return
+
+        rows = model._base_manager.using(alias)
+        # Ranges start at an existing pk, so gaps in the sequence cost one query.
+        low = rows.filter(pk__gt=checkpoint.last_pk).aggregate(low=Min('pk'))['low']
+        while low is not None:
+            high = low + self.batch_size
+            started = time.monotonic()
+            with transaction.atomic(using=alias):
+                self.fill(rows.filter(pk__gte=low, pk__lt=high))
+                checkpoints.filter(pk=checkpoint.pk).update(last_pk=high - 1, updated_at=timezone.now())
+            took = time.monotonic() - started
+            low = rows.filter(pk__gte=high).aggregate(low=Min('pk'))['low']
+            if low is not None and self.pause_factor:
+                time.sleep(min(took * self.pause_factor, self.max_pause))
+        checkpoints.filter(pk=checkpoint.pk).update(completed_at=timezone.now(), updated_at=timezone.now())
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # The column goes away with the reverse of its AddField; a new forward run starts over.
+        alias = schema_editor.connection.alias
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(alias, model):
+            return
+        checkpoints = from_state.apps.get_model('users', 'BackfillCheckpoint')._base_manager.using(alias)
+        checkpoints.filter(name=self.checkpoint_name(app_label)).delete()
+
+    def describe(self):
+        return f'Backfill {self.model_name}.{self.name} in primary key ranges'
+
+    @property
+    def migration_name_fragment(self):
+        return f'backfill_{self.model_name.lower()}_{self.name.lower()}'
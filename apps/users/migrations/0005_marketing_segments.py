@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_user_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketingSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SegmentMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['updated_at'], name='users_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('accepts_marketing', True), ('is_active', True), ('is_verified', True)), fields=['id'], name='users_user_audience_idx'),
+        ),
+        migrations.AddField(
+            model_name='marketingsegment',
+            name='customer_group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='users.customergroup'),
+        ),
+        migrations.AddField(
+            model_name='segmentmember',
+            name='segment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='users.marketingsegment'),
+        ),
+        migrations.AddField(
+            model_name='segmentmember',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segment_memberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='segmentmember',
+            constraint=models.UniqueConstraint(fields=('segment', 'user'), name='users_segment_member_unique'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAddress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('type', models.CharField(choices=[('shipping', 'Shipping'), ('billing', 'Billing'), ('both', 'Both')], max_length=10)),
+                ('street_address', models.CharField(max_length=200)),
+                ('apartment', models.CharField(blank=True, max_length=30)),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=100)),
+                ('postal_code', models.IntegerField()),
+                ('country', models.CharField(max_length=100)),
+                ('delivery_instructions', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'archived addresses',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='users_addr_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['updated_at'], name='users_addr_inactive_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedaddress',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_addresses', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:43
+
+from django.db import migrations, models
+
+from apps.users.normalization import ADDRESS_FINGERPRINT_FIELDS, address_fingerprint
+
+
+def fill_fingerprints(apps, schema_editor):
+    Address = apps.get_model('users', 'Address')
+    last_pk = 0
+    while True:
+        chunk = list(Address.objects.filter(pk__gt=last_pk).order_by('pk')[:1000])
+        if not chunk:
+            return
+        for address in chunk:
+            address.fingerprint = address_fingerprint(
+                *(getattr(address, field) for field in ADDRESS_FINGERPRINT_FIELDS)
+            )
+        Address.objects.bulk_update(chunk, ['fingerprint'])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_data_export'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'fingerprint'], name='users_addr_fingerprint_idx'),
+        ),
+    ]
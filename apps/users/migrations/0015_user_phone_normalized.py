@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:57
+
+import apps.users.models
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+from apps.users.normalization import normalize_phone
+
+
+def fill_phone_normalized(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    last_pk = 0
+    while True:
+        chunk = list(
+            User.objects.using(schema_editor.connection.alias).filter(pk__gt=last_pk).order_by('pk').only('pk', 'phone')[:1000]
+        )
+        if not chunk:
+            return
+        changed = []
+        for user in chunk:
+            user.phone_normalized = normalize_phone(user.phone, settings.PHONE_DEFAULT_COUNTRY_CODE)
+            if user.phone_normalized:
+                changed.append(user)
+        # One transaction per chunk (the migration is not atomic).
+        with transaction.atomic(using=schema_editor.connection.alias):
+            User.objects.using(schema_editor.connection.alias).bulk_update(changed, ['phone_normalized'])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0014_user_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', apps.users.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=15),
+        ),
+        migrations.RunPython(fill_phone_normalized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('phone_normalized', ''), _negated=True), fields=['phone_normalized'], name='users_user_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_user_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='shipping_zone_version',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='shipping_zone',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.shippingzone'),
+        ),
+        migrations.CreateModel(
+            name='ShippingZoneRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('postal_code_start', models.IntegerField(blank=True, null=True)),
+                ('postal_code_end', models.IntegerField(blank=True, null=True)),
+                ('priority', models.IntegerField(default=0)),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='users.shippingzone')),
+            ],
+        ),
+    ]
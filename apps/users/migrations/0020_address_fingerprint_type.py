@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+from django.db import migrations
+
+from apps.users.normalization import ADDRESS_FINGERPRINT_FIELDS, address_fingerprint
+
+
+def refill_fingerprints(apps, schema_editor):
+    """The fingerprint now includes the address type."""
+    Address = apps.get_model('users', 'Address')
+    addresses = Address.objects.using(schema_editor.connection.alias)
+    last_pk = 0
+    while True:
+        chunk = list(addresses.filter(pk__gt=last_pk).order_by('pk')[:1000])
+        if not chunk:
+            return
+        for address in chunk:
+            address.fingerprint = address_fingerprint(
+                *(getattr(address, field) for field in ADDRESS_FINGERPRINT_FIELDS)
+            )
+        addresses.bulk_update(chunk, ['fingerprint'])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(refill_fingerprints, migrations.RunPython.noop),
+    ]
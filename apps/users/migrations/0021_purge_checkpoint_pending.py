@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_address_fingerprint_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purgecheckpoint',
+            name='pending',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,10 +1,53 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, router
+from django.db.models.functions import Lower
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.utils import timezone
+
+from .normalization import ADDRESS_FINGERPRINT_FIELDS, address_fingerprint, normalize_phone
+from .querysets import ShardedQuerySet
+
+def canonical_phone(value):
+    return normalize_phone(value, settings.PHONE_DEFAULT_COUNTRY_CODE)
+
+class UserManager(BaseUserManager.from_queryset(ShardedQuerySet)):
+    def with_email(self, email):
+        """Users with this email in any letter case (served by users_user_email_lower_idx)."""
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+    def with_phone(self, phone):
+        """Users with this phone in any notation (an equality probe on users_user_phone_idx)."""
+        normalized = canonical_phone(phone)
+        if not normalized:
+            return self.none()
+        # Repeats the index condition: SQLite only uses a partial index the query implies.
+        return self.filter(phone_normalized=normalized).exclude(phone_normalized='')
+
+class ShardedModel(models.Model):
+    """Row owned by a user: stored on the user's shard when users are sharded (see sharding.py)."""
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def get_write_database(self, using=None):
+        from . import sharding
+
+        if sharding.enabled():
+            return router.db_for_write(type(self), instance=self)
+        return using or router.db_for_write(type(self), instance=self)
+
+    def save(self, *args, **kwargs):
+        kwargs['using'] = self.get_write_database(kwargs.get('using'))
+        super().save(*args, **kwargs)
 
 class User(AbstractUser):
     """Custom User for e-commerce"""
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=15, blank=True, null=True)
+    phone_normalized = models.CharField(max_length=15, blank=True, editable=False) # Set from phone in save().
     birth_date = models.DateField(null=True, blank=True)
     address = models.CharField(max_length=255)
 
@@ -14,11 +57,51 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserManager()
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Admin changelist ordering and filters.
+            models.Index(fields=['date_joined'], name='users_user_joined_idx'),
+            # Case-insensitive email lookups (UserManager.with_email).
+            models.Index(Lower('email'), name='users_user_email_lower_idx'),
+            models.Index(fields=['is_verified'], name='users_user_verified_idx'),
+            models.Index(fields=['accepts_marketing'], name='users_user_marketing_idx'),
+            # Incremental refreshes of derived data (marketing audiences).
+            models.Index(fields=['updated_at'], name='users_user_updated_idx'),
+            # Phone lookups (UserManager.with_phone); users without a phone are left out.
+            models.Index(
+                fields=['phone_normalized'],
+                name='users_user_phone_idx',
+                condition=~models.Q(phone_normalized=''),
+            ),
+            # Marketing audience: only the opted-in population is indexed.
+            models.Index(
+                fields=['id'],
+                name='users_user_audience_idx',
+                condition=models.Q(accepts_marketing=True, is_verified=True, is_active=True),
+            ),
+        ]
+
     def __str__(self):
         return self.email
+
+    def save(self, *args, **kwargs):
+        # QuerySet.update(phone=...) bypasses this: go through save() or recompute.
+        self.phone_normalized = canonical_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized'}
+        from . import sharding
+
+        if sharding.enabled():
+            # Id, shard and directory entry (see sharding.py).
+            sharding.save_user(self, super().save, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
     
     @property
     def full_name(self):
@@ -29,22 +112,78 @@ class User(AbstractUser):
         """Return all orders for this user"""
         return self.order_set.all()
     
+    @property
+    def active_addresses(self):
+        """Addresses that were not archived"""
+        return self.addresses.filter(is_active=True)
+
     @property
     def is_premium_customer(self):
         """Check if user has any premium orders"""
         return self.orders.filter(name__icontains='premium').exists()
 
-class UserProfile(models.Model):
+class UserProfile(ShardedModel):
     """Extended user profile"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar_variants = models.JSONField(default=dict, blank=True) # Resized variants, filled by the avatar worker.
     bio = models.TextField(max_length=500, blank=True)
     website = models.URLField(blank=True)
 
     def __str__(self):
         return f"{self.user.email}'s profile."
+
+    def save(self, *args, **kwargs):
+        if self.avatar and not self.avatar._committed:
+            # New upload: the worker will generate the variants again.
+            self.avatar_variants = {}
+            self._avatar_uploaded = True
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'avatar_variants'}
+        super().save(*args, **kwargs)
     
-class Address(models.Model):
+class ShippingZone(models.Model):
+    """Area with its own shipping rates; addresses are mapped to it by ShippingZoneRule."""
+    name = models.CharField(max_length=200)
+    is_active = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+class ShippingZoneRule(models.Model):
+    """
+    Postal code range of a country (optionally of one state) served by a zone.
+
+    When rules overlap the highest priority wins, then state rules over
+    country-wide ones, then the narrower range. See zones.py.
+    """
+    zone = models.ForeignKey(ShippingZone, on_delete=models.CASCADE, related_name='rules')
+    country = models.CharField(max_length=100)
+    state = models.CharField(max_length=100, blank=True) # Empty: every state of the country.
+    postal_code_start = models.IntegerField(null=True, blank=True) # Empty: no lower bound.
+    postal_code_end = models.IntegerField(null=True, blank=True) # Inclusive. Empty: no upper bound.
+    priority = models.IntegerField(default=0)
+
+    def clean(self):
+        if (
+            self.postal_code_start is not None and self.postal_code_end is not None
+            and self.postal_code_start > self.postal_code_end
+        ):
+            raise ValidationError({'postal_code_end': 'The range ends before it starts'})
+
+    def __str__(self):
+        return f'{self.zone}: {self.country} {self.state} {self.postal_code_start}-{self.postal_code_end}'.strip()
+
+class AddressQuerySet(ShardedQuerySet):
+    def active(self):
+        """Addresses that were not archived (served by the partial user index)."""
+        return self.filter(is_active=True)
+
+ADDRESS_ZONE_FIELDS = ['country', 'state', 'postal_code']
+
+class Address(ShardedModel):
     ADDRESS_TYPES = [
         ('shipping', 'Shipping'),
         ('billing', 'Billing'),
@@ -65,21 +204,105 @@ class Address(models.Model):
     is_active = models.BooleanField(default=True)
 
     delivery_instructions = models.TextField(blank=True)
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False) # See normalization.address_fingerprint.
+    # Resolved shipping zone, valid while shipping_zone_version is the current rules version (zones.py).
+    shipping_zone = models.ForeignKey(
+        ShippingZone, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+    shipping_zone_version = models.CharField(max_length=32, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AddressQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'addresses'
+        indexes = [
+            # Per-user listings only ever read active addresses.
+            models.Index(fields=['user'], name='users_addr_user_active_idx', condition=models.Q(is_active=True)),
+            # Default address of a user.
+            models.Index(fields=['user', 'is_default'], name='users_addr_user_default_idx'),
+            # Archival job: long-inactive addresses.
+            models.Index(fields=['updated_at'], name='users_addr_inactive_idx', condition=models.Q(is_active=False)),
+            # Duplicate detection: an index lookup per user and fingerprint.
+            models.Index(
+                fields=['user', 'fingerprint'],
+                name='users_addr_fingerprint_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.street_address}, {self.city} - {self.user.email} - {self.user.full_name}'
     
+    def compute_fingerprint(self):
+        return address_fingerprint(*(getattr(self, field) for field in ADDRESS_FINGERPRINT_FIELDS))
+
     def save(self, *args, **kwargs):
-        if self.is_default:
-            # Desactivar is_default en otras direcciones del mismo usuario
-            Address.objects.filter(user=self.user, is_default=True).exclude(pk=self.pk).update(is_default=False)
-        super().save(*args, **kwargs)
+        self.fingerprint = self.compute_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(ADDRESS_ZONE_FIELDS):
+            # The cached shipping zone is resolved again on the next lookup.
+            self.shipping_zone_version = ''
+        if update_fields is not None and set(update_fields) & set(ADDRESS_FINGERPRINT_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'fingerprint', 'shipping_zone_version'}
+        from . import sharding
+
+        using = kwargs['using'] = self.get_write_database(kwargs.get('using'))
+        addresses = Address.objects.using(using)
+        # The change-log entries and the outbox event commit with the address.
+        with sharding.shard_atomic(using):
+            became_default = False
+            if self.is_default:
+                became_default = self._state.adding or not addresses.filter(pk=self.pk, is_default=True).exists()
+                # Desactivar is_default en otras direcciones del mismo usuario
+                others = addresses.filter(user_id=self.user_id, is_default=True).exclude(pk=self.pk)
+                other_ids = list(others.values_list('pk', flat=True))
+                if other_ids:
+                    addresses.filter(pk__in=other_ids).update(is_default=False, updated_at=timezone.now())
+                    ChangeLogEntry.objects.bulk_create([
+                        ChangeLogEntry(kind='address', object_id=pk) for pk in other_ids
+                    ])
+            super().save(*args, **kwargs)
+            if became_default:
+                # Published to other services by the outbox relay
+                OutboxEvent.objects.create(
+                    topic='address.default_changed',
+                    key=str(self.user_id),
+                    payload={'user_id': self.user_id, 'address_id': self.pk},
+                )
+
+    def archive(self):
+        """Soft-delete: archived addresses are hidden and later moved to ArchivedAddress"""
+        self.is_active = False
+        self.is_default = False
+        self.save(update_fields=['is_active', 'is_default', 'updated_at'])
+
+class ArchivedAddress(ShardedModel):
+    """Address that stayed inactive long enough to leave the addresses table."""
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_addresses')
+    type = models.CharField(max_length=10, choices=Address.ADDRESS_TYPES)
+
+    street_address = models.CharField(max_length=200)
+    apartment = models.CharField(max_length=30, blank=True)
+    city = models.CharField(max_length=100)
+    state = models.CharField(max_length=100)
+    postal_code = models.IntegerField()
+    country = models.CharField(max_length=100)
+
+    delivery_instructions = models.TextField(blank=True)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'archived addresses'
+
+    def __str__(self):
+        return f'{self.street_address}, {self.city} (archived)'
     
 class CustomerGroup(models.Model):
     """Selected group for discounts and benefits."""
@@ -95,9 +318,242 @@ class CustomerGroup(models.Model):
     def __str__(self):
         return self.name
     
+class MarketingSegment(models.Model):
+    """Campaign audience: opted-in, verified and active users, optionally narrowed down."""
+    name = models.CharField(max_length=200)
+    customer_group = models.ForeignKey(
+        CustomerGroup,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='segments'
+    )
+    country = models.CharField(max_length=100, blank=True) # Users with an active address in this country.
+
+    refreshed_at = models.DateTimeField(null=True, blank=True) # Watermark of the last refresh.
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+class SegmentMember(ShardedModel):
+    """Materialized membership of a user in a marketing segment."""
+    segment = models.ForeignKey(MarketingSegment, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='segment_memberships')
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['segment', 'user'], name='users_segment_member_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} in {self.segment_id}'
+
 """Many to many relationship between User and Customer Group."""
 User.add_to_class('customer_groups', models.ManyToManyField(
     CustomerGroup,
     blank=True,
     related_name='users'
-))
\ No newline at end of file
+))
+
+class Job(models.Model):
+    """Background job, claimed by the run_jobs worker (see jobs.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now) # Not claimed before this time (retries back off).
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True) # Lease: expired leases can be claimed again.
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='users_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+class ChangeLogEntry(models.Model):
+    """Change of a user, profile or address; ids follow insert order, not commit order (see changefeed.py)."""
+    KIND_CHOICES = [
+        ('user', 'User'),
+        ('profile', 'Profile'),
+        ('address', 'Address'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False) # Tombstone.
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'change log entries'
+
+    def __str__(self):
+        return f'#{self.pk} {self.kind} {self.object_id}'
+
+
+class OutboxEvent(models.Model):
+    """Event written with the change that caused it, published by the outbox relay (see outbox.py)."""
+    topic = models.CharField(max_length=100)
+    key = models.CharField(max_length=100) # Ordering key for consumers, e.g. the user id.
+    payload = models.JSONField(default=dict)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # The relay only reads the unpublished head of the table.
+            models.Index(fields=['id'], name='users_outbox_pending_idx', condition=models.Q(published_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk}'
+
+
+class ShardDirectory(models.Model):
+    """Global email -> shard directory; its id is the user id (see sharding.py)."""
+    email = models.EmailField(unique=True)
+    shard = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'shard directory'
+
+    def __str__(self):
+        return f'{self.email} -> {self.shard}'
+
+
+class PurgeCheckpoint(models.Model):
+    """Progress of a chunked purge; a restarted purge resumes after last_pk."""
+    name = models.CharField(max_length=100, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0) # Rows deleted by the current run.
+    pending = models.JSONField(default=list, blank=True) # Ids of the chunk being deleted.
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} after #{self.last_pk}'
+
+
+class BackfillCheckpoint(models.Model):
+    """Progress of a chunked column backfill (migration_operations.BackfillColumn)."""
+    name = models.CharField(max_length=200, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} after #{self.last_pk}'
+
+
+class DataExport(ShardedModel):
+    """Archive of a user's data (access requests), built by a background job."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_exports')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='exports/', blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Export #{self.pk} of {self.user_id} ({self.status})'
+
+
+class UserRollup(models.Model):
+    """Users per signup day and dimension, maintained incrementally by rollups.py."""
+    DIMENSION_CHOICES = [
+        ('all', 'All users'),
+        ('customer_group', 'Customer group'),
+    ]
+
+    day = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=50, blank=True) # Customer group id; empty for 'all'.
+    users = models.PositiveIntegerField(default=0)
+    verified = models.PositiveIntegerField(default=0)
+    accepts_marketing = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also the index of the chart reads (dimension, value, day range).
+            models.UniqueConstraint(fields=['dimension', 'value', 'day'], name='users_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.dimension}={self.value}: {self.users}'
+
+
+class SnapshotVersion(models.Model):
+    """Current version of an in-process snapshot (e.g. the group catalog), shared by every process."""
+    name = models.CharField(max_length=100, unique=True)
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} {self.version}'
+
+
+class RollupWatermark(models.Model):
+    """Users updated before the watermark are already counted in the rollups."""
+    name = models.CharField(max_length=100, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} at {self.watermark}'
+
+
+class IdempotencyKey(models.Model):
+    """Claim and stored response of an Idempotency-Key (see idempotency.py)."""
+    STATE_CHOICES = [
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ]
+
+    scope = models.CharField(max_length=50)
+    owner = models.CharField(max_length=50) # User id, or 'anonymous'.
+    key_hash = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=128)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='running')
+    status = models.PositiveSmallIntegerField(null=True, blank=True)
+    data = models.JSONField(null=True, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    locked_until = models.DateTimeField() # A running claim older than this was abandoned.
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Concurrent requests with one key race on this index; exactly one insert wins.
+            models.UniqueConstraint(fields=['scope', 'owner', 'key_hash'], name='users_idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.scope} {self.owner} {self.key_hash[:12]} ({self.state})'
@@ -0,0 +1,48 @@
+"""
+Normalization of user-entered values.
+
+Pure functions with no model imports, so models can use them in save().
+"""
+import hashlib
+import unicodedata
+
+ADDRESS_FINGERPRINT_FIELDS = ['street_address', 'apartment', 'city', 'state', 'postal_code', 'country', 'type']
+
+E164_MAX_DIGITS = 15
+NATIONAL_MAX_DIGITS = 10
+
+
+def normalize_text(value):
+    """Unicode-compatible, casefolded, with whitespace collapsed to single spaces."""
+    value = unicodedata.normalize('NFKC', str(value if value is not None else ''))
+    return ' '.join(value.casefold().split())
+
+
+def address_fingerprint(street_address, apartment, city, state, postal_code, country, address_type):
+    """Hex digest identifying an address of one type regardless of case and spacing."""
+    parts = [
+        normalize_text(part)
+        for part in (street_address, apartment, city, state, postal_code, country, address_type)
+    ]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+
+def normalize_phone(value, default_country_code=''):
+    """
+    Digits of the phone in E.164 form (country code first, no '+'), or ''.
+
+    Numbers written with '+' or '00' are international as typed. Otherwise a
+    trunk '0' is dropped and, if the rest fits a national number, the default
+    country code is prepended: '(555) 123-4567' and '+1 555 123 4567' are
+    both '15551234567' with default_country_code='1'.
+    """
+    value = str(value or '').strip()
+    digits = ''.join(filter(str.isdigit, value))
+    if value.startswith('+'):
+        return digits
+    if digits.startswith('00'):
+        return digits[2:]
+    digits = digits.lstrip('0')
+    if digits and default_country_code and len(digits) <= NATIONAL_MAX_DIGITS:
+        digits = f'{default_country_code}{digits}'
+    return digits
@@ -0,0 +1,235 @@
+"""
+Transactional outbox for user lifecycle events.
+
+Events are inserted in the same transaction as the change they describe, so
+they are published if and only if the change commits, and the request never
+waits on other services. The relay drains the outbox in id order and hands
+batches to a sink configured with OUTBOX_SINK:
+
+    OUTBOX_SINK = {
+        'BACKEND': 'apps.users.outbox.FileSink',
+        'OPTIONS': {'path': BASE_DIR / 'outbox.jsonl'},
+    }
+
+A sink raises SinkBusy to apply backpressure (the relay shrinks its batches
+and waits, longer after each busy answer in a row, up to busy_max_delay) and
+any other exception to fail the batch (retried with backoff). Relay.stop(),
+e.g. from a signal handler, ends a drain after the current batch and cuts
+its waits short. Delivery is at-least-once; consumers deduplicate on the
+event id.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def emit(topic, key, payload):
+    """Write an event; call it inside the transaction of the change it describes."""
+    return OutboxEvent.objects.create(topic=topic, key=str(key), payload=payload)
+
+
+def event_message(event):
+    return {
+        'id': event.pk,
+        'topic': event.topic,
+        'key': event.key,
+        'payload': event.payload,
+        'created_at': event.created_at,
+    }
+
+
+class SinkBusy(Exception):
+    """The sink can not take more events right now."""
+
+
+class BaseSink:
+
+    def publish(self, events):
+        raise NotImplementedError
+
+
+class LogSink(BaseSink):
+    """Writes events to the log (default, for development)."""
+
+    def publish(self, events):
+        for event in events:
+            logger.info('Outbox event %s %s', event.topic, json.dumps(event_message(event), cls=DjangoJSONEncoder))
+
+
+class FileSink(BaseSink):
+    """Appends events as JSON lines to a file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def publish(self, events):
+        lines = ''.join(json.dumps(event_message(event), cls=DjangoJSONEncoder) + '\n' for event in events)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(lines)
+
+
+class HttpSink(BaseSink):
+    """POSTs each batch as a JSON array; 429 and 503 responses apply backpressure."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def publish(self, events):
+        body = json.dumps([event_message(event) for event in events], cls=DjangoJSONEncoder).encode()
+        request = urllib.request.Request(
+            self.url, data=body, method='POST', headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except urllib.error.HTTPError as error:
+            if error.code in (429, 503):
+                raise SinkBusy(str(error)) from error
+            raise
+
+
+class QueueSink(BaseSink):
+    """Puts events on an in-process queue; a full queue applies backpressure."""
+
+    def __init__(self, maxsize=10000, queue_object=None):
+        self.queue = queue_object if queue_object is not None else queue.Queue(maxsize=maxsize)
+
+    def publish(self, events):
+        if self.queue.maxsize and self.queue.maxsize - self.queue.qsize() < len(events):
+            raise SinkBusy('Queue is full')
+        for event in events:
+            self.queue.put_nowait(event_message(event))
+
+
+def get_sink():
+    config = getattr(settings, 'OUTBOX_SINK', {'BACKEND': 'apps.users.outbox.LogSink'})
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+@dataclass
+class RelayStats:
+    published: int = 0
+    failed_batches: int = 0
+    busy: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Published events per second."""
+        return self.published / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.published} events in {self.batches} batches '
+            f'({self.rate:.0f}/s), {self.failed_batches} failed, {self.busy} busy'
+        )
+
+
+class Relay:
+    """
+    Drains the outbox in order.
+
+    The batch size grows back to `max_batch_size` after successful batches and
+    is halved when the sink is busy. A failing batch blocks the events behind
+    it until its retry, so consumers see events in order.
+    """
+    retry_base_delay = 1.0
+    retry_max_delay = 300.0
+
+    def __init__(self, sink=None, max_batch_size=500, busy_delay=0.5, busy_max_delay=30.0):
+        self.sink = sink or get_sink()
+        self.max_batch_size = max_batch_size
+        self.batch_size = max_batch_size
+        self.busy_delay = busy_delay
+        self.busy_max_delay = busy_max_delay
+        self.busy_streak = 0
+        self.stopping = threading.Event()
+        self.stats = RelayStats()
+
+    def stop(self):
+        """Finish the current batch, then return from drain()."""
+        self.stopping.set()
+
+    def wait(self, seconds):
+        """Sleep unless stop() is called first. Returns True if the relay is stopping."""
+        return self.stopping.wait(seconds)
+
+    def pending(self):
+        return OutboxEvent.objects.filter(published_at__isnull=True).order_by('pk')
+
+    def run_once(self):
+        """Publish one batch. Returns the number of events published."""
+        events = list(self.pending()[:self.batch_size])
+        if not events:
+            return 0
+        now = timezone.now()
+        if events[0].next_attempt_at and events[0].next_attempt_at > now:
+            return 0
+
+        try:
+            self.sink.publish(events)
+        except SinkBusy:
+            self.stats.busy += 1
+            self.batch_size = max(1, self.batch_size // 2)
+            self.wait(min(self.busy_delay * 2 ** self.busy_streak, self.busy_max_delay))
+            self.busy_streak += 1
+            return 0
+        except Exception as error:
+            logger.exception('Outbox batch starting at event %s failed', events[0].pk)
+            self.stats.failed_batches += 1
+            head = events[0]
+            delay = min(self.retry_base_delay * 2 ** head.attempts, self.retry_max_delay)
+            OutboxEvent.objects.filter(pk=head.pk).update(
+                attempts=head.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=delay),
+                last_error=repr(error),
+            )
+            return 0
+
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(published_at=now)
+        self.stats.published += len(events)
+        self.stats.batches += 1
+        self.busy_streak = 0
+        self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+        return len(events)
+
+    def drain(self, max_batches=None):
+        """Publish until the outbox is empty or blocked by a retry, `max_batches` ran, or stop() is called."""
+        batches = 0
+        while not self.stopping.is_set() and (max_batches is None or batches < max_batches):
+            busy = self.stats.busy
+            published = self.run_once()
+            batches += 1
+            if not published and self.stats.busy == busy:
+                break
+        return self.stats
+
+
+def purge_published(older_than):
+    """Delete published events older than `older_than`."""
+    deleted, _ = OutboxEvent.objects.filter(
+        published_at__isnull=False,
+        published_at__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
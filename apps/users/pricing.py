@@ -0,0 +1,98 @@
+"""
+Batch pricing with customer group discounts.
+
+Prices are columnar: a sequence of user ids and a parallel sequence of base
+prices in integer cents. Discounts are resolved once per distinct user (see
+groups.best_discount_for) and applied with integer arithmetic:
+
+    discounted = round_half_up(price * (100% - discount))
+
+Discount percentages have two decimal places, so they are handled as integer
+basis points (12.50% -> 1250) and the result is exact. NumPy is used when it
+is installed; otherwise the same arithmetic runs over Python lists.
+`price_batch_reference` is the slow Decimal implementation the fast path is
+tested against.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from .groups import best_discount_for
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+BASIS_POINTS = 10000
+
+
+def to_basis_points(discount_percentage):
+    """12.50 (percent) -> 1250"""
+    return int((Decimal(discount_percentage) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def discount_basis_points(user_ids, discounts=None):
+    """
+    Discount of every position, in basis points.
+
+    `discounts` maps user id -> discount percentage; when omitted it is
+    resolved with one query for the distinct user ids.
+    """
+    if np is not None:
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        unique_ids, inverse = np.unique(user_ids, return_inverse=True)
+        if discounts is None:
+            discounts = best_discount_for(unique_ids.tolist())
+        unique_bp = np.fromiter(
+            (to_basis_points(discounts.get(user_id, 0)) for user_id in unique_ids.tolist()),
+            dtype=np.int64,
+            count=len(unique_ids),
+        )
+        return unique_bp[inverse]
+
+    user_ids = list(user_ids)
+    if discounts is None:
+        discounts = best_discount_for(set(user_ids))
+    basis_points = {user_id: to_basis_points(discounts.get(user_id, 0)) for user_id in set(user_ids)}
+    return [basis_points[user_id] for user_id in user_ids]
+
+
+def apply_discounts(prices_cents, basis_points):
+    """Discounted prices in cents, rounded half up."""
+    if np is not None:
+        prices_cents = np.asarray(prices_cents, dtype=np.int64)
+        basis_points = np.asarray(basis_points, dtype=np.int64)
+        if prices_cents.shape != basis_points.shape:
+            raise ValueError('prices_cents and basis_points must have the same length')
+        if (prices_cents < 0).any():
+            raise ValueError('Prices can not be negative')
+        return (prices_cents * (BASIS_POINTS - basis_points) + BASIS_POINTS // 2) // BASIS_POINTS
+
+    prices_cents = list(prices_cents)
+    basis_points = list(basis_points)
+    if len(prices_cents) != len(basis_points):
+        raise ValueError('prices_cents and basis_points must have the same length')
+    if any(price < 0 for price in prices_cents):
+        raise ValueError('Prices can not be negative')
+    return [
+        (price * (BASIS_POINTS - bp) + BASIS_POINTS // 2) // BASIS_POINTS
+        for price, bp in zip(prices_cents, basis_points)
+    ]
+
+
+def price_batch(user_ids, prices_cents, discounts=None):
+    """Price many (user, base price) pairs at once. Returns prices in cents."""
+    return apply_discounts(prices_cents, discount_basis_points(user_ids, discounts))
+
+
+def price_batch_reference(user_ids, prices_cents, discounts=None):
+    """Per-item Decimal implementation of price_batch (slow, for tests and benchmarks)."""
+    if discounts is None:
+        discounts = best_discount_for(set(user_ids))
+    prices = []
+    for user_id, price in zip(user_ids, prices_cents):
+        if price < 0:
+            raise ValueError('Prices can not be negative')
+        discount = Decimal(discounts.get(user_id, 0))
+        discounted = Decimal(price) * (Decimal(100) - discount) / Decimal(100)
+        prices.append(int(discounted.quantize(Decimal('1'), rounding=ROUND_HALF_UP)))
+    return prices
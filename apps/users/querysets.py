@@ -0,0 +1,198 @@
+"""
+Querysets of the models stored on the user shards (see sharding.py).
+
+Related managers (user.addresses), saved instances and explicit using()
+reach the right shard through UserShardRouter. A queryset with none of them,
+e.g. User.objects.filter(email=...), has no owner to route by: with sharding
+enabled it runs on every shard and the results are combined. Rows are merged
+in the queryset's order when it is ordered by plain fields (shard by shard
+otherwise), slices are taken after the merge, and counts, update() and
+delete() add up the shards. aggregate() combines Count, Sum, Min and Max;
+annotate() groups are still computed per shard, so grouped reports walk
+sharding.get_shards() themselves. Creates go to the owner's shard.
+"""
+from itertools import chain
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import NotSupportedError, router
+from django.db.models import Count, Max, Min, QuerySet, Sum
+from django.db.models.query import FlatValuesListIterable, ModelIterable, ValuesIterable
+
+COMBINE_AGGREGATES = {Count: sum, Sum: sum, Min: min, Max: max}
+
+
+def row_getter(queryset, name):
+    """Function reading ordering field `name` from a result row of `queryset`, or None."""
+    meta = queryset.model._meta
+    if name == 'pk':
+        name = meta.pk.name
+    if name in queryset.query.annotations:
+        attname = name
+    else:
+        try:
+            attname = meta.get_field(name).attname
+        except FieldDoesNotExist:
+            return None
+    if issubclass(queryset._iterable_class, ModelIterable):
+        return lambda row: getattr(row, attname)
+    names = list(queryset._fields or [field.attname for field in meta.concrete_fields])
+    names = [meta.pk.name if field == 'pk' else field for field in names]
+    for candidate in (name, attname):
+        if candidate in names:
+            if issubclass(queryset._iterable_class, ValuesIterable):
+                return lambda row: row[candidate]
+            if issubclass(queryset._iterable_class, FlatValuesListIterable):
+                return lambda row: row
+            position = names.index(candidate)
+            return lambda row: row[position]
+    return None
+
+
+class ShardedQuerySet(QuerySet):
+    """QuerySet that runs on every user shard when nothing routes it to one."""
+
+    def shards(self):
+        """Databases this queryset runs on, or None when it runs on one database."""
+        if self._db is not None or self._hints:
+            return None
+        from . import sharding
+
+        if not sharding.enabled():
+            return None
+        shards = sharding.get_shards()
+        return shards if len(shards) > 1 else None
+
+    def merge(self, rows):
+        """Sort rows of several shards in the queryset's order (NULLs first); unsortable orders are kept."""
+        if self.query.order_by:
+            ordering = self.query.order_by
+        elif self.query.default_ordering:
+            ordering = self.model._meta.ordering
+        else:
+            ordering = ()
+        keys = []
+        for field in ordering:
+            if not isinstance(field, str) or field == '?' or '__' in field:
+                return rows
+            getter = row_getter(self, field.lstrip('-'))
+            if getter is None:
+                return rows
+            keys.append((getter, field.startswith('-')))
+        for getter, descending in reversed(keys):
+            rows.sort(key=lambda row: (getter(row) is not None, getter(row)), reverse=descending)
+        return rows
+
+    def _fetch_all(self):
+        shards = self.shards() if self._result_cache is None else None
+        if shards is None:
+            return super()._fetch_all()
+        low, high = self.query.low_mark, self.query.high_mark
+        rows = []
+        for shard in shards:
+            queryset = self.using(shard)
+            queryset.query.clear_limits()
+            if high is not None:
+                queryset.query.set_limits(high=high)
+            rows.extend(queryset)
+        rows = self.merge(rows)
+        if self.query.distinct and self._fields:
+            # Equal values can come from several shards.
+            unique = {}
+            for row in rows:
+                unique.setdefault(tuple(row.items()) if isinstance(row, dict) else row, row)
+            rows = list(unique.values())
+        self._result_cache = rows[low:high]
+        self._prefetch_done = True
+
+    def iterator(self, chunk_size=None):
+        """Stream shard after shard (sharding.fanout() streams in order)."""
+        shards = self.shards()
+        if shards is None:
+            return super().iterator(chunk_size=chunk_size)
+        return chain.from_iterable(self.using(shard).iterator(chunk_size=chunk_size) for shard in shards)
+
+    def count(self):
+        shards = self.shards()
+        if shards is None or self._result_cache is not None:
+            return super().count()
+        if self.query.is_sliced or (self.query.distinct and self._fields):
+            return len(self)
+        return sum(self.using(shard).count() for shard in shards)
+
+    def exists(self):
+        shards = self.shards()
+        if shards is None or self._result_cache is not None:
+            return super().exists()
+        return any(self.using(shard).exists() for shard in shards)
+
+    def aggregate(self, *args, **kwargs):
+        shards = self.shards()
+        if shards is None:
+            return super().aggregate(*args, **kwargs)
+        for arg in args:
+            kwargs[arg.default_alias] = arg
+        for alias, aggregate in kwargs.items():
+            if type(aggregate) not in COMBINE_AGGREGATES or getattr(aggregate, 'distinct', False):
+                raise NotSupportedError(f'{alias}: {aggregate!r} can not be combined across user shards.')
+        results = [self.using(shard).aggregate(**kwargs) for shard in shards]
+        combined = {}
+        for alias, aggregate in kwargs.items():
+            values = [result[alias] for result in results if result[alias] is not None]
+            combined[alias] = COMBINE_AGGREGATES[type(aggregate)](values) if values else None
+        return combined
+
+    def update(self, **kwargs):
+        shards = self.shards()
+        if shards is None:
+            return super().update(**kwargs)
+        return sum(self.using(shard).update(**kwargs) for shard in shards)
+
+    update.alters_data = True
+
+    def delete(self):
+        shards = self.shards()
+        if shards is None:
+            return super().delete()
+        deleted = 0
+        per_model = {}
+        for shard in shards:
+            count, counts = self.using(shard).delete()
+            deleted += count
+            for label, value in counts.items():
+                per_model[label] = per_model.get(label, 0) + value
+        return deleted, per_model
+
+    delete.alters_data = True
+
+    def create(self, **kwargs):
+        if self.shards() is None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        # Model.save() asks the router, which places the row with its owner.
+        obj.save(force_insert=True)
+        return obj
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if self.shards() is None:
+            return super().bulk_create(objs, *args, **kwargs)
+        objs = list(objs)
+        by_shard = {}
+        for obj in objs:
+            by_shard.setdefault(router.db_for_write(self.model, instance=obj), []).append(obj)
+        for shard, shard_objs in by_shard.items():
+            self.using(shard).bulk_create(shard_objs, *args, **kwargs)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if self.shards() is None:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        by_shard = {}
+        for obj in objs:
+            by_shard.setdefault(obj._state.db or router.db_for_write(self.model, instance=obj), []).append(obj)
+        return sum(
+            self.using(shard).bulk_update(shard_objs, fields, *args, **kwargs)
+            for shard, shard_objs in by_shard.items()
+        )
+
+    bulk_update.alters_data = True
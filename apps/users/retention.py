@@ -0,0 +1,208 @@
+"""
+Retention of unverified signups.
+
+Accounts that never verified their email are deleted once they are older
+than UNVERIFIED_ACCOUNT_RETENTION_DAYS. The purge walks the users table in
+primary key order, a chunk per short transaction, and deletes each chunk
+with plain DELETE ... WHERE user_id IN (...) statements, children first,
+instead of Django's collector (which loads every related row and sends a
+signal per object). After each chunk it sleeps in proportion to how long the
+chunk took, so a slow database gets more room, and it records the last
+purged id in a PurgeCheckpoint so an interrupted run resumes where it stopped.
+With sharded users (sharding.py) the chunks are merged from every shard in
+id order and each shard deletes its part of a chunk in its own transaction.
+The directory entries, tombstones and search entries of the chunk follow
+once the shards committed; the chunk's ids are recorded in the checkpoint
+beforehand, so if that last step fails the next run finishes it.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import sharding
+from .changefeed import record_changes
+from .models import Address, PurgeCheckpoint, User, UserProfile
+from .search import get_search_backend
+
+CHECKPOINT_NAME = 'unverified-users'
+
+
+class PurgeBlocked(Exception):
+    """A relation forbids deleting the rows (PROTECT, RESTRICT, SET_DEFAULT)."""
+
+
+@dataclass
+class PurgeStats:
+    deleted: int = 0
+    chunks: int = 0
+    paused: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Deleted users per second, pauses included."""
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.deleted} users in {self.chunks} chunks, {self.elapsed:.1f}s '
+            f'({self.rate:.0f}/s, {self.paused:.1f}s paused)'
+        )
+
+
+def stale_unverified_users(older_than=None):
+    if older_than is None:
+        older_than = timedelta(days=settings.UNVERIFIED_ACCOUNT_RETENTION_DAYS)
+    return User.objects.filter(
+        is_verified=False,
+        is_staff=False,
+        is_superuser=False,
+        date_joined__lt=timezone.now() - older_than,
+    )
+
+
+def raw_delete(model, queryset):
+    """Delete `queryset` and everything that cascades from it, without loading any row."""
+    database = queryset.db
+    for relation in model._meta.related_objects:
+        related = relation.related_model._base_manager.using(database).filter(
+            **{f'{relation.field.name}__in': queryset}
+        )
+        if relation.many_to_many:
+            through = relation.field.remote_field.through
+            through._base_manager.using(database).filter(
+                **{f'{relation.field.m2m_reverse_field_name()}__in': queryset}
+            )._raw_delete(database)
+        elif relation.on_delete is models.CASCADE:
+            raw_delete(relation.related_model, related)
+        elif relation.on_delete is models.SET_NULL:
+            related.update(**{relation.field.name: None})
+        elif relation.on_delete is not models.DO_NOTHING:
+            raise PurgeBlocked(f'{relation.related_model.__name__}.{relation.field.name}')
+    for m2m in model._meta.many_to_many:
+        through = m2m.remote_field.through
+        through._base_manager.using(database).filter(**{f'{m2m.m2m_field_name()}__in': queryset})._raw_delete(
+            database
+        )
+    queryset._raw_delete(database)
+
+
+def forget_purged_users(user_ids):
+    """Rows of deleted users outside their shard: change feed tombstones, search index, directory and admin log."""
+    record_changes('user', user_ids, deleted=True)
+    get_search_backend().remove_users(user_ids)
+    if sharding.enabled():
+        sharding.forget_users(user_ids)
+        # Cascaded by raw_delete() when users live on the default database only.
+        LogEntry.objects.filter(user_id__in=user_ids).delete()
+
+
+def finish_pending_chunk(checkpoint):
+    """
+    Complete a chunk whose shard deletes committed but whose checkpoint
+    update did not: its users that are gone from their shard are forgotten.
+    Returns their number.
+    """
+    if not checkpoint.pending:
+        return 0
+    gone = []
+    for shard, shard_user_ids in sharding.users_by_shard(checkpoint.pending).items():
+        found = set(User._base_manager.using(shard).filter(pk__in=shard_user_ids).values_list('pk', flat=True))
+        gone.extend(user_id for user_id in shard_user_ids if user_id not in found)
+    with transaction.atomic():
+        forget_purged_users(gone)
+        checkpoint.deleted += len(gone)
+        checkpoint.pending = []
+        checkpoint.save(update_fields=['deleted', 'pending', 'updated_at'])
+    return len(gone)
+
+
+def purge_chunk(stale_users, user_ids, checkpoint):
+    """
+    Delete the given users that are still in `stale_users`, with their rows,
+    and move the checkpoint past the chunk, in one transaction per shard
+    (nested in the checkpoint's). Returns the number of users deleted.
+
+    The ids were selected before the transaction, so users verified or made
+    staff since then are filtered out again (and locked where the database
+    supports it) before anything is deleted.
+    """
+    last_pk = user_ids[-1]
+    checkpoint.pending = user_ids
+    checkpoint.save(update_fields=['pending', 'updated_at'])
+    deleted = []
+    with transaction.atomic():
+        for shard, shard_user_ids in sharding.users_by_shard(user_ids).items():
+            with transaction.atomic(using=shard):
+                shard_user_ids = list(
+                    stale_users.using(shard).select_for_update().filter(pk__in=shard_user_ids)
+                    .order_by('pk').values_list('pk', flat=True)
+                )
+                # Tombstones for the change feed (the collector's signals are skipped).
+                profile_ids = list(
+                    UserProfile.objects.using(shard).filter(user_id__in=shard_user_ids).values_list('pk', flat=True)
+                )
+                address_ids = list(
+                    Address.objects.using(shard).filter(user_id__in=shard_user_ids).values_list('pk', flat=True)
+                )
+                raw_delete(User, User._base_manager.using(shard).filter(pk__in=shard_user_ids))
+            record_changes('profile', profile_ids, deleted=True)
+            record_changes('address', address_ids, deleted=True)
+            deleted.extend(shard_user_ids)
+        # The shard chunks are committed: now the rows on the other databases.
+        forget_purged_users(deleted)
+        checkpoint.last_pk = last_pk
+        checkpoint.deleted += len(deleted)
+        checkpoint.pending = []
+        checkpoint.save(update_fields=['last_pk', 'deleted', 'pending', 'updated_at'])
+    return len(deleted)
+
+
+def purge_unverified_users(older_than=None, chunk_size=200, pause_factor=1.0, max_pause=5.0, max_chunks=None):
+    """
+    Delete stale unverified accounts in primary key order. Returns PurgeStats.
+
+    After a chunk that took t seconds the purge sleeps t * pause_factor
+    (at most max_pause), so with the default factor it keeps the database
+    busy at most half of the time.
+    """
+    stats = PurgeStats()
+    checkpoint, _ = PurgeCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    if checkpoint.started_at is None:
+        checkpoint.started_at = timezone.now()
+        checkpoint.deleted = 0
+        checkpoint.save(update_fields=['started_at', 'deleted', 'updated_at'])
+    stats.deleted += finish_pending_chunk(checkpoint)
+
+    stale_users = stale_unverified_users(older_than)
+    while max_chunks is None or stats.chunks < max_chunks:
+        # User ids are global, so the shards are walked as one pk ordered table.
+        candidates = stale_users.filter(pk__gt=checkpoint.last_pk).only('pk')
+        user_ids = [user.pk for user in sharding.fanout(candidates, 'pk', limit=chunk_size)]
+        if not user_ids:
+            # Finished: the next run starts from the beginning again.
+            PurgeCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                last_pk=0, started_at=None, updated_at=timezone.now()
+            )
+            break
+
+        started = time.monotonic()
+        deleted = purge_chunk(stale_users, user_ids, checkpoint)
+        took = time.monotonic() - started
+
+        stats.deleted += deleted
+        stats.chunks += 1
+        pause = min(took * pause_factor, max_pause)
+        if pause:
+            time.sleep(pause)
+            stats.paused += pause
+    return stats
@@ -0,0 +1,150 @@
+"""
+Analytics rollups of users by signup day.
+
+UserRollup keeps, per signup day, the number of users and how many of them
+are verified and accept marketing, for all users and per customer group.
+Dashboards read these few rows instead of grouping users_user. The refresh
+job only looks at users updated since its watermark: it finds their signup
+days and recounts those days (an index range each), so the work follows the
+rate of changes, not the size of the table. Hard deletes do not bump
+updated_at, so a periodic backfill is still recommended after purges. Each
+user shard is counted on its own and the counts added up.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+from django.db import connections, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import RollupWatermark, User, UserRollup
+from .sharding import get_shards
+
+WATERMARK_NAME = 'users'
+
+# Rows committed late can carry an updated_at slightly older than the watermark.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+COUNTS = {
+    'users': Count('pk'),
+    'verified': Count('pk', filter=Q(is_verified=True)),
+    'accepts_marketing': Count('pk', filter=Q(accepts_marketing=True)),
+}
+
+
+def day_bounds(start_day, end_day):
+    """Aware datetimes bounding the signup days [start_day, end_day]."""
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(start_day, time.min, tzinfo=tz),
+        datetime.combine(end_day + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def compute_range(start_day, end_day):
+    """Unsaved rollup rows of the signup days [start_day, end_day], added up over the user shards."""
+    start, end = day_bounds(start_day, end_day)
+    days = {}
+    group_days = {}
+    for shard in get_shards():
+        users = (
+            User.objects.using(shard).filter(date_joined__gte=start, date_joined__lt=end)
+            .annotate(day=TruncDate('date_joined'))
+        )
+        for row in users.values('day').annotate(**COUNTS):
+            add_counts(days, row['day'], row)
+        groups = (
+            users.filter(customer_groups__isnull=False)
+            .values('day', group_id=F('customer_groups'))
+            .annotate(**COUNTS)
+        )
+        for row in groups:
+            add_counts(group_days, (row['day'], row['group_id']), row)
+    rows = [UserRollup(day=day, dimension='all', value='', **counts) for day, counts in sorted(days.items())]
+    rows += [
+        UserRollup(day=day, dimension='customer_group', value=str(group_id), **counts)
+        for (day, group_id), counts in sorted(group_days.items())
+    ]
+    return rows
+
+
+def add_counts(totals, key, row):
+    counts = totals.setdefault(key, dict.fromkeys(COUNTS, 0))
+    for name in COUNTS:
+        counts[name] += row[name]
+
+
+def write_range(start_day, end_day, rows):
+    """Replace the rollups of the days [start_day, end_day] with `rows`."""
+    with transaction.atomic():
+        UserRollup.objects.filter(day__gte=start_day, day__lte=end_day).delete()
+        UserRollup.objects.bulk_create(rows)
+
+
+def refresh_range(start_day, end_day):
+    write_range(start_day, end_day, compute_range(start_day, end_day))
+
+
+def contiguous_runs(days):
+    """Group days into (first, last) runs of consecutive days."""
+    runs = []
+    for day in sorted(days):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def refresh_rollups():
+    """Recount the signup days of the users changed since the watermark. Returns the days refreshed."""
+    state, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    started = timezone.now()
+    changed = User.objects.all()
+    if state.watermark is not None:
+        changed = changed.filter(updated_at__gte=state.watermark - WATERMARK_OVERLAP)
+    days = set(changed.annotate(day=TruncDate('date_joined')).values_list('day', flat=True).distinct())
+    for start_day, end_day in contiguous_runs(days):
+        refresh_range(start_day, end_day)
+    state.watermark = started
+    state.save(update_fields=['watermark', 'updated_at'])
+    return len(days)
+
+
+def compute_chunk(chunk):
+    try:
+        return compute_range(*chunk)
+    finally:
+        # Worker threads open their own connections.
+        connections.close_all()
+
+
+def backfill_rollups(start_day, end_day, chunk_days=31, workers=4):
+    """
+    Rebuild the rollups of [start_day, end_day] in date chunks.
+
+    Chunks are counted by `workers` threads in parallel (read-only queries)
+    and written by the calling thread, one transaction per chunk. Returns the
+    number of chunks.
+    """
+    started = timezone.now()
+    chunks = []
+    chunk_start = start_day
+    while chunk_start <= end_day:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_day)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk, rows in zip(chunks, pool.map(compute_chunk, chunks)):
+                write_range(*chunk, rows)
+    else:
+        for chunk in chunks:
+            refresh_range(*chunk)
+
+    # A first backfill lets the incremental job start from here.
+    RollupWatermark.objects.filter(name=WATERMARK_NAME, watermark__isnull=True).update(watermark=started)
+    RollupWatermark.objects.get_or_create(name=WATERMARK_NAME, defaults={'watermark': started})
+    return len(chunks)
@@ -0,0 +1,221 @@
+"""
+Full-text user search.
+
+Support tools look customers up by name, username, email, phone or address
+city/postal code. The lookups go through a pluggable backend selected with the
+USER_SEARCH_BACKEND setting; the SQLite backend keeps a dedicated FTS5 index
+updated by the signals in signals.py.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+SEARCH_TABLE = 'users_user_search'
+
+SEARCH_COLUMNS = ['username', 'first_name', 'last_name', 'email', 'phone', 'city', 'postal_code']
+
+
+class BaseSearchBackend:
+    """Interface every user search backend implements."""
+
+    def index_users(self, users):
+        """Add or refresh the index entries of the given users."""
+        raise NotImplementedError
+
+    def remove_users(self, user_ids):
+        """Remove the index entries of the given user ids."""
+        raise NotImplementedError
+
+    def search(self, query, limit, offset=0):
+        """Return the ranked user ids matching the query."""
+        raise NotImplementedError
+
+    def count(self, query):
+        """Return the number of users matching the query."""
+        raise NotImplementedError
+
+    def rebuild(self, chunk_size=1000):
+        """Index every user again, in chunks. Returns the number of users indexed."""
+        from .models import User
+        from .sharding import get_shards
+
+        self.clear()
+        indexed = 0
+        for shard in get_shards():
+            last_pk = 0
+            while True:
+                users = list(
+                    User.objects.using(shard).filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .prefetch_related('addresses')[:chunk_size]
+                )
+                if not users:
+                    break
+                self.index_users(users)
+                indexed += len(users)
+                last_pk = users[-1].pk
+        return indexed
+
+    def clear(self):
+        """Drop every index entry."""
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Fallback backend with no index: plain icontains lookups on the tables."""
+
+    def index_users(self, users):
+        pass
+
+    def remove_users(self, user_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def get_queryset(self, query):
+        from .models import User
+
+        # Same columns as the FTS index (SEARCH_COLUMNS).
+        filters = Q()
+        for term in query.split():
+            matches = (
+                Q(username__icontains=term) | Q(first_name__icontains=term) |
+                Q(last_name__icontains=term) | Q(email__icontains=term) |
+                Q(phone__icontains=term) |
+                Q(addresses__city__icontains=term, addresses__is_active=True)
+            )
+            if term.isdigit():
+                matches |= (
+                    Q(phone_normalized__startswith=term) |
+                    Q(addresses__postal_code__startswith=term, addresses__is_active=True)
+                )
+            filters &= matches
+        return User.objects.filter(filters).distinct()
+
+    def search(self, query, limit, offset=0):
+        from .sharding import fanout
+
+        users = fanout(self.get_queryset(query).only('pk'), 'pk', limit=offset + limit)
+        return [user.pk for user in islice(users, offset, None)]
+
+    def count(self, query):
+        from .sharding import get_shards
+
+        return sum(self.get_queryset(query).using(shard).count() for shard in get_shards())
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """FTS5 index keyed by user id, ranked with bm25."""
+
+    def document(self, user):
+        addresses = [address for address in user.addresses.all() if address.is_active]
+        phone = user.phone or ''
+        phone_digits = ''.join(filter(str.isdigit, phone))
+        return [
+            user.pk,
+            user.username,
+            user.first_name,
+            user.last_name,
+            user.email,
+            f'{phone} {phone_digits} {user.phone_normalized}'.strip(),
+            ' '.join(address.city for address in addresses),
+            ' '.join(str(address.postal_code) for address in addresses),
+        ]
+
+    def index_users(self, users):
+        rows = [self.document(user) for user in users]
+        if not rows:
+            return
+        self.remove_users([row[0] for row in rows])
+        columns = ', '.join(SEARCH_COLUMNS)
+        placeholders = ', '.join(['%s'] * (len(SEARCH_COLUMNS) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) VALUES ({placeholders})',
+                rows
+            )
+
+    def remove_users(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', user_ids)
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def match_expression(self, query):
+        """Every term must match, the last token of each as a prefix."""
+        terms = ['"{}"*'.format(term.replace('"', '""')) for term in query.split()]
+        return ' '.join(terms)
+
+    def search(self, query, limit, offset=0):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [expression, limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+                [expression]
+            )
+            return cursor.fetchone()[0]
+
+
+def get_search_backend():
+    path = getattr(settings, 'USER_SEARCH_BACKEND', 'apps.users.search.DatabaseSearchBackend')
+    return import_string(path)()
+
+
+class SearchResults:
+    """
+    Lazy, sliceable view over the ranked results of a query.
+
+    Django's Paginator only needs len() and slicing, so the index is queried
+    for one page at a time and the matching users are fetched in one query.
+    """
+
+    def __init__(self, query, backend=None, queryset=None):
+        from .models import User
+
+        self.query = query
+        self.backend = backend or get_search_backend()
+        self.queryset = queryset if queryset is not None else User.objects.all()
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query)
+        return self._count
+
+    def count(self):
+        return len(self)
+
+    def __getitem__(self, index):
+        from .sharding import in_bulk
+
+        if isinstance(index, slice):
+            start = index.start or 0
+            stop = index.stop if index.stop is not None else len(self)
+            ids = self.backend.search(self.query, limit=max(stop - start, 0), offset=start)
+            users = in_bulk(self.queryset, ids)
+            return [users[pk] for pk in ids if pk in users]
+        return self[index:index + 1][0]
@@ -1,11 +1,57 @@
+from datetime import timedelta
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from .models import User, UserProfile, Address, CustomerGroup
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.core.validators import FileExtensionValidator
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .models import canonical_phone, User, UserProfile, Address, CustomerGroup, DataExport, SegmentMember, UserRollup
+from .avatars import AVATAR_ALLOWED_EXTENSIONS, validate_avatar_size, variant_urls
+from .groups import get_catalog, group_ids_by_user
+from .jobs import enqueue_on_commit
+from .login_tracking import login_tracker
+from .mail import queue_verification_email
+from .normalization import E164_MAX_DIGITS
+from .outbox import emit
+from . import sharding
 
 User = get_user_model()
 
+def apply_changes(instance, data):
+    """Set the values that differ from the instance; returns the changed field names"""
+    changed = []
+    for attr, value in data.items():
+        if getattr(instance, attr) != value:
+            setattr(instance, attr, value)
+            changed.append(attr)
+    return changed
+
+def save_changes(instance, changed):
+    """Save only the changed columns (plus auto_now ones); no write when nothing changed"""
+    if not changed:
+        return False
+    auto_now = [field.name for field in instance._meta.concrete_fields if getattr(field, 'auto_now', False)]
+    instance.save(update_fields=[*changed, *auto_now])
+    return True
+
+def validate_phone_number(value):
+    """Phone of at least 10 digits as typed that normalizes to a plausible E.164 number (see User.phone_normalized)"""
+    if value:
+        # The minimum applies before the default country code is prepended.
+        if len(''.join(filter(str.isdigit, value))) < 10:
+            raise serializers.ValidationError(
+                'The phone number has to have at least 10 digits'
+            )
+        if len(canonical_phone(value)) > E164_MAX_DIGITS:
+            raise serializers.ValidationError(
+                f'The phone number can have at most {E164_MAX_DIGITS} digits, country code included'
+            )
+    return value
+
 class CustomerGroupSerializer(serializers.ModelSerializer):
     """Customer Group Serializer"""
     class Meta:
@@ -13,11 +59,49 @@ class CustomerGroupSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'discount_percentage']
         read_only_fields = ['id']
 
+class CatalogCustomerGroupsField(serializers.Field):
+    """Customer groups of a user, read from the in-process group catalog"""
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user):
+        group_ids = self.memberships().get(user.pk)
+        if group_ids is None:
+            group_ids = group_ids_by_user([user.pk])[user.pk]
+        groups = get_catalog().for_ids(group_ids)
+        return CustomerGroupSerializer(groups, many=True).data
+
+    def memberships(self):
+        """Group ids of every user being serialized in a list, loaded in one query"""
+        root = self.root
+        if not isinstance(root, serializers.ListSerializer) or not isinstance(root.instance, (list, QuerySet)):
+            return {}
+        if not hasattr(root, '_group_ids_by_user'):
+            root._group_ids_by_user = group_ids_by_user([user.pk for user in root.instance])
+        return root._group_ids_by_user
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Extended User Profile Serializer"""
+    # Plain file field: the image is decoded by the avatar worker, not in the request.
+    avatar = serializers.FileField(
+        required=False,
+        allow_null=True,
+        validators=[
+            FileExtensionValidator(AVATAR_ALLOWED_EXTENSIONS),
+            validate_avatar_size,
+        ]
+    )
+    avatar_urls = serializers.SerializerMethodField()
+
     class Meta:
         model = UserProfile
-        fields = ['avatar', 'bio', 'website']
+        fields = ['avatar', 'avatar_urls', 'bio', 'website']
+
+    def get_avatar_urls(self, obj):
+        """URLs of the resized avatar variants"""
+        return variant_urls(obj)
     
     def validate_website(self, value):
         """Only valid websites."""
@@ -42,8 +126,8 @@ class AddressSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     """Principal Serializer for Users (READ)"""
     profile = UserProfileSerializer(read_only=True)
-    addresses = AddressSerializer(many=True, read_only=True)
-    customer_groups = CustomerGroupSerializer(many=True, read_only=True)
+    addresses = AddressSerializer(source='active_addresses', many=True, read_only=True)
+    customer_groups = CatalogCustomerGroupsField()
     full_name = serializers.CharField(source='get_full_name', read_only=True)
 
     class Meta:
@@ -75,7 +159,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def validate_email(self, value):
         """The email is unique"""
-        if User.objects.filter(email=value.lower()).exists():
+        if sharding.any_shard_has(User.objects.with_email(value)):
             raise serializers.ValidationError(
                 'The email is already registered.'
             )
@@ -83,7 +167,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def validate_username(self, value):
         """The username is unique"""
-        if User.objects.filter(username=value).exists():
+        if sharding.any_shard_has(User.objects.filter(username=value)):
             raise serializers.ValidationError(
                 'The username is already taken'
             )
@@ -95,14 +179,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def validate_phone(self, value):
         """Validating phone number"""
-        if value:
-            clean_phone = ''.join(filter(str.isdigit, value))
-            if len(clean_phone) < 10:
-                raise serializers.ValidationError(
-                    'The phone number has to have at least 10 digits'
-                )
-            return value
-        return value
+        return validate_phone_number(value)
         
     def validate(self, data):
         """Validations on object level"""
@@ -127,14 +204,16 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         profile_data = validated_data.pop('profile', {})
         password_confirm = validated_data.pop('password_confirm')
         
-        # Creating user
-        user = User.objects.create_user(**validated_data)
-
-        # Creating profile if data is provided
-        if profile_data:
+        with sharding.new_user(validated_data['email']) as user_id:
+            # User and profile on the user's shard, committed with the event
+            user = User.objects.create_user(id=user_id, **validated_data)
             UserProfile.objects.create(user=user, **profile_data)
-        else:
-            UserProfile.objects.create(user=user)
+
+            emit('user.registered', user.pk, {'user_id': user.pk, 'email': user.email})
+
+        # Follow-up work runs in the job worker once the user row is committed
+        enqueue_on_commit('users.assign_default_groups', {'user_id': user.pk})
+        queue_verification_email(user)
 
         return user
 
@@ -151,29 +230,24 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     
     def validate_phone(self, value):
         """Phone validator"""
-        if value:
-            clean_phone = "".join(filter(str.isdigit, value))
-            if len(clean_phone) < 10:
-                raise serializers.ValidationError(
-                    'The phone has to have at least 10 digits'
-                )
-            return value
-        return value
+        return validate_phone_number(value)
 
     def update(self, instance, validated_data):
         profile_data = validated_data.pop('profile', {})
         
-        # Update User fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with sharding.shard_atomic(instance._state.db):
+            # Update User fields
+            save_changes(instance, apply_changes(instance, validated_data))
 
-        # Update Profile fields
-        if profile_data:
-            profile = instance.profile
-            for attr, value in profile_data.items():
-                setattr(profile, attr, value)
-            profile.save()
+            # Update Profile fields
+            if profile_data:
+                profile = instance.profile
+                changed = apply_changes(profile, profile_data)
+                if save_changes(profile, changed):
+                    emit('user.profile_updated', instance.pk, {
+                        'user_id': instance.pk,
+                        'fields': sorted(changed),
+                    })
 
         return instance
 
@@ -191,6 +265,17 @@ class ChangePasswordSerializer(serializers.Serializer):
             })
         return data
 
+class LoginTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token login that records last_login through the coalescing login tracker"""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        login_tracker.record(self.user)
+        return data
+
+class VerifyEmailSerializer(serializers.Serializer):
+    """Serializer to verify the user email"""
+    token = serializers.CharField(required=True)
+
 class UserListSerializer(serializers.ModelSerializer):
     """Simplified Serializer for listing (admin)"""
     full_name = serializers.CharField(source='get_full_name', read_only=True)
@@ -223,7 +308,7 @@ class UserAdminSerializer(serializers.ModelSerializer):
     """Complete Admin Serializer"""
     profile = UserProfileSerializer(read_only=True)
     addresses = AddressSerializer(many=True, read_only=True)
-    customer_groups = CustomerGroupSerializer(many=True, read_only=True)
+    customer_groups = CatalogCustomerGroupsField()
     full_name = serializers.CharField(source='get_full_name', read_only=True)
 
     class Meta:
@@ -239,7 +324,83 @@ class UserAdminSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         """Update user and related data"""
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        return instance
\ No newline at end of file
+        with sharding.shard_atomic(instance._state.db):
+            save_changes(instance, apply_changes(instance, validated_data))
+        return instance
+
+class UserExportSerializer(UserAdminSerializer):
+    """User document of a data export (addresses are streamed separately)"""
+    class Meta(UserAdminSerializer.Meta):
+        fields = [field for field in UserAdminSerializer.Meta.fields if field != 'addresses']
+
+class DataExportSerializer(serializers.ModelSerializer):
+    """Status of a background data export"""
+    download_url = serializers.SerializerMethodField()
+    expires_at = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DataExport
+        fields = ['id', 'status', 'size', 'created_at', 'completed_at', 'expires_at', 'download_url']
+
+    def get_download_url(self, obj):
+        if obj.status != 'ready':
+            return None
+        url = reverse('users:data-export-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_expires_at(self, obj):
+        if obj.completed_at is None:
+            return None
+        return obj.completed_at + timedelta(days=settings.DATA_EXPORT_TTL_DAYS)
+
+class UserRollupSerializer(serializers.ModelSerializer):
+    """Signups of one day, with verification and marketing opt-in rates"""
+    verification_rate = serializers.SerializerMethodField()
+    marketing_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserRollup
+        fields = ['day', 'users', 'verified', 'accepts_marketing', 'verification_rate', 'marketing_rate']
+
+    def get_verification_rate(self, obj):
+        return round(obj.verified / obj.users, 4) if obj.users else None
+
+    def get_marketing_rate(self, obj):
+        return round(obj.accepts_marketing / obj.users, 4) if obj.users else None
+
+class SegmentMemberSerializer(serializers.ModelSerializer):
+    """Marketing segment member (campaign delivery)"""
+    email = serializers.EmailField(source='user.email', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+
+    class Meta:
+        model = SegmentMember
+        fields = ['user_id', 'email', 'first_name', 'last_name', 'added_at']
+        read_only_fields = fields
+
+
+class UserChangeSerializer(serializers.ModelSerializer):
+    """User record of the change feed"""
+    class Meta:
+        model = User
+        fields = [
+            'id', 'email', 'username', 'first_name', 'last_name',
+            'phone', 'birth_date', 'is_active', 'is_verified',
+            'accepts_marketing', 'date_joined', 'updated_at'
+        ]
+        read_only_fields = fields
+
+class UserProfileChangeSerializer(serializers.ModelSerializer):
+    """Profile record of the change feed"""
+    class Meta:
+        model = UserProfile
+        fields = ['id', 'user', 'avatar', 'bio', 'website']
+        read_only_fields = fields
+
+class AddressChangeSerializer(AddressSerializer):
+    """Address record of the change feed"""
+    class Meta(AddressSerializer.Meta):
+        fields = AddressSerializer.Meta.fields + ['user', 'is_active']
+        read_only_fields = fields
@@ -0,0 +1,365 @@
+"""
+Hash-sharded user storage.
+
+Users and the rows that belong to them (profile, addresses and customer group
+memberships) live on one of the database aliases listed in USER_SHARDS, chosen
+by a stable hash of the user id. A global ShardDirectory on the default
+database maps emails to user ids and allocates those ids, so logins find the
+shard without asking every database. Enable it with:
+
+    USER_SHARDS = ['default', 'users_shard_1', 'users_shard_2']
+    DATABASE_ROUTERS = ['apps.users.sharding.UserShardRouter']
+
+With the router installed, User.save() goes through save_user(): new users
+get their id from the directory (the only id sequence, so shards never hand
+out the same id) and are stored on shard_for(id), and email changes update
+the directory in the same transactions. Deleted users leave the directory
+through a post_delete signal. Outbox events and change-log entries stay on
+the default database: shard writes that emit them run in shard_atomic() (or
+new_user() for registrations), which rolls back both sides together.
+
+The router only knows where a row lives when Django passes it an instance
+(related managers, saves, deletes, refresh_from_db), so dependent rows are
+created through their owner (user.addresses.create()), lookups by id go
+through get_user(), in_bulk() or users_by_shard(), and listings across shards
+through fanout(). Reference data other rows point to (customer groups,
+shipping zones) is copied to every shard by replicate(). With a single shard
+all of these read and write the default database. The shard list must not
+change once users are stored; moving to more shards is a migration of its
+own.
+"""
+import copy
+import hashlib
+import heapq
+from contextlib import contextmanager
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models.base import ModelState
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import (
+    Address, ArchivedAddress, CustomerGroup, DataExport, MarketingSegment, SegmentMember, ShardDirectory,
+    ShippingZone, User, UserProfile,
+)
+
+SHARDED_MODELS = {
+    User, UserProfile, Address, ArchivedAddress, DataExport, SegmentMember, User.customer_groups.through,
+}
+
+# Reference rows that sharded rows point to; every shard keeps a copy (replicate()).
+REPLICATED_MODELS = {CustomerGroup, ShippingZone, MarketingSegment}
+
+# Rows of the other tables of shard i get ids from i * SHARD_ID_SPACING on, so
+# an address or profile id names one row across all shards (user ids come from
+# the directory).
+SHARD_ID_SPACING = 10 ** 12
+
+
+def get_shards():
+    return list(getattr(settings, 'USER_SHARDS', [DEFAULT_DB_ALIAS]))
+
+
+def directory_database():
+    return getattr(settings, 'USER_SHARD_DIRECTORY_DATABASE', DEFAULT_DB_ALIAS)
+
+
+def shard_for(user_id):
+    """Database alias of a user id. Stable across processes (no hash())."""
+    shards = get_shards()
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return shards[int.from_bytes(digest, 'big') % len(shards)]
+
+
+def user_id_of(instance):
+    if isinstance(instance, User):
+        return instance.pk
+    return getattr(instance, 'user_id', None)
+
+
+class UserShardRouter:
+    """Routes user-owned rows to their shard and the directory to its database."""
+
+    def shard_of(self, model, hints):
+        instance = hints.get('instance')
+        if model not in SHARDED_MODELS or type(instance) not in SHARDED_MODELS:
+            return None
+        user_id = user_id_of(instance)
+        if instance._state.db and not (instance._state.adding and user_id is not None):
+            return instance._state.db
+        # New rows go to their owner's shard.
+        return shard_for(user_id) if user_id is not None else None
+
+    def db_for_read(self, model, **hints):
+        if model is ShardDirectory:
+            return directory_database()
+        return self.shard_of(model, hints)
+
+    def db_for_write(self, model, **hints):
+        if model is ShardDirectory:
+            return directory_database()
+        return self.shard_of(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        types = {type(obj1), type(obj2)}
+        if types <= SHARDED_MODELS:
+            # Unsaved rows are stored with their owner when saved.
+            return obj1._state.adding or obj2._state.adding or obj1._state.db == obj2._state.db
+        if types & SHARDED_MODELS and types & REPLICATED_MODELS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'users' and model_name == 'sharddirectory':
+            return db == directory_database()
+        return None
+
+
+def enabled():
+    """Whether users are sharded, i.e. UserShardRouter is installed."""
+    return any(isinstance(installed, UserShardRouter) for installed in router.routers)
+
+
+def allocate_user_id(email):
+    return ShardDirectory.objects.using(directory_database()).create(email=email).pk
+
+
+@contextmanager
+def shard_atomic(using):
+    """
+    transaction.atomic() on the shard `using`, nested in one on the default
+    and the directory databases, which hold the outbox events, change-log
+    entries and directory rows that go with a shard write: whatever raises in
+    the block rolls all of them back. The shard commits first, so only a
+    failed commit of the other databases can leave its write behind.
+    """
+    with transaction.atomic(), nested_atomic(directory_database()), nested_atomic(using):
+        yield
+
+
+def nested_atomic(using):
+    # Inside the transaction of the default database a savepoint of its own is redundant.
+    return transaction.atomic(using=using, savepoint=using != DEFAULT_DB_ALIAS)
+
+
+@contextmanager
+def new_user(email):
+    """
+    shard_atomic() for registering a user: yields the id the directory
+    allocates for `email` (None when users are not sharded). If the default or
+    directory database fails to commit after the shard did, the user's shard
+    rows are deleted again and the id is released with its directory row.
+    Use it outside transactions, so its commits are the real ones.
+    """
+    if not enabled():
+        with transaction.atomic():
+            yield None
+        return
+    user_id = None
+    shard_committed = False
+    try:
+        with transaction.atomic(), nested_atomic(directory_database()):
+            user_id = allocate_user_id(email)
+            with nested_atomic(shard_for(user_id)):
+                yield user_id
+            shard_committed = True
+    except Exception:
+        if shard_committed:
+            delete_users([user_id])
+        raise
+
+
+def save_user(user, save, *args, update_fields=None, **kwargs):
+    """
+    Save `user` on its shard with `save` (Model.save), keeping the directory in step.
+
+    The directory row is written in transactions that also cover the user row
+    (new_user(), shard_atomic()): its id becomes the id of a new user, and its
+    unique email is the global uniqueness check the shards can't do alone.
+    """
+    kwargs.pop('using', None)
+    if user.pk is not None:
+        with shard_atomic(shard_for(user.pk)):
+            write_user(user, save, args, update_fields, kwargs)
+        return
+    try:
+        with new_user(user.email) as user_id:
+            user.pk = user_id
+            write_user(user, save, args, update_fields, kwargs)
+    except Exception:
+        user.pk = None
+        raise
+
+
+def write_user(user, save, args, update_fields, kwargs):
+    entries = ShardDirectory.objects.using(directory_database())
+    shard = shard_for(user.pk)
+    if user._state.adding or update_fields is None or 'email' in update_fields:
+        if not entries.filter(pk=user.pk).update(email=user.email, shard=shard):
+            entries.create(pk=user.pk, email=user.email, shard=shard)
+    save(*args, using=shard, update_fields=update_fields, **kwargs)
+
+
+def offset_sequences(using):
+    """
+    Start the id sequences of the sharded tables of a shard at its
+    SHARD_ID_SPACING range (SQLite and PostgreSQL; a no-op on the first shard).
+    """
+    shards = get_shards()
+    if using not in shards or not shards.index(using) or not enabled():
+        return
+    offset = shards.index(using) * SHARD_ID_SPACING
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in SHARDED_MODELS:
+            table, column = model._meta.db_table, model._meta.pk.column
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    'UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s', [offset, table, offset]
+                )
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, offset, table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT setval(seq, GREATEST(%s, COALESCE(pg_sequence_last_value(seq), 0))) '
+                    'FROM (SELECT pg_get_serial_sequence(%s, %s)::regclass AS seq) AS sequence',
+                    [offset, connection.ops.quote_name(table), column],
+                )
+
+
+def forget_users(user_ids):
+    """Remove deleted users from the directory."""
+    ShardDirectory.objects.using(directory_database()).filter(pk__in=list(user_ids)).delete()
+
+
+def delete_users(user_ids):
+    """Delete users and their rows from the shards and the directory, without signals or change-feed entries."""
+    from .retention import raw_delete
+
+    for shard, shard_user_ids in users_by_shard(user_ids).items():
+        with transaction.atomic(using=shard):
+            raw_delete(User, User._base_manager.using(shard).filter(pk__in=shard_user_ids))
+    forget_users(user_ids)
+
+
+def users_by_shard(user_ids):
+    """{alias: [user ids]} of the shards that store the given users."""
+    by_shard = {}
+    for user_id in user_ids:
+        by_shard.setdefault(shard_for(user_id), []).append(user_id)
+    return by_shard
+
+
+def in_bulk(queryset, user_ids, field='pk'):
+    """queryset.in_bulk() over the shards of the given user ids; `field` holds the user id."""
+    found = {}
+    for shard, ids in users_by_shard(user_ids).items():
+        found.update(queryset.using(shard).filter(**{f'{field}__in': ids}).in_bulk(ids, field_name=field))
+    return found
+
+
+def any_shard_has(queryset):
+    """queryset.exists() on any shard, e.g. a uniqueness check."""
+    return any(queryset.using(shard).exists() for shard in get_shards())
+
+
+def create_user(email, password=None, profile=None, **fields):
+    """Register a user and its profile in the transactions of new_user()."""
+    with new_user(email) as user_id:
+        user = User.objects.create_user(id=user_id, email=email, password=password, **fields)
+        UserProfile.objects.create(user=user, **(profile or {}))
+    return user
+
+
+def get_user(user_id):
+    """The user with this id, read from its shard, or None."""
+    return User.objects.using(shard_for(user_id)).filter(pk=user_id).first()
+
+
+def get_user_by_email(email):
+    entry = ShardDirectory.objects.using(directory_database()).filter(email=email).first()
+    if entry is None:
+        return None
+    return User.objects.using(entry.shard or shard_for(entry.pk)).filter(pk=entry.pk).first()
+
+
+def replicate(instance, deleted=False):
+    """Copy a reference row (e.g. a CustomerGroup) saved on the default database to the other shards."""
+    for shard in get_shards():
+        if shard == DEFAULT_DB_ALIAS:
+            continue
+        if deleted:
+            type(instance)._base_manager.using(shard).filter(pk=instance.pk).delete()
+            continue
+        replica = copy.copy(instance)
+        replica._state = ModelState()
+        replica.save(using=shard)
+
+
+def fanout(queryset, order_by, limit=None):
+    """
+    Iterate `queryset` on every shard in `order_by` order.
+
+    Each shard streams its rows already sorted; the cursors are merged lazily,
+    so only `limit` rows (plus one chunk per shard) are read. `order_by` is a
+    field name, '-' prefixed for descending order; ties are broken by id.
+    """
+    reverse = order_by.startswith('-')
+    field = order_by.lstrip('-')
+    ordering = [order_by, '-pk' if reverse else 'pk']
+    cursors = [
+        queryset.using(shard).order_by(*ordering).iterator(chunk_size=limit or 2000)
+        for shard in get_shards()
+    ]
+    rows = heapq.merge(*cursors, key=attrgetter(field, 'pk'), reverse=reverse)
+    return islice(rows, limit) if limit is not None else rows
+
+
+class ShardedModelBackend(ModelBackend):
+    """Email/password login that finds the user's shard through the directory."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        email = username or kwargs.get(User.USERNAME_FIELD)
+        if email is None or password is None:
+            return None
+        user = get_user_by_email(email)
+        if user is None:
+            User().set_password(password)  # Same cost as a failed password check.
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        user = get_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+class ShardedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that loads the token's user from its shard."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as error:
+            raise InvalidToken('Token contained no recognizable user identification') from error
+
+        user = get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
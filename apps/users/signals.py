@@ -0,0 +1,133 @@
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import sharding
+from .changefeed import KIND_BY_MODEL, record_changes
+from .groups import invalidate_catalog
+from .jobs import enqueue_on_commit
+from .models import Address, CustomerGroup, MarketingSegment, ShippingZone, ShippingZoneRule, User, UserProfile
+from .search import get_search_backend
+from .zones import invalidate_zones
+
+INDEXED_USER_FIELDS = {'username', 'first_name', 'last_name', 'email', 'phone'}
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the search index in sync with the user fields"""
+    if raw or (update_fields is not None and not update_fields & INDEXED_USER_FIELDS):
+        return
+    get_search_backend().index_users([instance])
+
+
+@receiver(post_migrate)
+def offset_shard_sequences(sender, using, **kwargs):
+    """Every shard hands out ids from its own range (see sharding.offset_sequences)"""
+    if sender.label == 'users':
+        sharding.offset_sequences(using)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    get_search_backend().remove_users([instance.pk])
+    if sharding.enabled():
+        sharding.forget_users([instance.pk])
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def reindex_address_owner(sender, instance, raw=False, **kwargs):
+    """Address city and postal code are part of the owner's index entry"""
+    if raw or (not instance.is_active and kwargs['signal'] is post_delete):
+        # Inactive addresses are not indexed, so archiving them changes nothing.
+        return
+    user = User.objects.using(instance._state.db).filter(pk=instance.user_id).first()
+    if user is not None:
+        get_search_backend().index_users([user])
+
+
+@receiver(m2m_changed, sender=User.customer_groups.through)
+def require_user_side_memberships(sender, reverse, action, **kwargs):
+    """Memberships live on the member's shard, which only the user side knows"""
+    if reverse and action.startswith('pre_') and sharding.enabled():
+        raise NotSupportedError(
+            'With sharded users, change memberships from the user side: user.customer_groups.add(group).'
+        )
+
+
+@receiver(m2m_changed, sender=User.customer_groups.through)
+def touch_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """Customer group membership changes count as changes of the user (updated_at)"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_user_ids = list(instance.users.using(kwargs['using']).values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', [])
+    else:
+        user_ids = pk_set
+    user_ids = list(user_ids)
+    for shard, shard_user_ids in sharding.users_by_shard(user_ids).items():
+        User.objects.using(shard).filter(pk__in=shard_user_ids).update(updated_at=timezone.now())
+    record_changes('user', user_ids)
+
+
+@receiver(post_save, sender=UserProfile)
+def schedule_avatar_processing(sender, instance, raw=False, **kwargs):
+    """New avatar uploads are resized by the job worker once the request commits"""
+    if raw or not getattr(instance, '_avatar_uploaded', False):
+        return
+    instance._avatar_uploaded = False
+    enqueue_on_commit('users.process_avatar', {'profile_id': instance.pk, 'user_id': instance.user_id})
+
+
+@receiver(post_save, sender=CustomerGroup)
+@receiver(post_delete, sender=CustomerGroup)
+def refresh_group_catalog(sender, raw=False, **kwargs):
+    """Processes reload their catalog snapshot (again once the change is committed)"""
+    if raw:
+        return
+    invalidate_catalog()
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=CustomerGroup)
+@receiver(post_delete, sender=CustomerGroup)
+@receiver(post_save, sender=ShippingZone)
+@receiver(post_delete, sender=ShippingZone)
+@receiver(post_save, sender=MarketingSegment)
+@receiver(post_delete, sender=MarketingSegment)
+def replicate_reference_data(sender, instance, raw=False, using=None, **kwargs):
+    """Rows on every shard point to groups, zones and segments: keep a copy on each"""
+    if raw or using != DEFAULT_DB_ALIAS or not sharding.enabled():
+        return
+    sharding.replicate(instance, deleted=kwargs['signal'] is post_delete)
+
+
+@receiver(post_save, sender=ShippingZone)
+@receiver(post_delete, sender=ShippingZone)
+@receiver(post_save, sender=ShippingZoneRule)
+@receiver(post_delete, sender=ShippingZoneRule)
+def refresh_zone_index(sender, raw=False, **kwargs):
+    """Processes recompile their zone index and cached address zones go stale"""
+    if raw:
+        return
+    invalidate_zones()
+    transaction.on_commit(invalidate_zones)
+
+
+def record_feed_change(sender, instance, raw=False, **kwargs):
+    """Append users, profiles and addresses changes to the change feed"""
+    if raw:
+        return
+    record_changes(KIND_BY_MODEL[sender], [instance.pk], deleted=kwargs['signal'] is post_delete)
+
+
+for model in KIND_BY_MODEL:
+    post_save.connect(record_feed_change, sender=model, dispatch_uid=f'changefeed-save-{model.__name__}')
+    post_delete.connect(record_feed_change, sender=model, dispatch_uid=f'changefeed-delete-{model.__name__}')
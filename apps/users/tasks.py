@@ -0,0 +1,70 @@
+"""Background job handlers of the users app (see jobs.py)."""
+
+from django.conf import settings
+from django.utils import timezone
+
+from .archival import archive_inactive_addresses
+from .avatars import process_avatar
+from .changefeed import record_changes
+from .exports import build_export
+from .rollups import refresh_rollups
+from .sharding import shard_for, users_by_shard
+from .jobs import register
+from .models import CustomerGroup, DataExport, User, UserProfile
+
+
+@register('users.process_avatar')
+def process_avatar_job(payload):
+    # Profile ids are only unique within a shard.
+    profile = UserProfile.objects.using(shard_for(payload['user_id'])).filter(pk=payload['profile_id']).first()
+    if profile is not None:
+        process_avatar(profile)
+
+
+@register('users.assign_default_groups', batch=True)
+def assign_default_groups(payloads):
+    """Add new users to the active groups that have no entry requirements"""
+    group_ids = list(
+        CustomerGroup.objects
+        .filter(is_active=True, min_orders=0, min_spent=0)
+        .values_list('pk', flat=True)
+    )
+    if not group_ids:
+        return
+    Membership = User.customer_groups.through
+    user_ids = []
+    for shard, shard_user_ids in users_by_shard({payload['user_id'] for payload in payloads}).items():
+        users = User.objects.using(shard).filter(pk__in=shard_user_ids)
+        found = list(users.values_list('pk', flat=True))
+        Membership.objects.using(shard).bulk_create(
+            [Membership(user_id=user_id, customergroup_id=group_id) for user_id in found for group_id in group_ids],
+            ignore_conflicts=True
+        )
+        # bulk_create skips m2m_changed: do what touch_group_members does for these users.
+        users.update(updated_at=timezone.now())
+        user_ids.extend(found)
+    record_changes('user', user_ids)
+
+
+@register('users.archive_inactive_addresses', interval=lambda: settings.ADDRESS_ARCHIVE_INTERVAL)
+def archive_inactive_addresses_job(payload):
+    """Periodic: archives in chunks (the queue schedules the next run)"""
+    archive_inactive_addresses()
+
+
+@register('users.build_data_export')
+def build_data_export(payload):
+    export = DataExport.objects.select_related('user').filter(pk=payload['export_id'], status='pending').first()
+    if export is None:
+        return
+    try:
+        build_export(export)
+    except Exception:
+        DataExport.objects.filter(pk=export.pk).update(status='failed')
+        raise
+
+
+@register('users.refresh_user_rollups', interval=lambda: settings.USER_ROLLUP_INTERVAL)
+def refresh_user_rollups_job(payload):
+    """Periodic: recounts the days changed since the watermark (the queue schedules the next run)"""
+    refresh_rollups()
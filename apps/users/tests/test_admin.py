@@ -0,0 +1,77 @@
+# apps/users/tests/test_admin.py
+from django.db import connection, connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from apps.users.paginators import EstimatedCountPaginator, estimated_row_count
+from apps.users.sharding import get_shards
+
+User = get_user_model()
+
+class UserAdminTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        for index in range(5):
+            User.objects.create_user(
+                username=f'user{index}',
+                email=f'user{index}@example.com',
+                password='testpass123'
+            )
+        self.client.force_login(self.admin)
+
+    def test_changelist(self):
+        """Test de listado de usuarios en el admin"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:users_user_changelist'), {'is_verified__exact': 0})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'user0@example.com')
+        # No column reads the profile.
+        self.assertFalse([query for query in queries if 'users_userprofile' in query['sql']])
+
+    def test_change_form_with_inlines(self):
+        """Test de formulario de usuario con inlines"""
+        response = self.client.get(reverse('admin:users_user_change', args=[self.admin.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'profile-TOTAL_FORMS')
+        self.assertNotContains(response, 'addresses-TOTAL_FORMS')
+        self.assertContains(response, f'{reverse("admin:users_address_changelist")}?user__id__exact={self.admin.pk}')
+
+    def test_address_changelist_filtered_by_user(self):
+        """Test de direcciones de un usuario en su propio listado"""
+        user = User.objects.get(email='user0@example.com')
+        for owner, street in [(self.admin, '1 Admin St'), (user, '2 User St')]:
+            owner.addresses.create(
+                street_address=street, city='Springfield', state='IL', postal_code=62701, country='USA'
+            )
+
+        response = self.client.get(reverse('admin:users_address_changelist'), {'user__id__exact': user.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '2 User St')
+        self.assertNotContains(response, '1 Admin St')
+
+    def test_paginator_uses_estimate_for_unfiltered_tables(self):
+        """Test de conteo estimado con estadísticas del planner"""
+        for shard in get_shards():
+            with connections[shard].cursor() as cursor:
+                cursor.execute('ANALYZE')
+        estimates = [estimated_row_count(User, shard) for shard in get_shards()]
+        self.assertEqual(sum(estimate or 0 for estimate in estimates), 6)
+
+        paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 2)
+        paginator.exact_count_threshold = 0
+        # A shard without users has no statistics: then every shard is counted.
+        with self.assertNumQueries(1 if None not in estimates else 2):
+            self.assertEqual(paginator.count, 6)
+        self.assertEqual(
+            [user.pk for user in paginator.page(2).object_list],
+            list(User.objects.order_by('pk').values_list('pk', flat=True)[2:4])
+        )
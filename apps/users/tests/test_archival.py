@@ -0,0 +1,79 @@
+# apps/users/tests/test_archival.py
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.archival import archive_inactive_addresses
+from apps.users.models import Address, ArchivedAddress
+
+User = get_user_model()
+
+
+def create_address(user, **kwargs):
+    fields = {
+        'street_address': '123 Test St',
+        'city': 'Test City',
+        'state': 'Test State',
+        'postal_code': 12345,
+        'country': 'Test Country',
+    }
+    fields.update(kwargs)
+    return Address.objects.create(user=user, **fields)
+
+
+class AddressSoftDeleteAPITest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.address = create_address(self.user, is_default=True)
+
+    def test_delete_archives_address(self):
+        """Test de borrado lógico de direcciones"""
+        url = reverse('users:address-detail', args=[self.address.pk])
+
+        response = self.client.delete(url)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.address.refresh_from_db()
+        self.assertFalse(self.address.is_active)
+        self.assertFalse(self.address.is_default)
+        self.assertEqual(self.client.get(reverse('users:address-list')).data, [])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('users:user-me')).data['addresses'], [])
+
+class AddressArchivalTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_archive_long_inactive_addresses(self):
+        """Test de archivado por lotes de direcciones inactivas"""
+        active = create_address(self.user)
+        recent = create_address(self.user, is_active=False)
+        old = [create_address(self.user, is_active=False, city=f'Old {index}') for index in range(3)]
+        Address.objects.filter(pk__in=[address.pk for address in old]).update(
+            updated_at=timezone.now() - timedelta(days=100)
+        )
+
+        archived = archive_inactive_addresses(older_than=timedelta(days=90), chunk_size=2)
+
+        self.assertEqual(archived, 3)
+        self.assertEqual(set(Address.objects.values_list('pk', flat=True)), {active.pk, recent.pk})
+        self.assertEqual(
+            set(ArchivedAddress.objects.values_list('original_id', flat=True)),
+            {address.pk for address in old}
+        )
+        self.assertEqual(ArchivedAddress.objects.get(original_id=old[0].pk).city, 'Old 0')
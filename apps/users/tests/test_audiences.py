@@ -0,0 +1,105 @@
+# apps/users/tests/test_audiences.py
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.audiences import refresh_segment
+from apps.users.models import Address, CustomerGroup, MarketingSegment, SegmentMember
+
+User = get_user_model()
+
+
+def create_user(name, **kwargs):
+    fields = {'accepts_marketing': True, 'is_verified': True}
+    fields.update(kwargs)
+    return User.objects.create_user(
+        username=name,
+        email=f'{name}@example.com',
+        password='testpass123',
+        **fields
+    )
+
+
+def members(segment):
+    return set(SegmentMember.objects.filter(segment=segment).values_list('user__username', flat=True))
+
+
+class AudienceRefreshTest(TestCase):
+
+    def setUp(self):
+        self.opted_in = create_user('optedin')
+        self.unverified = create_user('unverified', is_verified=False)
+        self.no_marketing = create_user('nomarketing', accepts_marketing=False)
+        self.segment = MarketingSegment.objects.create(name='Everyone')
+
+    def test_full_build(self):
+        """Test de construcción completa de la audiencia"""
+        added, removed = refresh_segment(self.segment)
+
+        self.assertEqual((added, removed), (1, 0))
+        self.assertEqual(members(self.segment), {'optedin'})
+        self.assertIsNotNone(self.segment.refreshed_at)
+
+    def test_incremental_refresh(self):
+        """Test de actualización incremental por updated_at"""
+        refresh_segment(self.segment)
+        self.segment.refreshed_at -= timedelta(seconds=1)
+
+        self.unverified.is_verified = True
+        self.unverified.save()
+        self.opted_in.accepts_marketing = False
+        self.opted_in.save()
+
+        added, removed = refresh_segment(self.segment)
+
+        self.assertEqual((added, removed), (1, 1))
+        self.assertEqual(members(self.segment), {'unverified'})
+
+    def test_group_and_country_filters(self):
+        """Test de segmentos por grupo y país"""
+        group = CustomerGroup.objects.create(name='VIP')
+        other = create_user('other')
+        for user in (self.opted_in, other):
+            user.customer_groups.add(group)
+        Address.objects.create(
+            user=other,
+            street_address='1 Main St',
+            city='Lima',
+            state='Lima',
+            postal_code=15001,
+            country='Peru'
+        )
+        segment = MarketingSegment.objects.create(name='VIP Peru', customer_group=group, country='peru')
+
+        refresh_segment(segment)
+
+        self.assertEqual(members(segment), {'other'})
+
+class SegmentMemberAPITest(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        for index in range(3):
+            create_user(f'user{index}')
+        self.segment = MarketingSegment.objects.create(name='Everyone')
+        refresh_segment(self.segment)
+
+    def test_cursor_pagination(self):
+        """Test de paginación por cursor de los miembros"""
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('users:segment-members', args=[self.segment.pk])
+
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
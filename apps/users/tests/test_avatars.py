@@ -0,0 +1,96 @@
+# apps/users/tests/test_avatars.py
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from PIL import Image
+from apps.users.avatars import pending_avatars, process_avatar
+from apps.users.models import UserProfile
+from apps.users.serializers import UserProfileSerializer
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(name='avatar.png', size=(800, 600), color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class AvatarProcessingTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_process_avatar_generates_variants(self):
+        """Test de generación de variantes del avatar"""
+        profile = UserProfile.objects.create(user=self.user, avatar=make_image())
+        self.assertIn(profile, pending_avatars())
+
+        variants = process_avatar(profile)
+
+        self.assertEqual(set(variants), {'small', 'medium'})
+        self.assertTrue(variants['small']['webp'].endswith('-64.webp'))
+        with profile.avatar.storage.open(variants['medium']['jpeg']) as file:
+            self.assertEqual(max(Image.open(file).size), 256)
+        self.assertNotIn(profile, pending_avatars())
+
+    def test_identical_uploads_share_variants(self):
+        """Test de deduplicación de variantes por contenido"""
+        other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        first = UserProfile.objects.create(user=self.user, avatar=make_image('a.png'))
+        second = UserProfile.objects.create(user=other, avatar=make_image('b.png'))
+
+        self.assertEqual(process_avatar(first), process_avatar(second))
+
+    def test_invalid_image_is_dropped(self):
+        """Test de avatar inválido descartado por el worker"""
+        upload = SimpleUploadedFile('avatar.png', b'not an image', content_type='image/png')
+        profile = UserProfile.objects.create(user=self.user, avatar=upload)
+
+        self.assertEqual(process_avatar(profile), {})
+        profile.refresh_from_db()
+        self.assertFalse(profile.avatar)
+
+    def test_stale_job_leaves_a_newer_upload_alone(self):
+        """Test de trabajo antiguo frente a un avatar subido después"""
+        invalid = SimpleUploadedFile('old.png', b'not an image', content_type='image/png')
+        for old_upload in [invalid, make_image('old.png')]:
+            stale = UserProfile.objects.update_or_create(user=self.user, defaults={'avatar': old_upload})[0]
+            current = UserProfile.objects.get(pk=stale.pk)
+            current.avatar = make_image('new.png', color='blue')
+            current.save()
+
+            process_avatar(stale)
+
+            current.refresh_from_db()
+            self.assertTrue(current.avatar.name.startswith('avatars/new'))
+            self.assertTrue(current.avatar.storage.exists(current.avatar.name))
+            self.assertEqual(current.avatar_variants, {})
+
+    @override_settings(AVATAR_MAX_UPLOAD_SIZE=1024)
+    def test_serializer_rejects_large_avatar(self):
+        """Test de límite de tamaño del avatar"""
+        serializer = UserProfileSerializer(data={'avatar': make_image(size=(2000, 2000))})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('avatar', serializer.errors)
@@ -0,0 +1,131 @@
+# apps/users/tests/test_changefeed.py
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.changefeed import prune_change_log, read_changes
+from apps.users.models import Address, ChangeLogEntry, UserProfile
+
+User = get_user_model()
+
+
+def changed(changes):
+    return [(change['type'], change['id'], change['deleted']) for change in changes]
+
+
+@override_settings(CHANGE_FEED_VISIBILITY_LAG=0)
+class ChangeFeedTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.profile = UserProfile.objects.create(user=self.user)
+        _, self.checkpoint, _ = read_changes()
+
+    def test_changes_since_checkpoint(self):
+        """Test de cambios desde un checkpoint"""
+        address = Address.objects.create(
+            user=self.user,
+            street_address='123 Test St',
+            city='Test City',
+            state='Test State',
+            postal_code=12345,
+            country='Test Country'
+        )
+        self.user.first_name = 'Changed'
+        self.user.save()
+        self.user.first_name = 'Changed again'
+        self.user.save()
+
+        changes, checkpoint, has_more = read_changes(self.checkpoint)
+
+        self.assertEqual(changed(changes), [('address', address.pk, False), ('user', self.user.pk, False)])
+        self.assertEqual(changes[1]['data']['first_name'], 'Changed again')
+        self.assertFalse(has_more)
+        self.assertEqual(read_changes(checkpoint)[0], [])
+
+    def test_deletions_are_tombstones(self):
+        """Test de eliminaciones reportadas como tombstones"""
+        profile_pk = self.profile.pk
+        self.profile.delete()
+
+        changes, _, _ = read_changes(self.checkpoint)
+
+        self.assertEqual(changed(changes), [('profile', profile_pk, True)])
+
+    def test_pages(self):
+        """Test de paginación del feed"""
+        for name in ['a', 'b', 'c']:
+            self.user.first_name = name
+            self.user.save()
+            self.profile.bio = name
+            self.profile.save()
+
+        changes, checkpoint, has_more = read_changes(self.checkpoint, limit=3)
+        self.assertTrue(has_more)
+        changes, checkpoint, has_more = read_changes(checkpoint, limit=3)
+        self.assertFalse(has_more)
+        self.assertEqual(changed(changes), [('user', self.user.pk, False), ('profile', self.profile.pk, False)])
+
+    def test_prune(self):
+        """Test de limpieza de entradas antiguas"""
+        entries = ChangeLogEntry.objects.count()
+
+        self.assertEqual(prune_change_log(timedelta(days=1)), 0)
+        self.assertEqual(prune_change_log(timedelta(days=-1)), entries)
+        self.assertFalse(ChangeLogEntry.objects.exists())
+
+    @override_settings(CHANGE_FEED_VISIBILITY_LAG=60)
+    def test_recent_entries_wait_for_the_visibility_lag(self):
+        """Test de entradas recientes que aún pueden tener ids sin confirmar"""
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.user.first_name = 'Changed'
+        self.user.save()
+        old = ChangeLogEntry.objects.create(kind='profile', object_id=self.profile.pk)
+        ChangeLogEntry.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        # The user entry is too recent, so the older entry after it waits too.
+        changes, checkpoint, has_more = read_changes(self.checkpoint)
+        self.assertEqual(changes, [])
+        self.assertEqual(checkpoint, self.checkpoint)
+        self.assertFalse(has_more)
+
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        changes, _, _ = read_changes(self.checkpoint)
+        self.assertEqual(changed(changes), [('user', self.user.pk, False), ('profile', self.profile.pk, False)])
+
+
+@override_settings(CHANGE_FEED_VISIBILITY_LAG=0)
+class ChangeFeedAPITest(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('users:user-changes')
+
+    def test_change_feed(self):
+        """Test del endpoint de cambios"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(('user', self.admin.pk, False), changed(response.data['changes']))
+
+        response = self.client.get(self.url, {'checkpoint': response.data['checkpoint']})
+        self.assertEqual(response.data['changes'], [])
+
+    def test_invalid_checkpoint(self):
+        """Test de checkpoint inválido"""
+        response = self.client.get(self.url, {'checkpoint': '!!'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
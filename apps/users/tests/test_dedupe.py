@@ -0,0 +1,121 @@
+# apps/users/tests/test_dedupe.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.models import Address, OutboxEvent
+from apps.users.normalization import address_fingerprint
+
+User = get_user_model()
+
+ADDRESS = {
+    'street_address': '123 Main St',
+    'city': 'Springfield',
+    'state': 'IL',
+    'postal_code': 62701,
+    'country': 'USA',
+}
+
+
+class AddressFingerprintTest(SimpleTestCase):
+
+    def test_case_and_spacing_are_ignored(self):
+        """Test de normalización de la huella de dirección"""
+        self.assertEqual(
+            address_fingerprint('123 Main St', '', 'Springfield', 'IL', 62701, 'USA', 'shipping'),
+            address_fingerprint('  123   MAIN st ', None, 'springfield', 'il', '62701', 'usa', 'Shipping'),
+        )
+        self.assertNotEqual(
+            address_fingerprint('123 Main St', '4B', 'Springfield', 'IL', 62701, 'USA', 'shipping'),
+            address_fingerprint('123 Main St', '', 'Springfield', 'IL', 62701, 'USA', 'shipping'),
+        )
+        self.assertNotEqual(
+            address_fingerprint('123 Main St', '', 'Springfield', 'IL', 62701, 'USA', 'billing'),
+            address_fingerprint('123 Main St', '', 'Springfield', 'IL', 62701, 'USA', 'shipping'),
+        )
+
+
+class AddressReuseAPITest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_duplicate_create_returns_existing_address(self):
+        """Test de reutilización de una dirección duplicada"""
+        url = reverse('users:address-list')
+        first = self.client.post(url, ADDRESS)
+        second = self.client.post(url, {**ADDRESS, 'street_address': '123  main ST', 'is_default': True})
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertTrue(second.data['is_default'])
+        self.assertEqual(Address.objects.filter(user=self.user).count(), 1)
+
+        other = self.client.post(url, {**ADDRESS, 'apartment': '4B'})
+        self.assertEqual(other.status_code, status.HTTP_201_CREATED)
+
+    def test_other_type_is_a_new_address(self):
+        """Test de dirección de facturación igual a una de envío"""
+        url = reverse('users:address-list')
+        shipping = self.client.post(url, ADDRESS)
+        billing = self.client.post(url, {**ADDRESS, 'type': 'billing'})
+
+        self.assertEqual(billing.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(billing.data['id'], shipping.data['id'])
+        self.assertEqual(
+            sorted(Address.objects.filter(user=self.user).values_list('type', flat=True)), ['billing', 'shipping']
+        )
+        again = self.client.post(url, {**ADDRESS, 'type': 'billing'})
+        self.assertEqual((again.status_code, again.data['id']), (status.HTTP_200_OK, billing.data['id']))
+
+    def test_reuse_keeps_new_delivery_instructions(self):
+        """Test de instrucciones de entrega al reutilizar una dirección"""
+        url = reverse('users:address-list')
+        first = self.client.post(url, {**ADDRESS, 'delivery_instructions': 'Ring twice'})
+        second = self.client.post(url, {**ADDRESS, 'delivery_instructions': 'Leave at the door'})
+
+        self.assertEqual((second.status_code, second.data['id']), (status.HTTP_200_OK, first.data['id']))
+        self.assertEqual(second.data['delivery_instructions'], 'Leave at the door')
+        self.assertEqual(Address.objects.get(pk=first.data['id']).delivery_instructions, 'Leave at the door')
+
+        third = self.client.post(url, ADDRESS)
+        self.assertEqual(third.data['delivery_instructions'], 'Leave at the door')
+
+
+class DedupeAddressesTest(TestCase):
+
+    def test_command_archives_duplicates(self):
+        """Test del comando de deduplicación de direcciones"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        copies = [
+            Address.objects.create(user=user, **{**ADDRESS, 'city': city})
+            for city in ['Springfield', 'SPRINGFIELD', ' springfield ']
+        ]
+        Address.objects.filter(pk=copies[1].pk).update(is_default=True)
+        unique = Address.objects.create(user=user, **{**ADDRESS, 'street_address': '9 Elm St'})
+        kept_elsewhere = Address.objects.create(user=other, **ADDRESS)
+        OutboxEvent.objects.all().delete()
+
+        output = StringIO()
+        call_command('dedupe_addresses', stdout=output)
+
+        self.assertIn('Archived 2 duplicate addresses in 1 groups', output.getvalue())
+        self.assertEqual(
+            set(Address.objects.active().values_list('pk', flat=True)),
+            {copies[0].pk, unique.pk, kept_elsewhere.pk}
+        )
+        copies[0].refresh_from_db()
+        self.assertTrue(copies[0].is_default)
+        self.assertEqual(Address.objects.filter(user=user, is_default=True).count(), 1)
+        self.assertEqual(OutboxEvent.objects.get().payload['address_id'], copies[0].pk)
@@ -0,0 +1,144 @@
+# apps/users/tests/test_exports.py
+import json
+import shutil
+import tempfile
+import os
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users import jobs
+from apps.users.models import Address, DataExport, UserProfile
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+AVATAR = b'\x89PNG avatar bytes ' * 5000
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DataExportAPITest(APITestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        UserProfile.objects.create(
+            user=self.user, bio='Hello', avatar=SimpleUploadedFile('me.png', AVATAR, content_type='image/png')
+        )
+        for city in ['Springfield', 'Shelbyville']:
+            Address.objects.create(
+                user=self.user,
+                street_address='123 Test St',
+                city=city,
+                state='Test State',
+                postal_code=12345,
+                country='Test Country'
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def assert_archive(self, content):
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            names = archive.namelist()
+            self.assertEqual(names[:3], ['user.json', 'addresses.json', 'archived_addresses.json'])
+            user = json.loads(archive.read('user.json'))
+            addresses = json.loads(archive.read('addresses.json'))
+            avatar = archive.read(names[3])
+        self.assertEqual(user['email'], 'test@example.com')
+        self.assertEqual(user['profile']['bio'], 'Hello')
+        self.assertEqual([address['city'] for address in addresses], ['Springfield', 'Shelbyville'])
+        self.assertTrue(names[3].startswith('avatar/'))
+        self.assertEqual(avatar, AVATAR)
+
+    def test_small_export_is_streamed(self):
+        """Test de exportación en streaming"""
+        response = self.client.get(reverse('users:data-export'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assert_archive(b''.join(response.streaming_content))
+
+    @override_settings(DATA_EXPORT_INLINE_MAX_ADDRESSES=1)
+    def test_large_export_is_built_in_background(self):
+        """Test de exportación en segundo plano con descarga reanudable"""
+        self.assertEqual(self.client.get(reverse('users:data-export')).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(DataExport.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('users:data-export'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        # Repeated requests get the export in progress.
+        self.assertEqual(self.client.post(reverse('users:data-export')).data['id'], response.data['id'])
+        self.assertEqual(self.client.get(reverse('users:data-export')).data['id'], response.data['id'])
+        jobs.run_pending('worker')
+
+        detail = self.client.get(reverse('users:data-export-detail', args=[response.data['id']]))
+        self.assertEqual(detail.data['status'], 'ready')
+        self.assertIsNotNone(detail.data['expires_at'])
+        download_url = detail.data['download_url']
+
+        full = self.client.get(download_url)
+        self.assertEqual(full.status_code, status.HTTP_200_OK)
+        self.assertEqual(full['Accept-Ranges'], 'bytes')
+        content = b''.join(full.streaming_content)
+        self.assert_archive(content)
+
+        partial = self.client.get(download_url, HTTP_RANGE='bytes=100-', HTTP_IF_RANGE=full['ETag'])
+        self.assertEqual(partial.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(partial['Content-Range'], f'bytes 100-{len(content) - 1}/{len(content)}')
+        self.assertEqual(b''.join(partial.streaming_content), content[100:])
+
+        outside = self.client.get(download_url, HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(outside.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_exports_of_other_users_are_hidden(self):
+        """Test de acceso a exportaciones de otro usuario"""
+        other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        export = DataExport.objects.create(user=other, status='ready')
+
+        response = self.client.get(reverse('users:data-export-download', args=[export.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_exports_are_purged(self):
+        """Test de caducidad y limpieza de exportaciones"""
+        now = timezone.now()
+        expired = DataExport.objects.create(user=self.user, status='ready', completed_at=now - timedelta(days=8))
+        expired.file.save('expired.zip', ContentFile(b'zip'), save=True)
+        abandoned = DataExport.objects.create(user=self.user)
+        DataExport.objects.filter(pk=abandoned.pk).update(created_at=now - timedelta(days=8))
+        fresh = DataExport.objects.create(user=self.user, status='ready', completed_at=now)
+        path = expired.file.path
+
+        response = self.client.get(reverse('users:data-export-download', args=[expired.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        output = StringIO()
+        call_command('purge_data_exports', stdout=output)
+
+        self.assertIn('Deleted 2 data exports', output.getvalue())
+        self.assertEqual(list(DataExport.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,105 @@
+# apps/users/tests/test_groups.py
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from apps.users.groups import best_discount_for, get_catalog
+from rest_framework import serializers
+from apps.users.models import CustomerGroup, SnapshotVersion
+from apps.users.serializers import CatalogCustomerGroupsField, UserSerializer
+
+User = get_user_model()
+
+
+class GroupsSerializer(serializers.Serializer):
+    customer_groups = CatalogCustomerGroupsField()
+
+
+@override_settings(DATABASE_ROUTERS=[], USER_SHARDS=['default'])  # Query counts of one database.
+class GroupCatalogTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.silver = CustomerGroup.objects.create(name='Silver', discount_percentage=Decimal('5.00'))
+        self.gold = CustomerGroup.objects.create(name='Gold', discount_percentage=Decimal('12.50'))
+        self.retired = CustomerGroup.objects.create(
+            name='Retired', discount_percentage=Decimal('50.00'), is_active=False
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_catalog_snapshot_is_reused(self):
+        """Test de snapshot de grupos sin consultas"""
+        catalog = get_catalog()
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_catalog(), catalog)
+            self.assertEqual(catalog.get(self.gold.pk).name, 'Gold')
+
+    def test_catalog_reloads_when_a_group_changes(self):
+        """Test de invalidación del catálogo al guardar un grupo"""
+        get_catalog()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gold.discount_percentage = Decimal('15.00')
+            self.gold.save()
+
+        self.assertEqual(get_catalog().get(self.gold.pk).discount_percentage, Decimal('15.00'))
+
+    def test_catalog_reloads_after_a_change_in_another_process(self):
+        """Test de invalidación publicada por otro proceso"""
+        get_catalog()
+        # Another process: its save bumps the version row, not this process' cache.
+        CustomerGroup.objects.filter(pk=self.gold.pk).update(discount_percentage=Decimal('20.00'))
+        SnapshotVersion.objects.filter(name='customer-groups').update(version='from-another-process')
+
+        self.assertEqual(get_catalog().get(self.gold.pk).discount_percentage, Decimal('12.50'))
+        cache.clear()  # SNAPSHOT_VERSION_TTL elapsed.
+        self.assertEqual(get_catalog().get(self.gold.pk).discount_percentage, Decimal('20.00'))
+
+    def test_list_serialization_loads_memberships_once(self):
+        """Test de grupos de una página de usuarios en una consulta"""
+        users = [self.user] + [
+            User.objects.create_user(username=f'user{index}', email=f'user{index}@example.com', password='testpass123')
+            for index in range(3)
+        ]
+        for user in users:
+            user.customer_groups.add(self.silver)
+        get_catalog()
+
+        with self.assertNumQueries(1):
+            data = GroupsSerializer(users, many=True).data
+
+        self.assertEqual([row['customer_groups'][0]['name'] for row in data], ['Silver'] * 4)
+
+    def test_best_discount_for(self):
+        """Test de mejor descuento por usuario en una consulta"""
+        other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.user.customer_groups.add(self.silver, self.gold, self.retired)
+        get_catalog()
+
+        with self.assertNumQueries(1):
+            discounts = best_discount_for([self.user.pk, other.pk])
+
+        self.assertEqual(discounts, {self.user.pk: Decimal('12.50'), other.pk: Decimal('0')})
+
+    def test_serializer_reads_groups_from_catalog(self):
+        """Test de serialización de grupos desde el catálogo"""
+        self.user.customer_groups.add(self.gold)
+
+        data = UserSerializer(self.user).data
+
+        self.assertEqual(data['customer_groups'], [{
+            'id': self.gold.pk,
+            'name': 'Gold',
+            'description': '',
+            'discount_percentage': '12.50',
+        }])
@@ -0,0 +1,77 @@
+# apps/users/tests/test_hashers.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2SHA1PasswordHasher, identify_hasher
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+User = get_user_model()
+
+
+def iterations(user):
+    return identify_hasher(user.password).decode(user.password)['iterations']
+
+
+class PasswordRehashTest(APITestCase):
+
+    def setUp(self):
+        with self.settings(PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 1000}}):
+            self.user = User.objects.create_user(
+                username='testuser',
+                email='test@example.com',
+                password='testpass123'
+            )
+
+    def test_hash_is_upgraded_on_login(self):
+        """Test de actualización del hash al iniciar sesión"""
+        self.assertEqual(iterations(self.user), 1000)
+
+        with self.settings(PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 2000}}):
+            response = self.client.post(
+                reverse('token_obtain_pair'), {'email': 'test@example.com', 'password': 'testpass123'}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(iterations(self.user), 2000)
+
+    def test_stock_hash_is_upgraded_on_login(self):
+        """Test de actualización de un hash de otro algoritmo"""
+        hasher = PBKDF2SHA1PasswordHasher()
+        User.objects.filter(pk=self.user.pk).update(password=hasher.encode('testpass123', hasher.salt()))
+
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'email': 'test@example.com', 'password': 'testpass123'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, 'pbkdf2_sha256')
+
+    @override_settings(PASSWORD_HASHER_PARAMETERS={'pbkdf2_sha256': {'iterations': 2000}})
+    def test_failed_login_keeps_hash(self):
+        """Test de hash sin cambios con contraseña incorrecta"""
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'email': 'test@example.com', 'password': 'wrong'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertEqual(iterations(self.user), 1000)
+
+
+class CalibrationCommandTest(TestCase):
+
+    def test_reports_parameters_and_capacity(self):
+        """Test del comando de calibración"""
+        output = StringIO()
+
+        call_command('calibrate_password_hashers', target_ms=1, rounds=1, stdout=output)
+
+        self.assertIn("'pbkdf2_sha256': {'iterations': 600000}", output.getvalue())
+        self.assertIn('logins/s/core', output.getvalue())
+        self.assertIn('PBKDF2SHA1PasswordHasher', output.getvalue())
@@ -0,0 +1,188 @@
+# apps/users/tests/test_idempotency.py
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework import status
+from apps.users.idempotency import idempotent, purge_expired_keys
+from apps.users.models import Address, IdempotencyKey
+
+User = get_user_model()
+
+REGISTRATION = {
+    'username': 'newuser',
+    'email': 'new@example.com',
+    'password': 'strongpass123',
+    'password_confirm': 'strongpass123',
+    'first_name': 'New',
+    'last_name': 'User',
+}
+
+ADDRESS = {
+    'street_address': '123 Main St',
+    'city': 'Springfield',
+    'state': 'IL',
+    'postal_code': 62701,
+    'country': 'USA',
+}
+
+
+class RegistrationIdempotencyTest(APITestCase):
+
+    def setUp(self):
+        self.url = reverse('users:user-register')
+
+    def test_retry_replays_first_response(self):
+        """Test de reintento de registro con la misma clave"""
+        first = self.client.post(self.url, REGISTRATION, HTTP_IDEMPOTENCY_KEY='signup-1')
+        second = self.client.post(self.url, REGISTRATION, HTTP_IDEMPOTENCY_KEY='signup-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(User.objects.filter(email='new@example.com').count(), 1)
+
+    def test_key_reused_with_other_body_is_rejected(self):
+        """Test de clave reutilizada con otro cuerpo"""
+        self.client.post(self.url, REGISTRATION, HTTP_IDEMPOTENCY_KEY='signup-1')
+        response = self.client.post(
+            self.url, {**REGISTRATION, 'username': 'other', 'email': 'other@example.com'},
+            HTTP_IDEMPOTENCY_KEY='signup-1'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(User.objects.filter(email='other@example.com').exists())
+
+    def test_without_key_requests_run_normally(self):
+        """Test de registro sin clave de idempotencia"""
+        self.client.post(self.url, REGISTRATION)
+        response = self.client.post(self.url, REGISTRATION)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AddressIdempotencyTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('users:address-list')
+
+    def test_retry_replays_created_address(self):
+        """Test de reintento de creación de dirección"""
+        first = self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+        second = self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(Address.objects.filter(user=self.user).count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        """Test de claves separadas por usuario"""
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+        self.client.force_authenticate(user=other)
+        response = self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Address.objects.filter(user=other).count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.2)
+    def test_in_flight_request_returns_conflict(self):
+        """Test de petición duplicada mientras la primera sigue en curso"""
+        first = self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+        record = IdempotencyKey.objects.get(scope='address-create', owner=str(self.user.pk))
+        IdempotencyKey.objects.filter(pk=record.pk).update(state='running')
+
+        response = self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Address.objects.filter(user=self.user).count(), 1)
+
+        # A claim whose request died is taken over once its lock expires.
+        IdempotencyKey.objects.filter(pk=record.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        response = self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], first.data['id'])
+        self.assertEqual(IdempotencyKey.objects.get().state, 'done')
+
+    def test_expired_keys_are_purged(self):
+        """Test de limpieza de claves caducadas"""
+        self.client.post(self.url, ADDRESS, HTTP_IDEMPOTENCY_KEY='addr-1')
+        self.client.post(self.url, {**ADDRESS, 'city': 'Shelbyville'}, HTTP_IDEMPOTENCY_KEY='addr-2')
+        IdempotencyKey.objects.filter(key_hash=hashlib.sha256(b'addr-1').hexdigest()).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(purge_expired_keys(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+
+class ConcurrentIdempotencyTest(TransactionTestCase):
+
+    def request(self):
+        request = Request(APIRequestFactory().post(
+            '/users/register/', REGISTRATION, format='json', HTTP_IDEMPOTENCY_KEY='signup-1'
+        ), parsers=[JSONParser()])
+        request.user = AnonymousUser()
+        return request
+
+    def test_concurrent_duplicates_execute_once(self):
+        """Test de dos peticiones simultáneas con la misma clave"""
+        executions = []
+        started = threading.Event()
+        waiting = threading.Event()
+        responses = {}
+        real_sleep = time.sleep
+
+        def execute():
+            executions.append(threading.current_thread().name)
+            started.set()
+            # Hold the claim until the duplicate is waiting on it.
+            waiting.wait(5)
+            return Response({'id': 1}, status=status.HTTP_201_CREATED)
+
+        def poll(seconds):
+            waiting.set()
+            real_sleep(seconds)
+
+        def send(name):
+            try:
+                responses[name] = idempotent(self.request(), 'register', execute)
+            finally:
+                connections.close_all()
+
+        with mock.patch('apps.users.idempotency.time.sleep', poll):
+            first = threading.Thread(target=send, args=('first',), name='first')
+            second = threading.Thread(target=send, args=('second',), name='second')
+            first.start()
+            started.wait(5)
+            second.start()
+            first.join(10)
+            second.join(10)
+
+        self.assertEqual(executions, ['first'])
+        self.assertEqual(responses['first'].status_code, status.HTTP_201_CREATED)
+        self.assertEqual(responses['second'].status_code, status.HTTP_201_CREATED)
+        self.assertEqual(responses['second'].data, {'id': 1})
+        self.assertEqual(responses['second']['Idempotent-Replayed'], 'true')
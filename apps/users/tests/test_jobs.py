@@ -0,0 +1,163 @@
+# apps/users/tests/test_jobs.py
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users import jobs
+from apps.users.models import ChangeLogEntry, CustomerGroup, Job
+
+User = get_user_model()
+
+calls = []
+
+
+@jobs.register('tests.single')
+def single_job(payload):
+    if payload.get('fail'):
+        raise ValueError('boom')
+    calls.append(('single', payload))
+
+
+@jobs.register('tests.batch', batch=True)
+def batch_job(payloads):
+    calls.append(('batch', payloads))
+
+
+@jobs.register('tests.periodic', interval=60)
+def periodic_job(payload):
+    calls.append(('periodic', payload))
+    if payload.get('fail'):
+        raise ValueError('boom')
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_batch_handlers_receive_all_payloads(self):
+        """Test de agrupación de trabajos similares"""
+        jobs.enqueue('tests.batch', {'n': 1})
+        jobs.enqueue('tests.batch', {'n': 2})
+        jobs.enqueue('tests.single', {'n': 3})
+
+        self.assertEqual(jobs.run_pending('worker'), (3, 0))
+        self.assertIn(('batch', [{'n': 1}, {'n': 2}]), calls)
+        self.assertIn(('single', {'n': 3}), calls)
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_backs_off_and_gives_up(self):
+        """Test de reintentos con backoff"""
+        job = jobs.enqueue('tests.single', {'fail': True}, max_attempts=2)
+
+        with self.assertLogs('apps.users.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending('worker'), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        # Not due yet
+        self.assertEqual(jobs.run_pending('worker'), (0, 0))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('apps.users.jobs', 'ERROR'):
+            jobs.run_pending('worker')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_expired_lease_is_claimed_again(self):
+        """Test de reclamo de trabajos con lease vencido"""
+        job = jobs.enqueue('tests.single', {'n': 1})
+
+        self.assertEqual(len(jobs.claim_jobs('first', lease_seconds=60)), 1)
+        self.assertEqual(jobs.claim_jobs('second'), [])
+
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = jobs.claim_jobs('second')
+        self.assertEqual([claimed_job.locked_by for claimed_job in claimed], ['second'])
+        self.assertEqual(claimed[0].attempts, 2)
+
+    def test_job_that_kills_its_worker_gives_up(self):
+        """Test de trabajos que nunca terminan su lease"""
+        job = jobs.enqueue('tests.single', {'n': 1}, max_attempts=2)
+
+        for worker in ['first', 'second']:
+            self.assertEqual(len(jobs.claim_jobs(worker)), 1)
+            # The worker dies without completing or failing the job.
+            Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(jobs.claim_jobs('third'), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('Lease expired', job.last_error)
+
+
+class PeriodicJobsTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_next_run_is_scheduled_after_success(self):
+        """Test de encadenamiento de trabajos periódicos"""
+        jobs.schedule_periodic('tests.periodic')
+        self.assertIsNone(jobs.schedule_periodic('tests.periodic'))
+
+        self.assertEqual(jobs.run_pending('worker'), (1, 0))
+        next_run = Job.objects.get(name='tests.periodic')
+        self.assertEqual(next_run.status, 'pending')
+        self.assertGreater(next_run.run_at, timezone.now() + timedelta(seconds=50))
+
+    def test_failed_run_keeps_the_chain(self):
+        """Test de trabajos periódicos que fallan"""
+        job = jobs.enqueue('tests.periodic', {'fail': True}, max_attempts=1)
+
+        with self.assertLogs('apps.users.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending('worker'), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(Job.objects.filter(name='tests.periodic', status='pending').exists())
+
+    def test_run_that_kills_its_worker_keeps_the_chain(self):
+        """Test de trabajos periódicos que nunca terminan"""
+        job = jobs.enqueue('tests.periodic', max_attempts=1)
+        jobs.claim_jobs('first')
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        # The lease expired on the last attempt: the run is abandoned and the next one scheduled.
+        self.assertEqual(jobs.claim_jobs('second'), [])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(Job.objects.filter(name='tests.periodic', status='pending').exists())
+        self.assertIsNone(jobs.schedule_periodic('tests.periodic'))
+
+
+class RegistrationJobsTest(APITestCase):
+
+    def test_registration_enqueues_group_assignment(self):
+        """Test de asignación de grupos después del registro"""
+        group = CustomerGroup.objects.create(name='Everyone')
+        CustomerGroup.objects.create(name='Big spenders', min_spent=1000)
+        data = {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'strongpass123',
+            'password_confirm': 'strongpass123',
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('users:user-register'), data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Job.objects.filter(name='users.assign_default_groups').exists())
+
+        jobs.run_pending('worker')
+        user = User.objects.get(email='new@example.com')
+        self.assertEqual(list(user.customer_groups.all()), [group])
+        # Memberships added in bulk still reach the change feed.
+        self.assertEqual(ChangeLogEntry.objects.filter(kind='user', object_id=user.pk).count(), 2)
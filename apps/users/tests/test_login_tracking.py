@@ -0,0 +1,104 @@
+# apps/users/tests/test_login_tracking.py
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.login_tracking import LoginTracker
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_ROUTERS=[], USER_SHARDS=['default'])  # Query counts of one database.
+class LoginTrackerTest(TestCase):
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'user{index}',
+                email=f'user{index}@example.com',
+                password='testpass123'
+            )
+            for index in range(3)
+        ]
+
+    def test_flush_writes_all_logins_in_one_query(self):
+        """Test de escritura agrupada de last_login"""
+        tracker = LoginTracker(max_staleness=3600)
+        now = timezone.now()
+        for offset, user in enumerate(self.users):
+            tracker.record(user, when=now - timedelta(minutes=offset))
+        tracker.record(self.users[0], when=now + timedelta(minutes=1))
+        self.assertIsNone(User.objects.get(pk=self.users[0].pk).last_login)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(tracker.flush(), 3)
+
+        logins = dict(User.objects.values_list('pk', 'last_login'))
+        self.assertEqual(logins[self.users[0].pk], now + timedelta(minutes=1))
+        self.assertEqual(logins[self.users[2].pk], now - timedelta(minutes=2))
+        self.assertEqual(tracker.flush(), 0)
+
+    def test_flushes_when_stale_or_full(self):
+        """Test de vaciado por antigüedad y por tamaño del buffer"""
+        tracker = LoginTracker(max_staleness=0)
+        tracker.record(self.users[0])
+        self.assertIsNotNone(User.objects.get(pk=self.users[0].pk).last_login)
+
+        tracker = LoginTracker(max_staleness=3600, max_buffer=2)
+        tracker.record(self.users[1])
+        self.assertIsNone(User.objects.get(pk=self.users[1].pk).last_login)
+        tracker.record(self.users[2])
+        self.assertIsNotNone(User.objects.get(pk=self.users[1].pk).last_login)
+
+
+class BackgroundFlushTest(TransactionTestCase):
+
+    def test_quiet_process_flushes_within_the_window(self):
+        """Test de vaciado periódico sin logins posteriores"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        tracker = LoginTracker(max_staleness=0.1)
+        tracker.start()
+        self.addCleanup(tracker.stop)
+
+        tracker.record(user)
+        deadline = time.monotonic() + 5
+        while User.objects.get(pk=user.pk).last_login is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        self.assertIsNotNone(User.objects.get(pk=user.pk).last_login)
+        self.assertEqual(tracker.buffer, {})
+        self.assertTrue(tracker.flusher.daemon)
+
+
+class TokenLoginTrackingTest(APITestCase):
+
+    def setUp(self):
+        # A tracker of its own: logins buffered by earlier tests may hold reused pks.
+        self.tracker = LoginTracker()
+        patcher = mock.patch('apps.users.serializers.login_tracker', self.tracker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_login_is_buffered(self):
+        """Test de login con token sin escritura inmediata"""
+        user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        response = self.client.post(reverse('token_obtain_pair'), {'email': 'test@example.com', 'password': 'testpass123'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+        user.refresh_from_db()
+        self.assertIsNone(user.last_login)
+        self.assertEqual(self.tracker.flush(), 1)
+        user.refresh_from_db()
+        self.assertIsNotNone(user.last_login)
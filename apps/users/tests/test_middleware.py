@@ -0,0 +1,35 @@
+# apps/users/tests/test_middleware.py
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import RefreshToken
+
+User = get_user_model()
+
+class MiddlewareProfileTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+
+    def test_api_requests_skip_session_stack(self):
+        """Test de API sin sesión, CSRF ni mensajes"""
+        access = RefreshToken.for_user(self.user).access_token
+
+        response = self.client.get(reverse('users:user-me'), HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertFalse(hasattr(response.wsgi_request, '_messages'))
+        self.assertNotIn('csrftoken', response.cookies)
+
+    def test_admin_keeps_full_stack(self):
+        """Test de admin con el stack completo"""
+        response = self.client.get(reverse('admin:login'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        self.assertIn('csrftoken', response.cookies)
@@ -0,0 +1,89 @@
+# apps/users/tests/test_migration_operations.py
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from apps.users.migration_operations import BackfillColumn
+from apps.users.models import BackfillCheckpoint
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_ROUTERS=[], USER_SHARDS=['default'])  # Query counts of one database.
+class BackfillColumnTest(TransactionTestCase):
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                password='testpass123',
+                phone='555 123 4567'
+            )
+            for number in range(5)
+        ]
+        User.objects.update(phone_normalized='')
+        self.state = MigrationExecutor(connection).loader.project_state(('users', '0017_online_indexes'))
+        self.ranges = []
+
+    def fill(self, queryset):
+        self.ranges.append(sorted(queryset.values_list('pk', flat=True)))
+        queryset.update(phone_normalized='15551234567')
+
+    def run_backfill(self, backwards=False):
+        operation = BackfillColumn('user', 'phone_normalized', self.fill, batch_size=2, pause_factor=0)
+        with connection.schema_editor(atomic=False) as editor:
+            if backwards:
+                operation.database_backwards('users', editor, self.state, self.state)
+            else:
+                operation.database_forwards('users', editor, self.state, self.state)
+
+    def test_fills_every_range_once(self):
+        """Test de relleno por rangos de clave primaria"""
+        self.run_backfill()
+
+        pks = [user.pk for user in self.users]
+        self.assertEqual(self.ranges, [pks[0:2], pks[2:4], pks[4:5]])
+        self.assertFalse(User.objects.filter(phone_normalized='').exists())
+        checkpoint = BackfillCheckpoint.objects.get(name='users.user.phone_normalized')
+        self.assertIsNotNone(checkpoint.completed_at)
+
+        self.run_backfill()
+        self.assertEqual(len(self.ranges), 3)
+
+    def test_resumes_after_checkpoint(self):
+        """Test de reanudación desde el último rango confirmado"""
+        BackfillCheckpoint.objects.create(name='users.user.phone_normalized', last_pk=self.users[2].pk)
+
+        self.run_backfill()
+
+        self.assertEqual(self.ranges, [[self.users[3].pk, self.users[4].pk]])
+        self.assertEqual(
+            list(User.objects.filter(phone_normalized='').order_by('pk').values_list('pk', flat=True)),
+            [user.pk for user in self.users[:3]]
+        )
+
+    def test_backwards_forgets_progress(self):
+        """Test de reversión del relleno"""
+        self.run_backfill()
+        self.run_backfill(backwards=True)
+
+        self.assertFalse(BackfillCheckpoint.objects.exists())
+
+
+class OnlineIndexesTest(TestCase):
+
+    def test_indexes_exist(self):
+        """Test de índices creados por AddIndexOnline"""
+        with connection.cursor() as cursor:
+            user_constraints = connection.introspection.get_constraints(cursor, 'users_user')
+            address_constraints = connection.introspection.get_constraints(cursor, 'users_address')
+
+        self.assertIn('users_user_email_lower_idx', user_constraints)
+        self.assertEqual(address_constraints['users_addr_user_default_idx']['columns'], ['user_id', 'is_default'])
+
+    def test_email_lookup_ignores_case(self):
+        """Test de búsqueda de email sin distinguir mayúsculas"""
+        user = User.objects.create_user(username='mixed', email='Mixed.Case@Example.com', password='testpass123')
+
+        self.assertEqual(list(User.objects.with_email('mixed.case@example.COM')), [user])
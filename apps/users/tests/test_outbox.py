@@ -0,0 +1,139 @@
+# apps/users/tests/test_outbox.py
+import json
+import os
+import queue
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from apps.users.models import Address, OutboxEvent
+from apps.users.outbox import BaseSink, FileSink, QueueSink, Relay, SinkBusy, emit
+from apps.users.serializers import UserUpdateSerializer
+
+User = get_user_model()
+
+
+class FailingSink(BaseSink):
+
+    def publish(self, events):
+        raise ConnectionError('down')
+
+
+class BusySink(BaseSink):
+    """Always busy; stops its relay after a few batches."""
+
+    def __init__(self, busy_batches):
+        self.relay = None
+        self.busy_batches = busy_batches
+
+    def publish(self, events):
+        self.busy_batches -= 1
+        if not self.busy_batches:
+            self.relay.stop()
+        raise SinkBusy('Try later')
+
+
+class OutboxEventsAPITest(APITestCase):
+
+    def test_registration_and_profile_update_emit_events(self):
+        """Test de eventos de registro y actualización de perfil"""
+        data = {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'strongpass123',
+            'password_confirm': 'strongpass123',
+        }
+        self.client.post(reverse('users:user-register'), data)
+        user = User.objects.get(email='new@example.com')
+
+        serializer = UserUpdateSerializer(user, data={'profile': {'bio': 'Hello'}}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(
+            list(OutboxEvent.objects.order_by('pk').values_list('topic', 'key')),
+            [('user.registered', str(user.pk)), ('user.profile_updated', str(user.pk))]
+        )
+
+class OutboxRelayTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_default_address_change_emits_event(self):
+        """Test de evento al cambiar la dirección por defecto"""
+        address = Address.objects.create(
+            user=self.user,
+            street_address='123 Test St',
+            city='Test City',
+            state='Test State',
+            postal_code=12345,
+            country='Test Country',
+            is_default=True
+        )
+        address.city = 'Other City'
+        address.save()
+
+        events = OutboxEvent.objects.filter(topic='address.default_changed')
+        self.assertEqual(events.count(), 1)
+        self.assertEqual(events.get().payload, {'user_id': self.user.pk, 'address_id': address.pk})
+
+    def test_relay_publishes_in_order(self):
+        """Test de publicación ordenada por lotes"""
+        for index in range(5):
+            emit('test.event', self.user.pk, {'index': index})
+        path = os.path.join(tempfile.mkdtemp(), 'outbox.jsonl')
+
+        stats = Relay(FileSink(path), max_batch_size=2).drain()
+
+        self.assertEqual((stats.published, stats.batches), (5, 3))
+        with open(path) as file:
+            self.assertEqual([json.loads(line)['payload']['index'] for line in file], [0, 1, 2, 3, 4])
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+
+    def test_backpressure_shrinks_batches(self):
+        """Test de backpressure con una cola llena"""
+        for index in range(4):
+            emit('test.event', self.user.pk, {'index': index})
+        sink = QueueSink(queue_object=queue.Queue(maxsize=2))
+        relay = Relay(sink, max_batch_size=4, busy_delay=0)
+
+        relay.drain(max_batches=2)
+
+        self.assertEqual(relay.stats.busy, 1)
+        self.assertEqual(relay.stats.published, 2)
+        self.assertEqual(sink.queue.qsize(), 2)
+
+    def test_busy_sink_backs_off_until_stopped(self):
+        """Test de espera creciente y parada con una cola siempre llena"""
+        emit('test.event', self.user.pk, {})
+        sink = BusySink(busy_batches=6)
+        relay = sink.relay = Relay(sink, busy_delay=1, busy_max_delay=8)
+
+        with mock.patch.object(relay, 'wait') as wait:
+            relay.drain()
+
+        self.assertEqual([call.args[0] for call in wait.call_args_list], [1, 2, 4, 8, 8, 8])
+        self.assertEqual(relay.stats.busy, 6)
+
+    def test_failed_batch_is_retried_later(self):
+        """Test de reintento con backoff"""
+        event = emit('test.event', self.user.pk, {})
+
+        with self.assertLogs('apps.users.outbox', 'ERROR'):
+            stats = Relay(FailingSink()).drain()
+
+        self.assertEqual(stats.failed_batches, 1)
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNotNone(event.next_attempt_at)
+        self.assertIsNone(event.published_at)
+        # Blocked until the retry is due
+        self.assertEqual(Relay(FileSink(os.devnull)).drain().published, 0)
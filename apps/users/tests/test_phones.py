@@ -0,0 +1,115 @@
+# apps/users/tests/test_phones.py
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.normalization import normalize_phone
+from apps.users.serializers import UserUpdateSerializer
+
+User = get_user_model()
+
+
+class NormalizePhoneTest(SimpleTestCase):
+
+    def test_notations_share_one_form(self):
+        """Test de normalización de teléfonos"""
+        for phone in ['+1 555-123-4567', '(555) 123-4567', '555.123.4567', '001 555 123 4567', '0555 123 4567']:
+            self.assertEqual(normalize_phone(phone, '1'), '15551234567', phone)
+        self.assertEqual(normalize_phone('+44 20 7946 0958', '1'), '442079460958')
+        self.assertEqual(normalize_phone('5551234567'), '5551234567')
+        self.assertEqual(normalize_phone(None, '1'), '')
+        self.assertEqual(normalize_phone('  ', '1'), '')
+
+
+class PhoneNormalizedTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            phone='(555) 123-4567'
+        )
+
+    def test_saved_with_user(self):
+        """Test de teléfono normalizado al guardar"""
+        self.assertEqual(self.user.phone_normalized, '15551234567')
+
+        self.user.phone = '+44 20 7946 0958'
+        self.user.save(update_fields=['phone'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.phone_normalized, '442079460958')
+
+    def test_update_serializer_writes_normalized_phone(self):
+        """Test de actualización parcial del teléfono"""
+        serializer = UserUpdateSerializer(self.user, data={'phone': '555 987 6543'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.phone_normalized, '15559876543')
+        self.assertEqual(list(User.objects.with_phone('+1 (555) 987-6543')), [self.user])
+        self.assertFalse(User.objects.with_phone('(555) 123-4567').exists())
+
+    def test_validation_of_phone_length(self):
+        """Test de validación de longitud del teléfono"""
+        serializer = UserUpdateSerializer(self.user, data={'phone': '+1234567890123456'}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('phone', serializer.errors)
+
+        # The default country code does not count towards the minimum.
+        for phone in ['12345', '123456789']:
+            serializer = UserUpdateSerializer(self.user, data={'phone': phone}, partial=True)
+            self.assertFalse(serializer.is_valid())
+
+        serializer = UserUpdateSerializer(self.user, data={'phone': '5551234567'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+
+    def test_lookup_uses_the_phone_index(self):
+        """Test de búsqueda por teléfono con el índice parcial"""
+        plan = User.objects.with_phone('(555) 123-4567').explain()
+
+        self.assertIn('users_user_phone_idx', plan)
+        self.assertNotIn('SCAN users_user', plan)
+
+    def test_without_phone_matches_nothing(self):
+        """Test de búsqueda con teléfono vacío"""
+        User.objects.create_user(username='nophone', email='nophone@example.com', password='testpass123')
+
+        self.assertFalse(User.objects.with_phone('').exists())
+
+
+class PhoneLookupAPITest(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            phone='+1 555-123-4567'
+        )
+        self.url = reverse('users:user-phone-lookup')
+
+    def test_lookup_by_any_notation(self):
+        """Test de búsqueda de cuentas por teléfono"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url, {'phone': '(555) 123 4567'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data], [self.user.pk])
+
+        response = self.client.get(self.url, {'phone': '555 000 0000'})
+        self.assertEqual(response.data, [])
+
+    def test_requires_admin(self):
+        """Test de permisos de la búsqueda por teléfono"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {'phone': '5551234567'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
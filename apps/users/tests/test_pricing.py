@@ -0,0 +1,68 @@
+# apps/users/tests/test_pricing.py
+import random
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.contrib.auth import get_user_model
+from apps.users import pricing
+from apps.users.models import CustomerGroup
+
+User = get_user_model()
+
+
+def random_batch(rng, size):
+    user_ids = [rng.randrange(1, 50) for _ in range(size)]
+    prices = [rng.choice([0, 1, 5, 99, rng.randrange(0, 10 ** 9)]) for _ in range(size)]
+    discounts = {
+        user_id: rng.choice([Decimal('0'), Decimal('100'), Decimal(rng.randrange(0, 10001)) / 100])
+        for user_id in range(1, 50)
+    }
+    return user_ids, prices, discounts
+
+
+class PricingEquivalenceTest(SimpleTestCase):
+
+    def assert_matches_reference(self):
+        rng = random.Random(1234)
+        for _ in range(200):
+            user_ids, prices, discounts = random_batch(rng, rng.randrange(1, 50))
+            self.assertEqual(
+                list(pricing.price_batch(user_ids, prices, discounts)),
+                pricing.price_batch_reference(user_ids, prices, discounts)
+            )
+
+    def test_matches_decimal_reference(self):
+        """Test de equivalencia con la implementación Decimal"""
+        self.assert_matches_reference()
+
+    def test_matches_decimal_reference_without_numpy(self):
+        """Test de equivalencia sin NumPy"""
+        with mock.patch.object(pricing, 'np', None):
+            self.assert_matches_reference()
+
+    def test_half_cents_round_up(self):
+        """Test de redondeo al centavo"""
+        self.assertEqual(list(pricing.price_batch([1, 2], [5, 3], {1: Decimal('10'), 2: Decimal('50')})), [5, 2])
+
+    def test_negative_prices_are_rejected(self):
+        """Test de precios negativos"""
+        with self.assertRaises(ValueError):
+            pricing.price_batch([1], [-1], {})
+
+class PricingDiscountResolutionTest(TestCase):
+
+    def test_resolves_group_discounts(self):
+        """Test de resolución de descuentos por grupo"""
+        cache.clear()
+        user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        user.customer_groups.add(CustomerGroup.objects.create(name='Gold', discount_percentage=Decimal('12.50')))
+
+        prices = pricing.price_batch([user.pk, user.pk + 1, user.pk], [1000, 1000, 999])
+
+        self.assertEqual(list(prices), [875, 1000, 874])
@@ -0,0 +1,140 @@
+# apps/users/tests/test_retention.py
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from apps.users import retention, sharding
+from apps.users.models import (
+    Address, ChangeLogEntry, CustomerGroup, MarketingSegment, PurgeCheckpoint, SegmentMember, ShardDirectory,
+    UserProfile,
+)
+from apps.users.retention import CHECKPOINT_NAME, purge_chunk, purge_unverified_users, stale_unverified_users
+
+User = get_user_model()
+
+
+class UnverifiedPurgeTest(TestCase):
+
+    def create_user(self, name, days_ago, **kwargs):
+        user = User.objects.create_user(
+            username=name,
+            email=f'{name}@example.com',
+            password='testpass123',
+            **kwargs
+        )
+        User.objects.filter(pk=user.pk).update(date_joined=timezone.now() - timedelta(days=days_ago))
+        return user
+
+    def setUp(self):
+        self.stale = [self.create_user(f'stale{index}', days_ago=60) for index in range(3)]
+        self.recent = self.create_user('recent', days_ago=1)
+        self.verified = self.create_user('verified', days_ago=60, is_verified=True)
+        self.staff = self.create_user('staff', days_ago=60, is_staff=True)
+
+        group = CustomerGroup.objects.create(name='Gold')
+        segment = MarketingSegment.objects.create(name='Gold buyers', customer_group=group)
+        for user in self.stale + [self.verified]:
+            UserProfile.objects.create(user=user)
+            Address.objects.create(
+                user=user,
+                street_address='123 Test St',
+                city='Test City',
+                state='Test State',
+                postal_code=12345,
+                country='Test Country'
+            )
+            user.customer_groups.add(group)
+            SegmentMember.objects.create(segment=segment, user=user)
+
+    def test_purges_stale_unverified_accounts(self):
+        """Test de purga de cuentas sin verificar"""
+        stale_ids = {user.pk for user in self.stale}
+        ChangeLogEntry.objects.all().delete()
+
+        stats = purge_unverified_users(chunk_size=2, pause_factor=0)
+
+        self.assertEqual((stats.deleted, stats.chunks), (3, 2))
+        self.assertEqual(
+            set(User.objects.values_list('username', flat=True)), {'recent', 'verified', 'staff'}
+        )
+        self.assertFalse(UserProfile.objects.filter(user_id__in=stale_ids).exists())
+        self.assertFalse(Address.objects.filter(user_id__in=stale_ids).exists())
+        self.assertFalse(SegmentMember.objects.filter(user_id__in=stale_ids).exists())
+        self.assertFalse(User.customer_groups.through.objects.filter(user_id__in=stale_ids).exists())
+        self.assertEqual(self.verified.addresses.count(), 1)
+        self.assertEqual(
+            set(ChangeLogEntry.objects.filter(kind='user', deleted=True).values_list('object_id', flat=True)),
+            stale_ids
+        )
+        self.assertEqual(ChangeLogEntry.objects.filter(kind='address', deleted=True).count(), 3)
+
+    def test_resumes_from_checkpoint(self):
+        """Test de reanudación desde el checkpoint"""
+        stats = purge_unverified_users(chunk_size=2, pause_factor=0, max_chunks=1)
+
+        self.assertEqual(stats.deleted, 2)
+        checkpoint = PurgeCheckpoint.objects.get(name=CHECKPOINT_NAME)
+        self.assertEqual(checkpoint.last_pk, self.stale[1].pk)
+        self.assertEqual(checkpoint.deleted, 2)
+
+        output = StringIO()
+        call_command('purge_unverified_users', pause_factor=0, stdout=output)
+
+        self.assertIn('Purged 1 users', output.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.stale[2].pk).exists())
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.last_pk, 0)
+        self.assertIsNone(checkpoint.started_at)
+
+    def test_users_verified_after_selection_are_kept(self):
+        """Test de usuarios verificados entre la selección y la purga"""
+        ChangeLogEntry.objects.all().delete()
+        checkpoint = PurgeCheckpoint.objects.create(name=CHECKPOINT_NAME)
+        user_ids = [user.pk for user in self.stale]
+        User.objects.filter(pk=self.stale[0].pk).update(is_verified=True)
+        User.objects.filter(pk=self.stale[1].pk).update(is_staff=True)
+
+        self.assertEqual(purge_chunk(stale_unverified_users(), user_ids, checkpoint), 1)
+
+        self.assertEqual(set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)), set(user_ids[:2]))
+        self.assertEqual(
+            list(ChangeLogEntry.objects.filter(kind='user', deleted=True).values_list('object_id', flat=True)),
+            [self.stale[2].pk]
+        )
+        self.assertEqual(self.stale[0].addresses.count(), 1)
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.last_pk, checkpoint.deleted), (self.stale[2].pk, 1))
+
+    def test_failed_chunk_is_finished_by_the_next_run(self):
+        """Test de purga interrumpida tras el commit de los shards"""
+        stale_ids = {user.pk for user in self.stale}
+        ChangeLogEntry.objects.all().delete()
+
+        with mock.patch.object(retention, 'forget_purged_users', side_effect=DatabaseError('default is down')):
+            with self.assertRaises(DatabaseError):
+                purge_unverified_users(chunk_size=10, pause_factor=0)
+
+        checkpoint = PurgeCheckpoint.objects.get(name=CHECKPOINT_NAME)
+        self.assertEqual(set(checkpoint.pending), stale_ids)
+        if sharding.enabled():
+            # The shards committed; the directory still lists the users.
+            self.assertFalse(User.objects.filter(pk__in=stale_ids).exists())
+            self.assertEqual(ShardDirectory.objects.filter(pk__in=stale_ids).count(), 3)
+
+        stats = purge_unverified_users(chunk_size=10, pause_factor=0)
+
+        self.assertEqual(stats.deleted, 3)
+        self.assertFalse(User.objects.filter(pk__in=stale_ids).exists())
+        self.assertFalse(ShardDirectory.objects.filter(pk__in=stale_ids).exists())
+        self.assertEqual(
+            set(ChangeLogEntry.objects.filter(kind='user', deleted=True).values_list('object_id', flat=True)),
+            stale_ids
+        )
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.pending, [])
+        self.assertEqual(purge_unverified_users(pause_factor=0).deleted, 0)
@@ -0,0 +1,124 @@
+# apps/users/tests/test_rollups.py
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users import jobs
+from apps.users.models import CustomerGroup, Job, UserRollup
+from apps.users.rollups import refresh_rollups
+
+User = get_user_model()
+
+
+class RollupTestMixin:
+
+    def create_user(self, name, days_ago, **kwargs):
+        user = User.objects.create_user(
+            username=name,
+            email=f'{name}@example.com',
+            password='testpass123',
+            **kwargs
+        )
+        User.objects.filter(pk=user.pk).update(date_joined=timezone.now() - timedelta(days=days_ago))
+        return user
+
+    def rollup(self, days_ago, dimension='all', value=''):
+        day = timezone.localdate() - timedelta(days=days_ago)
+        return UserRollup.objects.filter(day=day, dimension=dimension, value=value).values_list(
+            'users', 'verified', 'accepts_marketing'
+        ).first()
+
+
+class RollupRefreshTest(RollupTestMixin, TestCase):
+
+    def test_incremental_refresh_recounts_changed_days(self):
+        """Test de actualización incremental de los agregados"""
+        old = self.create_user('old', days_ago=10)
+        self.create_user('old2', days_ago=10, accepts_marketing=True)
+        self.create_user('recent', days_ago=1, is_verified=True)
+
+        self.assertEqual(refresh_rollups(), 2)
+        self.assertEqual(self.rollup(10), (2, 0, 1))
+        self.assertEqual(self.rollup(1), (1, 1, 0))
+
+        # Only the signup day of the changed user is counted again.
+        User.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(refresh_rollups(), 0)
+        old.refresh_from_db()
+        old.is_verified = True
+        old.save()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(self.rollup(10), (2, 1, 1))
+
+    def test_backfill_command_rebuilds_history(self):
+        """Test del comando de reconstrucción por bloques de fechas"""
+        group = CustomerGroup.objects.create(name='Gold')
+        for index, days_ago in enumerate([40, 40, 5]):
+            self.create_user(f'user{index}', days_ago=days_ago).customer_groups.add(group)
+        UserRollup.objects.create(day=timezone.localdate() - timedelta(days=20), dimension='all', users=99)
+
+        output = StringIO()
+        call_command('backfill_user_rollups', chunk_days=7, workers=1, stdout=output)
+
+        self.assertIn('chunks', output.getvalue())
+        self.assertEqual(self.rollup(40), (2, 0, 0))
+        self.assertEqual(self.rollup(40, 'customer_group', str(group.pk)), (2, 0, 0))
+        self.assertIsNone(self.rollup(20))
+
+    def test_schedule_restarts_a_broken_chain(self):
+        """Test de reprogramación del refresco periódico"""
+        Job.objects.create(name='users.refresh_user_rollups', status='failed')
+
+        call_command('refresh_user_rollups', schedule=True, stdout=StringIO())
+        call_command('refresh_user_rollups', schedule=True, stdout=StringIO())
+        self.assertEqual(Job.objects.filter(name='users.refresh_user_rollups', status='pending').count(), 1)
+
+        with mock.patch('apps.users.tasks.refresh_rollups', side_effect=ValueError('boom')):
+            Job.objects.update(max_attempts=1)
+            with self.assertLogs('apps.users.jobs', 'ERROR'):
+                self.assertEqual(jobs.run_pending('worker'), (0, 1))
+        next_run = Job.objects.get(name='users.refresh_user_rollups', status='pending')
+        self.assertGreater(next_run.run_at, timezone.now())
+
+
+class RollupAPITest(RollupTestMixin, APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.force_authenticate(user=admin)
+        self.group = CustomerGroup.objects.create(name='Gold')
+        for index in range(4):
+            user = self.create_user(f'user{index}', days_ago=index % 2, is_verified=index < 3)
+            user.customer_groups.add(self.group)
+        refresh_rollups()
+
+    def test_signups_chart(self):
+        """Test de la serie diaria de registros"""
+        response = self.client.get(reverse('users:analytics-signups'), {'start': timezone.localdate() - timedelta(days=6)})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {row['day']: row for row in response.data['results']}
+        today = results[timezone.localdate().isoformat()]
+        self.assertEqual((today['users'], today['verified']), (3, 2))
+        self.assertEqual(today['verification_rate'], 0.6667)
+
+        invalid = self.client.get(reverse('users:analytics-signups'), {'start': '2026-13-01'})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_group_sizes(self):
+        """Test de tamaños de grupos de clientes"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('users:analytics-customer-groups'))
+
+        self.assertEqual(response.data['results'], [{
+            'id': self.group.pk, 'name': 'Gold', 'users': 4, 'verified': 3, 'accepts_marketing': 0,
+        }])
@@ -0,0 +1,113 @@
+# apps/users/tests/test_search.py
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.models import Address
+from apps.users.search import DatabaseSearchBackend, SQLiteFTSSearchBackend, get_search_backend
+
+User = get_user_model()
+
+class SearchIndexTest(TestCase):
+
+    def setUp(self):
+        self.backend = get_search_backend()
+        self.user = User.objects.create_user(
+            username='jdoe',
+            email='john.doe@example.com',
+            password='testpass123',
+            first_name='John',
+            last_name='Doe',
+            phone='+1 555-123-4567'
+        )
+
+    def test_index_tracks_user_changes(self):
+        """Test de indexación incremental de usuarios"""
+        self.assertEqual(self.backend.search('john', limit=10), [self.user.pk])
+        self.assertEqual(self.backend.search('15551234567', limit=10), [self.user.pk])
+
+        self.user.first_name = 'Johnny'
+        self.user.save()
+        self.assertEqual(self.backend.search('johnny', limit=10), [self.user.pk])
+
+        user_pk = self.user.pk
+        self.user.delete()
+        self.assertEqual(self.backend.search('doe', limit=10), [])
+        self.assertNotIn(user_pk, self.backend.search('john', limit=10))
+
+    def test_index_includes_addresses(self):
+        """Test de búsqueda por ciudad y código postal"""
+        Address.objects.create(
+            user=self.user,
+            street_address='123 Test St',
+            city='Springfield',
+            state='IL',
+            postal_code=62701,
+            country='US'
+        )
+
+        self.assertEqual(self.backend.search('springfield', limit=10), [self.user.pk])
+        self.assertEqual(self.backend.search('62701', limit=10), [self.user.pk])
+
+    def test_backends_match_the_same_columns(self):
+        """Test de resultados iguales con y sin índice"""
+        self.user.addresses.create(
+            street_address='123 Test St',
+            city='Springfield',
+            state='IL',
+            postal_code=62701,
+            country='US'
+        )
+
+        for query in ['john', 'springfield', '62701', '627', '15551234567', '555', 'john 62701', 'nobody']:
+            self.assertEqual(
+                DatabaseSearchBackend().search(query, limit=10),
+                SQLiteFTSSearchBackend().search(query, limit=10),
+                query
+            )
+
+    def test_rebuild(self):
+        """Test de reconstrucción del índice"""
+        self.backend.clear()
+        self.assertEqual(self.backend.count('john'), 0)
+
+        self.assertEqual(self.backend.rebuild(chunk_size=1), 1)
+        self.assertEqual(self.backend.count('john'), 1)
+
+class UserSearchAPITest(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        for index in range(3):
+            User.objects.create_user(
+                username=f'smith{index}',
+                email=f'smith{index}@example.com',
+                password='testpass123',
+                last_name='Smith'
+            )
+        self.url = reverse('users:user-search')
+
+    def test_search_is_paginated(self):
+        """Test de búsqueda paginada"""
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(self.url, {'q': 'smith', 'page_size': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_search_requires_admin(self):
+        """Test de búsqueda sin permisos de admin"""
+        user = User.objects.get(username='smith0')
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get(self.url, {'q': 'smith'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
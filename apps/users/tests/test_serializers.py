@@ -1,10 +1,14 @@
 # apps/users/tests/test_serializers.py
+from django.db import connections
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from apps.users.models import OutboxEvent, UserProfile
 from apps.users.serializers import (
     UserSerializer, 
     UserRegistrationSerializer,
+    UserUpdateSerializer,
     ChangePasswordSerializer,
     AddressSerializer
 )
@@ -114,4 +118,50 @@ class ChangePasswordSerializerTest(TestCase):
         
         serializer = ChangePasswordSerializer(data=data)
         self.assertFalse(serializer.is_valid())
-        self.assertIn('new_password_confirm', serializer.errors)
\ No newline at end of file
+        self.assertIn('new_password_confirm', serializer.errors)
+
+class UserUpdateSerializerTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            first_name='Test',
+            last_name='User',
+            password='testpass123'
+        )
+        UserProfile.objects.create(user=self.user, bio='Hello')
+
+    def update(self, data):
+        user = User.objects.select_related('profile').get(pk=self.user.pk)
+        serializer = UserUpdateSerializer(user, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connections[user._state.db]) as queries:
+            serializer.save()
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+
+    def test_unchanged_values_skip_the_write(self):
+        """Test de actualización sin cambios"""
+        updated_at = self.user.updated_at
+
+        updates = self.update({'first_name': 'Test', 'profile': {'bio': 'Hello'}})
+
+        self.assertEqual(updates, [])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.updated_at, updated_at)
+        self.assertFalse(OutboxEvent.objects.filter(topic='user.profile_updated').exists())
+
+    def test_only_changed_columns_are_written(self):
+        """Test de escritura limitada a las columnas modificadas"""
+        updates = self.update({'first_name': 'Changed', 'last_name': 'User', 'profile': {'bio': 'Bye'}})
+
+        self.assertEqual(len(updates), 2)
+        self.assertIn('"first_name"', updates[0])
+        self.assertIn('"updated_at"', updates[0])
+        self.assertNotIn('"last_name"', updates[0])
+        self.assertNotIn('"website"', updates[1])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Changed')
+        self.assertEqual(self.user.profile.bio, 'Bye')
+        event = OutboxEvent.objects.get(topic='user.profile_updated')
+        self.assertEqual(event.payload['fields'], ['bio'])
@@ -0,0 +1,201 @@
+# apps/users/tests/test_sharding.py
+import unittest
+from collections import Counter
+from unittest import mock
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from apps.users import sharding
+from apps.users.models import Address, OutboxEvent, ShardDirectory, UserProfile
+
+User = get_user_model()
+
+SHARDS = ['default', 'users_shard_1', 'users_shard_2']
+
+
+@override_settings(USER_SHARDS=SHARDS)
+class ShardRoutingTest(SimpleTestCase):
+
+    def test_shard_is_stable_and_balanced(self):
+        """Test de asignación estable y repartida de shards"""
+        placement = [sharding.shard_for(user_id) for user_id in range(1, 3001)]
+
+        self.assertEqual(placement, [sharding.shard_for(user_id) for user_id in range(1, 3001)])
+        self.assertEqual(sharding.shard_for(42), sharding.shard_for('42'))
+        counts = Counter(placement)
+        self.assertEqual(set(counts), set(SHARDS))
+        self.assertTrue(all(800 < count < 1200 for count in counts.values()))
+
+    def test_router_follows_the_owner(self):
+        """Test de enrutamiento por usuario propietario"""
+        router = sharding.UserShardRouter()
+        user = User(pk=7)
+        address = Address(user_id=7)
+
+        self.assertEqual(router.db_for_write(User, instance=user), sharding.shard_for(7))
+        self.assertEqual(router.db_for_read(Address, instance=address), sharding.shard_for(7))
+        self.assertEqual(router.db_for_read(Address, instance=user), sharding.shard_for(7))
+        self.assertEqual(router.db_for_read(ShardDirectory), 'default')
+        self.assertIsNone(router.db_for_read(User))
+        self.assertFalse(router.allow_migrate('users_shard_1', 'users', model_name='sharddirectory'))
+
+
+@override_settings(DATABASE_ROUTERS=['apps.users.sharding.UserShardRouter'])
+class ShardedUserTest(TestCase):
+    databases = '__all__'
+
+    def test_create_and_authenticate(self):
+        """Test de registro y login a través del directorio"""
+        user = sharding.create_user('test@example.com', 'testpass123', username='testuser')
+
+        entry = ShardDirectory.objects.get(email='test@example.com')
+        self.assertEqual(entry.pk, user.pk)
+        self.assertEqual(entry.shard, sharding.shard_for(user.pk))
+        self.assertEqual(UserProfile.objects.using(entry.shard).get(user_id=user.pk).user, user)
+        backend = sharding.ShardedModelBackend()
+        self.assertEqual(backend.authenticate(None, username='test@example.com', password='testpass123'), user)
+        self.assertIsNone(backend.authenticate(None, username='test@example.com', password='wrong'))
+        self.assertIsNone(backend.authenticate(None, username='other@example.com', password='testpass123'))
+
+    def test_registration_uses_the_directory(self):
+        """Test de registro por la API con id del directorio"""
+        response = self.client.post(reverse('users:user-register'), {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'strongpass123',
+            'password_confirm': 'strongpass123',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        entry = ShardDirectory.objects.get(email='new@example.com')
+        self.assertEqual(entry.shard, sharding.shard_for(entry.pk))
+        self.assertEqual(sharding.get_user(entry.pk).username, 'newuser')
+        self.assertTrue(UserProfile.objects.using(entry.shard).filter(user_id=entry.pk).exists())
+
+    def test_registration_commits_with_its_event(self):
+        """Test de registro revertido junto con su evento"""
+        data = {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'strongpass123',
+            'password_confirm': 'strongpass123',
+        }
+        with mock.patch('apps.users.serializers.emit', side_effect=DatabaseError('outbox down')):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('users:user-register'), data)
+
+        self.assertFalse(ShardDirectory.objects.exists())
+        self.assertFalse(any(User.objects.using(shard).exists() for shard in sharding.get_shards()))
+        response = self.client.post(reverse('users:user-register'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        entry = ShardDirectory.objects.get(email='new@example.com')
+        self.assertEqual(sharding.get_user(entry.pk).username, 'newuser')
+
+    def test_address_commits_with_its_event(self):
+        """Test de dirección revertida junto con su evento"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+
+        with mock.patch.object(OutboxEvent.objects, 'create', side_effect=DatabaseError('outbox down')):
+            with self.assertRaises(DatabaseError):
+                user.addresses.create(
+                    street_address='123 Main St', city='Springfield', state='IL',
+                    postal_code=62701, country='USA', is_default=True
+                )
+
+        self.assertFalse(user.addresses.exists())
+
+    def test_saves_keep_the_directory_in_step(self):
+        """Test de directorio actualizado al cambiar o borrar usuarios"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+
+        self.assertEqual(
+            set(ShardDirectory.objects.values_list('pk', 'email')),
+            {(user.pk, 'test@example.com'), (other.pk, 'other@example.com')}
+        )
+        user.email = 'changed@example.com'
+        user.save()
+        self.assertEqual(ShardDirectory.objects.get(pk=user.pk).email, 'changed@example.com')
+        self.assertEqual(sharding.get_user_by_email('changed@example.com'), user)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            other.email = 'changed@example.com'
+            other.save()
+        self.assertEqual(ShardDirectory.objects.get(pk=other.pk).email, 'other@example.com')
+
+        user.delete()
+        self.assertFalse(ShardDirectory.objects.filter(email='changed@example.com').exists())
+
+    def test_fanout_matches_single_query(self):
+        """Test de listado combinado ordenado"""
+        users = [
+            sharding.create_user(f'user{index}@example.com', 'testpass123', username=f'user{index}')
+            for index in range(6)
+        ]
+
+        merged = [user.pk for user in sharding.fanout(User.objects.all(), '-date_joined', limit=4)]
+
+        expected = sorted(users, key=lambda user: (user.date_joined, user.pk), reverse=True)[:4]
+        self.assertEqual(merged, [user.pk for user in expected])
+
+
+@unittest.skipUnless(len(settings.USER_SHARDS) > 1, 'run with USER_SHARD_COUNT > 1')
+class MultiShardTest(TestCase):
+    databases = '__all__'
+
+    def test_rows_live_on_the_owner_shard(self):
+        """Test de filas repartidas entre varias bases de datos"""
+        users = [
+            sharding.create_user(f'user{index}@example.com', 'testpass123', username=f'user{index}')
+            for index in range(12)
+        ]
+        for user in users:
+            user.addresses.create(
+                street_address='123 Main St', city='Springfield',
+                state='IL', postal_code=62701, country='USA'
+            )
+
+        for user in users:
+            shard = sharding.shard_for(user.pk)
+            self.assertEqual(user._state.db, shard)
+            self.assertEqual(user.addresses.count(), 1)
+            self.assertTrue(Address.objects.using(shard).filter(user_id=user.pk).exists())
+            self.assertEqual(sharding.get_user_by_email(user.email), user)
+        self.assertGreater(len({user._state.db for user in users}), 1)
+        merged = [user.pk for user in sharding.fanout(User.objects.all(), 'pk')]
+        self.assertEqual(merged, sorted(user.pk for user in users))
+
+
+@unittest.skipUnless(len(settings.USER_SHARDS) > 1, 'run with USER_SHARD_COUNT > 1')
+class FailedCommitTest(TransactionTestCase):
+    databases = '__all__'
+
+    def test_failed_directory_commit_removes_the_shard_rows(self):
+        """Test de usuario borrado del shard si falla el commit del directorio"""
+        user_id = next(pk for pk in range(10 ** 6, 10 ** 7) if sharding.shard_for(pk) != 'default')
+        allocate = lambda email: ShardDirectory.objects.create(pk=user_id, email=email).pk
+        default = connections['default']
+        commit = default.commit
+        failures = []
+
+        def commit_once_failing():
+            if not failures:
+                failures.append(True)
+                raise DatabaseError('commit failed')
+            return commit()
+
+        with mock.patch.object(sharding, 'allocate_user_id', allocate), \
+                mock.patch.object(default, 'commit', commit_once_failing):
+            with self.assertRaises(DatabaseError):
+                sharding.create_user('test@example.com', 'testpass123', username='testuser')
+
+        shard = sharding.shard_for(user_id)
+        self.assertFalse(User.objects.using(shard).filter(pk=user_id).exists())
+        self.assertFalse(UserProfile.objects.using(shard).filter(user_id=user_id).exists())
+        self.assertFalse(ShardDirectory.objects.exists())
+        user = sharding.create_user('test@example.com', 'testpass123', username='testuser')
+        self.assertEqual(sharding.get_user_by_email('test@example.com'), user)
@@ -0,0 +1,84 @@
+# apps/users/tests/test_verification.py
+from django.core import mail, signing
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users import jobs
+from apps.users.mail import send_messages, verification_message
+from apps.users.verification import make_token, read_token, verify_email
+
+User = get_user_model()
+
+class VerificationTokenTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_verify_email(self):
+        """Test de verificación con token firmado"""
+        token = make_token(self.user)
+
+        self.assertTrue(verify_email(token))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+        # Idempotent
+        self.assertTrue(verify_email(token))
+
+    def test_token_for_previous_email_is_rejected(self):
+        """Test de token inválido tras cambiar el email"""
+        token = make_token(self.user)
+        self.user.email = 'changed@example.com'
+        self.user.save()
+
+        self.assertFalse(verify_email(token))
+
+    @override_settings(EMAIL_VERIFICATION_MAX_AGE=-1)
+    def test_expired_token(self):
+        """Test de token expirado"""
+        with self.assertRaises(signing.SignatureExpired):
+            read_token(make_token(self.user))
+
+    def test_messages_share_one_connection(self):
+        """Test de envío por lotes"""
+        messages = [verification_message(self.user) for _ in range(5)]
+
+        self.assertEqual(send_messages(messages, batch_size=2), 5)
+        self.assertEqual(len(mail.outbox), 5)
+
+class VerificationAPITest(APITestCase):
+
+    def test_registration_sends_verification_email(self):
+        """Test de envío del email de verificación después del registro"""
+        data = {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'strongpass123',
+            'password_confirm': 'strongpass123',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('users:user-register'), data)
+        self.assertEqual(len(mail.outbox), 0)
+
+        jobs.run_pending('worker')
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        token = mail.outbox[0].body.split('token=')[1].strip()
+
+        response = self.client.post(reverse('users:verify-email'), {'token': token})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(email='new@example.com').is_verified)
+
+    def test_invalid_token(self):
+        """Test de verificación con token inválido"""
+        response = self.client.post(reverse('users:verify-email'), {'token': 'invalid'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('token', response.data)
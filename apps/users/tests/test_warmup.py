@@ -0,0 +1,29 @@
+# apps/users/tests/test_warmup.py
+import gc
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.contrib.auth import get_user_model
+from config.warmup import warm_up
+
+User = get_user_model()
+
+
+class WarmUpTest(SimpleTestCase):
+
+    def test_warm_up(self):
+        """Test de precarga de módulos, URLs y metadatos de modelos"""
+        User._meta.__dict__.pop('_forward_fields_map', None)
+        with mock.patch.object(gc, 'freeze') as freeze:
+            elapsed = warm_up()
+
+        self.assertGreaterEqual(elapsed, 0)
+        self.assertIn('_forward_fields_map', User._meta.__dict__)
+        freeze.assert_called_once_with()
+
+    def test_warm_up_without_freeze(self):
+        """Test de precarga sin gc.freeze"""
+        with mock.patch.object(gc, 'freeze') as freeze:
+            warm_up(freeze=False)
+
+        freeze.assert_not_called()
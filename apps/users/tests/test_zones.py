@@ -0,0 +1,153 @@
+# apps/users/tests/test_zones.py
+import random
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from apps.users import zones
+from apps.users.models import Address, ShippingZone, ShippingZoneRule, SnapshotVersion
+
+User = get_user_model()
+
+
+def random_rules(rng, count):
+    rules = []
+    for rule_id in range(1, count + 1):
+        start = rng.choice([None, rng.randrange(0, 1000)])
+        end = rng.choice([None, (start or 0) + rng.randrange(0, 300)])
+        rules.append(zones.ZoneRule.create(
+            rule_id, rng.randrange(1, 6), rng.choice(['USA', 'Canada']),
+            rng.choice(['', '', 'IL', 'CA']), start, end, rng.randrange(0, 3),
+        ))
+    return rules
+
+
+class ZoneIndexEquivalenceTest(SimpleTestCase):
+
+    def assert_matches_reference(self):
+        rng = random.Random(1234)
+        for _ in range(100):
+            rules = random_rules(rng, rng.randrange(0, 30))
+            index = zones.ZoneIndex('test', rules)
+            locations = [
+                (rng.choice(['USA', ' usa ', 'Canada', 'Mexico']), rng.choice(['IL', 'il', 'CA', 'NY']),
+                 rng.randrange(-10, 1400))
+                for _ in range(50)
+            ]
+            expected = [zones.resolve_reference(rules, *location) for location in locations]
+            self.assertEqual(index.resolve_many(locations), expected)
+            self.assertEqual([index.resolve(*location) for location in locations], expected)
+
+    def test_matches_naive_rule_loop(self):
+        """Test de equivalencia con la evaluación regla por regla"""
+        self.assert_matches_reference()
+
+    def test_matches_naive_rule_loop_without_numpy(self):
+        """Test de equivalencia sin NumPy"""
+        with mock.patch.object(zones, 'np', None):
+            self.assert_matches_reference()
+
+    def test_overlapping_rules(self):
+        """Test de prioridad entre reglas solapadas"""
+        rules = [
+            zones.ZoneRule.create(1, 10, 'USA', '', None, None, 0),
+            zones.ZoneRule.create(2, 20, 'USA', '', 60000, 62999, 0),
+            zones.ZoneRule.create(3, 30, 'USA', 'IL', 62000, 62999, 0),
+            zones.ZoneRule.create(4, 40, 'USA', '', 62700, 62710, 1),
+        ]
+        index = zones.ZoneIndex('test', rules)
+
+        self.assertEqual(index.resolve('USA', 'NY', 10001), 10)
+        self.assertEqual(index.resolve('USA', 'NY', 62701), 40)
+        self.assertEqual(index.resolve('USA', 'IN', 61000), 20)
+        self.assertEqual(index.resolve('usa', 'il', 62000), 30)
+        self.assertEqual(index.resolve('USA', 'IL', 62705), 40)
+        self.assertIsNone(index.resolve('Canada', 'ON', 62701))
+
+
+@override_settings(DATABASE_ROUTERS=[], USER_SHARDS=['default'])  # Query counts of one database.
+class AddressZoneCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.midwest = ShippingZone.objects.create(name='Midwest')
+        self.rule = ShippingZoneRule.objects.create(
+            zone=self.midwest, country='USA', postal_code_start=60000, postal_code_end=62999
+        )
+        self.address = self.user.addresses.create(
+            street_address='123 Main St',
+            city='Springfield',
+            state='IL',
+            postal_code=62701,
+            country='USA'
+        )
+
+    def test_zone_is_cached_on_address(self):
+        """Test de zona de envío guardada en la dirección"""
+        self.assertEqual(zones.zone_for_address(self.address), self.midwest.pk)
+
+        self.address.refresh_from_db()
+        self.assertEqual(self.address.shipping_zone_id, self.midwest.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(zones.zone_for_address(self.address), self.midwest.pk)
+
+    def test_rule_change_invalidates_cached_zones(self):
+        """Test de invalidación al cambiar las reglas"""
+        zones.zone_for_address(self.address)
+        west = ShippingZone.objects.create(name='West')
+        with self.captureOnCommitCallbacks(execute=True):
+            ShippingZoneRule.objects.create(zone=west, country='USA', state='IL', priority=1)
+
+        self.assertEqual(zones.zone_for_address(self.address), west.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            west.is_active = False
+            west.save()
+        self.assertEqual(zones.zone_for_address(self.address), self.midwest.pk)
+
+    def test_rule_change_in_another_process(self):
+        """Test de invalidación publicada por otro proceso"""
+        zones.zone_for_address(self.address)
+        # Another process: its save bumps the version row, not this process' cache.
+        ShippingZoneRule.objects.filter(pk=self.rule.pk).update(postal_code_end=60999)
+        SnapshotVersion.objects.filter(name='shipping-zones').update(version='from-another-process')
+
+        self.assertEqual(zones.zone_for_address(self.address), self.midwest.pk)
+        cache.clear()  # SNAPSHOT_VERSION_TTL elapsed.
+        self.assertIsNone(zones.zone_for_address(self.address))
+        self.address.refresh_from_db()
+        self.assertEqual(self.address.shipping_zone_version, 'from-another-process')
+
+    def test_location_change_clears_cached_zone(self):
+        """Test de invalidación al cambiar la dirección"""
+        zones.zone_for_address(self.address)
+
+        self.address.postal_code = 10001
+        self.address.save(update_fields=['postal_code'])
+        self.address.refresh_from_db()
+        self.assertEqual(self.address.shipping_zone_version, '')
+        self.assertIsNone(zones.zone_for_address(self.address))
+
+        self.address.delivery_instructions = 'Leave at the door'
+        self.address.save(update_fields=['delivery_instructions'])
+        self.address.refresh_from_db()
+        self.assertNotEqual(self.address.shipping_zone_version, '')
+
+    def test_batch_resolution(self):
+        """Test de resolución de muchas direcciones a la vez"""
+        other = self.user.addresses.create(
+            street_address='1 Broadway', city='New York', state='NY', postal_code=10004, country='USA'
+        )
+        addresses = list(Address.objects.filter(user=self.user).order_by('pk'))
+
+        with self.assertNumQueries(2):
+            # Loading the rules, then one bulk update of the cached zones.
+            self.assertEqual(zones.resolve_addresses(addresses), [self.midwest.pk, None])
+        other.refresh_from_db()
+        self.assertEqual(other.shipping_zone_version, zones.zones_version())
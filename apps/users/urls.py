@@ -5,10 +5,21 @@ app_name = 'users'
 
 urlpatterns = [
     path('', views.UserListView.as_view(), name='user-list'),
+    path('search/', views.UserSearchView.as_view(), name='user-search'),
+    path('lookup/phone/', views.UserPhoneLookupView.as_view(), name='user-phone-lookup'),
+    path('changes/', views.ChangeFeedView.as_view(), name='user-changes'),
+    path('analytics/signups/', views.SignupRollupView.as_view(), name='analytics-signups'),
+    path('analytics/customer-groups/', views.CustomerGroupSizeView.as_view(), name='analytics-customer-groups'),
     path('me/', views.UserMeView.as_view(), name='user-me'),
+    path('me/export/', views.DataExportView.as_view(), name='data-export'),
+    path('me/exports/<int:pk>/', views.DataExportDetailView.as_view(), name='data-export-detail'),
+    path('me/exports/<int:pk>/download/', views.DataExportDownloadView.as_view(), name='data-export-download'),
     path('register/', views.UserRegistrationView.as_view(), name='user-register'),
     path('change-password/', views.ChangePasswordView.as_view(), name='change-password'),
+    path('verify-email/', views.VerifyEmailView.as_view(), name='verify-email'),
+    path('verify-email/resend/', views.ResendVerificationEmailView.as_view(), name='resend-verification-email'),
     path('addresses/', views.AddressListView.as_view(), name='address-list'),
     path('addresses/<int:pk>/', views.AddressDetailView.as_view(), name='address-detail'),
     path('addresses/<int:pk>/set-default/', views.SetDefaultAddressView.as_view(), name='set-default-address'),
+    path('segments/<int:pk>/members/', views.SegmentMemberListView.as_view(), name='segment-members'),
 ] 
\ No newline at end of file
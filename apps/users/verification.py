@@ -0,0 +1,49 @@
+"""
+Stateless email verification tokens.
+
+Tokens are signed with SECRET_KEY and carry the user id, the email being
+verified and a timestamp, so nothing is stored in the database. A token stops
+working when it expires or once the user changes their email.
+"""
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .changefeed import record_changes
+from .models import User
+from .sharding import shard_for
+
+TOKEN_SALT = 'apps.users.email-verification'
+
+
+def make_token(user):
+    return signing.dumps({'u': user.pk, 'e': user.email}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    """Return (user_id, email). Raises signing.BadSignature (or SignatureExpired)."""
+    data = signing.loads(token, salt=TOKEN_SALT, max_age=settings.EMAIL_VERIFICATION_MAX_AGE)
+    return data['u'], data['e']
+
+
+def verify_email(token):
+    """
+    Mark the token's user as verified with a single conditional UPDATE.
+
+    Returns True when the email is verified (now or already). Raises
+    signing.BadSignature for invalid or expired tokens.
+    """
+    user_id, email = read_token(token)
+    users = User.objects.using(shard_for(user_id))
+    updated = users.filter(pk=user_id, email=email, is_verified=False).update(
+        is_verified=True,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        record_changes('user', [user_id])
+        return True
+    return users.filter(pk=user_id, email=email, is_verified=True).exists()
+
+
+def verification_url(user):
+    return settings.EMAIL_VERIFICATION_URL.format(token=make_token(user))
@@ -0,0 +1,39 @@
+"""
+Versions of the in-process snapshots (customer group catalog, shipping zones).
+
+The version of a snapshot is a row in SnapshotVersion, so a change saved by
+any process is seen by all of them. Reading it on every lookup would cost a
+query, so each process keeps it in the cache for SNAPSHOT_VERSION_TTL
+seconds: with a per-process cache, other processes pick a change up within
+that delay. Versions are random, never reused: a bump rolled back with its
+transaction can not be mistaken for a later one.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import SnapshotVersion
+
+
+def cache_key(name):
+    return f'users:snapshot-version:{name}'
+
+
+def get_version(name):
+    version = cache.get(cache_key(name))
+    if version is None:
+        version = SnapshotVersion.objects.filter(name=name).values_list('version', flat=True).first()
+        if version is None:
+            entry, _ = SnapshotVersion.objects.get_or_create(name=name, defaults={'version': uuid.uuid4().hex})
+            version = entry.version
+        cache.set(cache_key(name), version, settings.SNAPSHOT_VERSION_TTL)
+    return version
+
+
+def bump_version(name):
+    """Publish a new version; this process sees it at once, the others within SNAPSHOT_VERSION_TTL."""
+    version = uuid.uuid4().hex
+    SnapshotVersion.objects.update_or_create(name=name, defaults={'version': version})
+    cache.set(cache_key(name), version, settings.SNAPSHOT_VERSION_TTL)
+    return version
@@ -1,17 +1,62 @@
+from datetime import timedelta
+
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from django.conf import settings
+from django.core import signing
 from django.contrib.auth import get_user_model
-from .models import Address
-from .serializers import UserSerializer, UserRegistrationSerializer, ChangePasswordSerializer, AddressSerializer
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Address, DataExport, SegmentMember, UserRollup
+from .changefeed import InvalidCheckpoint, read_changes
+from .dedupe import find_duplicate
+from .groups import get_catalog
+from .idempotency import idempotent
+from .exports import (
+    current_export, current_exports, download_response, needs_background, request_export, streaming_export_response,
+)
+from .mail import queue_verification_email
+from .search import SearchResults
+from .sharding import fanout
+from .verification import verify_email
+from .serializers import UserSerializer, UserRegistrationSerializer, ChangePasswordSerializer, AddressSerializer, UserListSerializer, SegmentMemberSerializer, VerifyEmailSerializer, DataExportSerializer, UserRollupSerializer
 
 User = get_user_model()
 
 class UserListView(generics.ListAPIView):
-    queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
 
+    def get_queryset(self):
+        # Users of every shard, merged in id order.
+        return list(fanout(User.objects.select_related('profile'), 'pk'))
+
+class UserSearchPagination(PageNumberPagination):
+    page_size = settings.USER_SEARCH_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class UserSearchView(generics.ListAPIView):
+    """Ranked full-text search over users, for support tools (?q=...)"""
+    serializer_class = UserListSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = UserSearchPagination
+
+    def get_queryset(self):
+        return SearchResults(self.request.query_params.get('q', ''))
+
+class UserPhoneLookupView(generics.ListAPIView):
+    """Users with a phone number in any notation, for support tools and SMS flows (?phone=...)"""
+    serializer_class = UserListSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = None
+
+    def get_queryset(self):
+        return list(fanout(User.objects.with_phone(self.request.query_params.get('phone', '')), 'pk'))
+
 class UserMeView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
@@ -24,6 +69,10 @@ class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = []
 
+    def create(self, request, *args, **kwargs):
+        # Retries with the same Idempotency-Key replay the first response.
+        return idempotent(request, 'register', lambda: super(UserRegistrationView, self).create(request, *args, **kwargs))
+
 class ChangePasswordView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ChangePasswordSerializer
@@ -41,32 +90,216 @@ class ChangePasswordView(generics.GenericAPIView):
         user.save()
         return Response(status=status.HTTP_200_OK)
 
+class VerifyEmailView(generics.GenericAPIView):
+    permission_classes = []
+    serializer_class = VerifyEmailSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            verified = verify_email(serializer.validated_data['token'])
+        except signing.SignatureExpired:
+            return Response({"token": ["The verification link has expired"]}, status=status.HTTP_400_BAD_REQUEST)
+        except signing.BadSignature:
+            verified = False
+        if not verified:
+            return Response({"token": ["Invalid verification link"]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_200_OK)
+
+class ResendVerificationEmailView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.is_verified:
+            return Response({"detail": "The email is already verified"}, status=status.HTTP_400_BAD_REQUEST)
+        queue_verification_email(request.user)
+        return Response(status=status.HTTP_202_ACCEPTED)
+
 class AddressListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = AddressSerializer
+    reused = False
 
     def get_queryset(self):
-        return Address.objects.filter(user=self.request.user)
+        return self.request.user.addresses.active()
+
+    def create(self, request, *args, **kwargs):
+        return idempotent(request, 'address-create', lambda: self.create_address(request, *args, **kwargs))
+
+    def create_address(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if self.reused:
+            response.status_code = status.HTTP_200_OK
+        return response
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        existing = find_duplicate(self.request.user, serializer.validated_data)
+        if existing is None:
+            serializer.save(user=self.request.user)
+            return
+        # Same address and type as an active one (fingerprint index lookup): reuse it.
+        self.reused = True
+        changed = []
+        if serializer.validated_data.get('is_default') and not existing.is_default:
+            existing.is_default = True
+            changed.append('is_default')
+        instructions = serializer.validated_data.get('delivery_instructions')
+        if instructions and instructions != existing.delivery_instructions:
+            existing.delivery_instructions = instructions
+            changed.append('delivery_instructions')
+        if changed:
+            existing.save(update_fields=[*changed, 'updated_at'])
+        serializer.instance = existing
 
 class AddressDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = AddressSerializer
 
     def get_queryset(self):
-        return Address.objects.filter(user=self.request.user)
+        return self.request.user.addresses.active()
+
+    def perform_destroy(self, instance):
+        instance.archive()
 
 class SetDefaultAddressView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = AddressSerializer
 
     def get_queryset(self):
-        return Address.objects.filter(user=self.request.user)
+        return self.request.user.addresses.active()
 
     def update(self, request, *args, **kwargs):
         address = self.get_object()
         address.is_default = True
         address.save()
-        return Response(self.get_serializer(address).data)
\ No newline at end of file
+        return Response(self.get_serializer(address).data)
+
+class ChangeFeedView(generics.GenericAPIView):
+    """Users, profiles and addresses changed after an opaque checkpoint (?checkpoint=&limit=)"""
+    permission_classes = [IsAdminUser]
+    max_limit = 1000
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', 500)), self.max_limit)
+        except ValueError:
+            return Response({"limit": ["A valid integer is required"]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            changes, checkpoint, has_more = read_changes(request.query_params.get('checkpoint'), max(limit, 1))
+        except InvalidCheckpoint:
+            return Response({"checkpoint": ["Invalid checkpoint"]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'changes': changes,
+            'checkpoint': checkpoint,
+            'has_more': has_more,
+        })
+
+class DataExportView(generics.GenericAPIView):
+    """Zip archive of the user's data: GET streams it when small, POST builds it in the background"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = DataExportSerializer
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        if not needs_background(user):
+            return streaming_export_response(user)
+        # Large accounts: report the current export, never start one on a GET.
+        export = current_export(user)
+        if export is None:
+            return Response(
+                {"detail": "This export is too large to stream; request it with POST"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(self.get_serializer(export).data, status=self.export_status(export))
+
+    def post(self, request, *args, **kwargs):
+        export, _ = request_export(request.user)
+        return Response(self.get_serializer(export).data, status=self.export_status(export))
+
+    def export_status(self, export):
+        return status.HTTP_200_OK if export.status == 'ready' else status.HTTP_202_ACCEPTED
+
+class DataExportDetailView(generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = DataExportSerializer
+
+    def get_queryset(self):
+        return DataExport.objects.filter(user=self.request.user)
+
+class DataExportDownloadView(generics.GenericAPIView):
+    """Download of a finished export; supports Range requests to resume"""
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return current_exports().filter(user=self.request.user, status='ready').select_related('user')
+
+    def get(self, request, *args, **kwargs):
+        return download_response(request, self.get_object())
+
+class SignupRollupView(generics.GenericAPIView):
+    """Daily signups, verification and marketing opt-in, read from the rollups (?start=&end=&group=)"""
+    permission_classes = [IsAdminUser]
+    serializer_class = UserRollupSerializer
+    default_days = 30
+    max_days = 731
+
+    def get(self, request, *args, **kwargs):
+        try:
+            end = parse_date(request.query_params.get('end', '')) or timezone.localdate()
+            start = parse_date(request.query_params.get('start', '')) or end - timedelta(days=self.default_days - 1)
+        except ValueError:
+            return Response({"date": ["Dates must be YYYY-MM-DD"]}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end or (end - start).days >= self.max_days:
+            return Response({"date": ["Invalid date range"]}, status=status.HTTP_400_BAD_REQUEST)
+        group = request.query_params.get('group')
+        rollups = UserRollup.objects.filter(
+            dimension='customer_group' if group else 'all',
+            value=group or '',
+            day__gte=start,
+            day__lte=end,
+        ).order_by('day')
+        return Response({
+            'start': start,
+            'end': end,
+            'results': self.get_serializer(rollups, many=True).data,
+        })
+
+class CustomerGroupSizeView(generics.GenericAPIView):
+    """Members of each customer group, summed from the rollups"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        totals = (
+            UserRollup.objects.filter(dimension='customer_group')
+            .values('value')
+            .annotate(users=Sum('users'), verified=Sum('verified'), accepts_marketing=Sum('accepts_marketing'))
+            .order_by('value')
+        )
+        catalog = get_catalog()
+        results = []
+        for row in totals:
+            group = catalog.get(int(row['value']))
+            results.append({
+                'id': int(row['value']),
+                'name': group.name if group else None,
+                'users': row['users'],
+                'verified': row['verified'],
+                'accepts_marketing': row['accepts_marketing'],
+            })
+        return Response({'results': results})
+
+class SegmentMemberPagination(CursorPagination):
+    ordering = 'user_id'
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+
+class SegmentMemberListView(generics.ListAPIView):
+    """Materialized members of a marketing segment, in opaque cursor pages"""
+    serializer_class = SegmentMemberSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = SegmentMemberPagination
+
+    def get_queryset(self):
+        return SegmentMember.objects.filter(segment_id=self.kwargs['pk']).select_related('user')
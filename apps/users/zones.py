@@ -0,0 +1,240 @@
+"""
+Shipping zone resolution.
+
+ShippingZoneRule rows can overlap, so evaluating them per address means
+scanning every rule of the country. Instead every process compiles the rules
+into one table per (country, state): the sorted start points of disjoint
+postal code intervals and the winning zone of each interval. A lookup is a
+dict get and a binary search; resolve_many() groups addresses by table and
+searches all their postal codes at once (numpy.searchsorted when NumPy is
+installed, bisect otherwise).
+
+Like the customer group catalog (groups.py) the compiled index is tagged
+with a version stored in the database (versions.py), bumped when a zone or
+rule changes, and every process rebuilds its index once it sees the new
+version. Addresses cache their zone together with that version, so all
+processes agree on which cached zones are current: a rule change makes
+every cached zone stale and a location change of the address clears it.
+`resolve_reference` is the naive rule loop the index is tested against.
+"""
+import heapq
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from .models import Address, ShippingZoneRule
+from .normalization import normalize_text
+from .versions import bump_version, get_version
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+ZONES_VERSION_NAME = 'shipping-zones'
+
+# Open postal code bounds; well outside the IntegerField range.
+LOWEST = -(2 ** 62)
+HIGHEST = 2 ** 62
+
+NO_ZONE = 0
+
+
+@dataclass(frozen=True)
+class ZoneRule:
+    id: int
+    zone_id: int
+    country: str
+    state: str
+    start: int
+    end: int
+    priority: int
+
+    @classmethod
+    def create(cls, id, zone_id, country, state, start, end, priority):
+        return cls(
+            id, zone_id, normalize_text(country), normalize_text(state),
+            LOWEST if start is None else start, HIGHEST if end is None else end, priority,
+        )
+
+    def rank(self):
+        """Sort key of the rules covering a postal code; the smallest one wins."""
+        return (-self.priority, 0 if self.state else 1, self.end - self.start, self.id)
+
+    def matches(self, country, state, postal_code):
+        return (
+            self.country == country
+            and (not self.state or self.state == state)
+            and self.start <= postal_code <= self.end
+        )
+
+
+class ZoneTable:
+    """Disjoint postal code intervals of one (country, state): starts[i] up to starts[i + 1] is zones[i]."""
+
+    def __init__(self, starts, zones):
+        self.starts = starts
+        self.zones = zones
+        if np is not None:
+            self.starts_array = np.asarray(starts, dtype=np.int64)
+            self.zones_array = np.asarray(zones, dtype=np.int64)
+
+    @classmethod
+    def compile(cls, rules):
+        """Flatten overlapping rules with a sweep over their start and end points."""
+        points = sorted({rule.start for rule in rules} | {rule.end + 1 for rule in rules})
+        pending = sorted(rules, key=lambda rule: rule.start)
+        active = []
+        starts = []
+        zones = []
+        index = 0
+        for point in points:
+            while index < len(pending) and pending[index].start <= point:
+                rule = pending[index]
+                heapq.heappush(active, (rule.rank(), rule.end, rule.zone_id))
+                index += 1
+            # Rules that ended are dropped once they reach the top.
+            while active and active[0][1] < point:
+                heapq.heappop(active)
+            zone_id = active[0][2] if active else NO_ZONE
+            if zones and zones[-1] == zone_id:
+                continue
+            starts.append(point)
+            zones.append(zone_id)
+        return cls(starts, zones)
+
+    def lookup(self, postal_code):
+        position = bisect_right(self.starts, postal_code) - 1
+        return self.zones[position] if position >= 0 else NO_ZONE
+
+    def lookup_many(self, postal_codes):
+        if not self.starts:
+            return [NO_ZONE] * len(postal_codes)
+        if np is not None:
+            positions = np.searchsorted(self.starts_array, np.asarray(postal_codes, dtype=np.int64), side='right') - 1
+            found = self.zones_array[np.maximum(positions, 0)]
+            return np.where(positions >= 0, found, NO_ZONE).tolist()
+        return [self.lookup(postal_code) for postal_code in postal_codes]
+
+
+class ZoneIndex:
+    """Immutable compiled rules, keyed by normalized (country, state); state '' is the country-wide table."""
+
+    def __init__(self, version, rules):
+        self.version = version
+        by_country = {}
+        for rule in rules:
+            by_country.setdefault(rule.country, []).append(rule)
+        tables = {}
+        for country, country_rules in by_country.items():
+            everywhere = [rule for rule in country_rules if not rule.state]
+            tables[(country, '')] = ZoneTable.compile(everywhere)
+            for state in {rule.state for rule in country_rules if rule.state}:
+                state_rules = [rule for rule in country_rules if rule.state == state]
+                tables[(country, state)] = ZoneTable.compile(everywhere + state_rules)
+        self.tables = MappingProxyType(tables)
+
+    def table(self, country, state):
+        country = normalize_text(country)
+        return self.tables.get((country, normalize_text(state))) or self.tables.get((country, ''))
+
+    def resolve(self, country, state, postal_code):
+        """Zone id of a location, or None."""
+        table = self.table(country, state)
+        if table is None:
+            return None
+        return table.lookup(int(postal_code)) or None
+
+    def resolve_many(self, locations):
+        """Zone ids (or None) of many (country, state, postal_code) tuples, in order."""
+        positions_by_table = {}
+        tables = {}
+        for position, (country, state, postal_code) in enumerate(locations):
+            # Locations repeat a handful of countries and states: normalize each pair once.
+            if (country, state) not in tables:
+                tables[(country, state)] = self.table(country, state)
+            table = tables[(country, state)]
+            if table is not None:
+                positions_by_table.setdefault(id(table), (table, [], []))
+                _, positions, postal_codes = positions_by_table[id(table)]
+                positions.append(position)
+                postal_codes.append(int(postal_code))
+        zones = [None] * len(locations)
+        for table, positions, postal_codes in positions_by_table.values():
+            for position, zone_id in zip(positions, table.lookup_many(postal_codes)):
+                zones[position] = zone_id or None
+        return zones
+
+
+def resolve_reference(rules, country, state, postal_code):
+    """Naive implementation of ZoneIndex.resolve: every rule is checked (slow, for tests and benchmarks)."""
+    country, state, postal_code = normalize_text(country), normalize_text(state), int(postal_code)
+    best = None
+    for rule in rules:
+        if rule.matches(country, state, postal_code) and (best is None or rule.rank() < best.rank()):
+            best = rule
+    return best.zone_id if best is not None else None
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def zones_version():
+    return get_version(ZONES_VERSION_NAME)
+
+
+def invalidate_zones():
+    """Publish a new rules version; indexes and cached address zones become stale."""
+    bump_version(ZONES_VERSION_NAME)
+
+
+def load_rules():
+    return [
+        ZoneRule.create(*row) for row in ShippingZoneRule.objects.filter(zone__is_active=True).values_list(
+            'id', 'zone_id', 'country', 'state', 'postal_code_start', 'postal_code_end', 'priority'
+        )
+    ]
+
+
+def get_zone_index():
+    global _index
+    version = zones_version()
+    index = _index
+    if index is not None and version is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or version is None or _index.version != version:
+            _index = ZoneIndex(version, load_rules())
+        return _index
+
+
+def resolve_addresses(addresses):
+    """
+    Shipping zone id (or None) of each address, in order.
+
+    Addresses with a current cached zone are answered from it; the others are
+    resolved in one batch and their cache is written with one bulk update.
+    """
+    index = get_zone_index()
+    addresses = list(addresses)
+    stale = [address for address in addresses if address.shipping_zone_version != index.version]
+    if stale:
+        zone_ids = index.resolve_many([(address.country, address.state, address.postal_code) for address in stale])
+        for address, zone_id in zip(stale, zone_ids):
+            address.shipping_zone_id = zone_id
+            address.shipping_zone_version = index.version
+        by_database = {}
+        for address in stale:
+            if address.pk is not None:
+                by_database.setdefault(address._state.db or 'default', []).append(address)
+        for database, rows in by_database.items():
+            Address.objects.using(database).bulk_update(
+                rows, ['shipping_zone', 'shipping_zone_version'], batch_size=1000
+            )
+    return [address.shipping_zone_id for address in addresses]
+
+
+def zone_for_address(address):
+    return resolve_addresses([address])[0]
@@ -0,0 +1,45 @@
+"""
+Path-scoped versions of the browser-oriented middleware.
+
+The API (everything except FULL_MIDDLEWARE_PATHS) authenticates with JWT and
+never uses sessions, CSRF cookies or messages, so these middleware are
+skipped for it and only run on the paths that need them (the admin). They
+subclass the stock classes, so Django's system checks still recognise them.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+
+def uses_full_stack(request):
+    return request.path_info.startswith(tuple(settings.FULL_MIDDLEWARE_PATHS))
+
+
+class PathScopedMixin:
+
+    def __call__(self, request):
+        if not uses_full_stack(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class ScopedSessionMiddleware(PathScopedMixin, SessionMiddleware):
+    pass
+
+
+class ScopedCsrfViewMiddleware(PathScopedMixin, CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if not uses_full_stack(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class ScopedAuthenticationMiddleware(PathScopedMixin, AuthenticationMiddleware):
+    pass
+
+
+class ScopedMessageMiddleware(PathScopedMixin, MessageMiddleware):
+    pass
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -40,16 +41,20 @@ INSTALLED_APPS = [
     'apps.users.apps.UsersConfig'
 ]
 
+# Session, CSRF, auth and messages middleware only run on FULL_MIDDLEWARE_PATHS;
+# the JWT-authenticated API skips them (see config/middleware.py).
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'config.middleware.ScopedSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'config.middleware.ScopedCsrfViewMiddleware',
+    'config.middleware.ScopedAuthenticationMiddleware',
+    'config.middleware.ScopedMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+FULL_MIDDLEWARE_PATHS = ['/admin/']
+
 ROOT_URLCONF = 'config.urls'
 
 AUTH_USER_MODEL = 'users.User'
@@ -71,6 +76,24 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Worker warm-up (see config/warmup.py), run when the WSGI/ASGI application loads
+WARM_UP_ON_STARTUP = True
+
+WARM_UP_MODULES = [
+    'rest_framework.views',
+    'rest_framework.generics',
+    'rest_framework_simplejwt.authentication',
+    'rest_framework_simplejwt.views',
+    'apps.users.views',
+    'apps.users.tasks',
+]
+
+WARM_UP_SERIALIZER_MODULES = [
+    'apps.users.serializers',
+]
+
+WARM_UP_PATHS = ['/users/me/', '/token/']
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -82,6 +105,25 @@ DATABASES = {
     }
 }
 
+# Hash-sharded user storage (see apps/users/sharding.py). USER_SHARD_COUNT=3
+# spreads users over the default database and two more SQLite files.
+USER_SHARD_COUNT = int(os.environ.get('USER_SHARD_COUNT', 1))
+
+for index in range(1, USER_SHARD_COUNT):
+    DATABASES[f'users_shard_{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.users_shard_{index}.sqlite3',
+    }
+
+USER_SHARDS = ['default'] + [f'users_shard_{index}' for index in range(1, USER_SHARD_COUNT)]
+
+DATABASE_ROUTERS = ['apps.users.sharding.UserShardRouter'] if USER_SHARD_COUNT > 1 else []
+
+if USER_SHARD_COUNT > 1:
+    AUTHENTICATION_BACKENDS = ['apps.users.sharding.ShardedModelBackend']
+
+TEST_RUNNER = 'config.test_runner.ShardedDiscoverRunner' # Tests may query every shard.
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -102,6 +144,23 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Work factors come from PASSWORD_HASHER_PARAMETERS; tune them with
+# `manage.py calibrate_password_hashers`. Stored hashes with other parameters
+# are upgraded on the next successful login, and so are hashes of the stock
+# algorithms that follow (listed only to verify old hashes).
+PASSWORD_HASHERS = [
+    'apps.users.hashers.CalibratedPBKDF2PasswordHasher',
+    'apps.users.hashers.CalibratedScryptPasswordHasher',
+    'apps.users.hashers.CalibratedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+PASSWORD_HASHER_PARAMETERS = {
+    'pbkdf2_sha256': {'iterations': 1_000_000},
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -119,6 +178,19 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Media files (User uploads)
+
+MEDIA_URL = 'media/'
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads are always streamed to a temporary file instead of being kept in memory.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+AVATAR_MAX_UPLOAD_SIZE = 2 * 1024 * 1024 # 2 MB
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -127,13 +199,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.sharding.ShardedJWTAuthentication' if USER_SHARD_COUNT > 1
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# Email
+DEFAULT_FROM_EMAIL = 'TechMarket <no-reply@techmarket.local>'
+
+EMAIL_BATCH_SIZE = 100 # Messages sent per batch over one connection.
+
+EMAIL_VERIFICATION_MAX_AGE = 60 * 60 * 24 * 3 # 3 days
+
+EMAIL_VERIFICATION_URL = 'http://localhost:3000/verify-email?token={token}'
+
+# Addresses inactive for this long are moved to the archive table
+ADDRESS_ARCHIVE_AFTER_DAYS = 90
+
+ADDRESS_ARCHIVE_INTERVAL = 60 * 60 * 24 # Seconds between archival runs.
+
+# In-process snapshots (group catalog, shipping zones) check their version in
+# the database at most this often (apps/users/versions.py)
+SNAPSHOT_VERSION_TTL = 5
+
+# Idempotency-Key records (apps/users/idempotency.py), kept in the IdempotencyKey table
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+IDEMPOTENCY_LOCK_TIMEOUT = 30 # Seconds a running request holds its key.
+
+IDEMPOTENCY_WAIT_TIMEOUT = 10 # Seconds a duplicate waits for the running request.
+
+# Seconds between incremental refreshes of the analytics rollups
+USER_ROLLUP_INTERVAL = 60 * 5
+
+# Data exports above these sizes are built by a background job instead of streamed inline
+DATA_EXPORT_INLINE_MAX_ADDRESSES = 500
+
+DATA_EXPORT_INLINE_MAX_BYTES = 10 * 1024 * 1024 # Avatar size, in bytes.
+
+DATA_EXPORT_TTL_DAYS = 7 # Days a built export can be downloaded before purge_data_exports deletes it.
+
+# Accounts that never verified their email are purged after this many days
+UNVERIFIED_ACCOUNT_RETENTION_DAYS = 30
+
+# Change feed entries older than this are pruned (consumers must sync more often)
+CHANGE_LOG_RETENTION_DAYS = 30
+
+CHANGE_FEED_VISIBILITY_LAG = 5 # Seconds; longer than any transaction that writes to the feed.
+
+# Buffered last_login writes: flushed at most this many seconds after a login
+LOGIN_TRACKING_MAX_STALENESS = 60
+
+LOGIN_TRACKING_MAX_BUFFER = 1000 # Users buffered before an early flush.
+
+# Country code prepended to phones entered without one (normalization.normalize_phone)
+PHONE_DEFAULT_COUNTRY_CODE = '1'
+
+# Full-text user search backend (see apps/users/search.py)
+USER_SEARCH_BACKEND = 'apps.users.search.SQLiteFTSSearchBackend'
+
+USER_SEARCH_PAGE_SIZE = 25
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -148,4 +277,7 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # last_login is written in batches by apps/users/login_tracking.py instead.
+    'UPDATE_LAST_LOGIN': False,
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.users.serializers.LoginTokenObtainPairSerializer',
 }
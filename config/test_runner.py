@@ -0,0 +1,30 @@
+"""
+Test runner of the project.
+
+With USER_SHARD_COUNT > 1 users are stored on several databases (see
+apps/users/sharding.py), so every test case may query all of them; test
+cases that only declare the default database would fail on their first query
+to another shard. Logins buffered by the tests (login_tracking.py) are written
+before the test databases go away, not by the exit hook against the real ones.
+"""
+from django.conf import settings
+from django.test import TransactionTestCase
+from django.test.runner import DiscoverRunner
+from django.test.utils import iter_test_cases
+
+
+class ShardedDiscoverRunner(DiscoverRunner):
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        if len(settings.USER_SHARDS) > 1:
+            for test in iter_test_cases(suite):
+                if isinstance(test, TransactionTestCase):
+                    type(test).databases = '__all__'
+        return suite
+
+    def teardown_databases(self, old_config, **kwargs):
+        from apps.users.login_tracking import login_tracker
+
+        login_tracker.flush()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,67 @@
+"""
+Worker warm-up.
+
+Called from wsgi.py/asgi.py once the application is loaded. With a
+pre-forking server that loads the application in the master (e.g.
+``gunicorn --preload``) this runs once before fork: modules (and the
+declared fields of their serializer classes) are imported, URL resolver
+caches, resolved DRF settings and model _meta caches are built, and the
+resulting objects are moved to the permanent GC generation with gc.freeze(),
+so the garbage collector does not touch (and copy) those pages in the
+workers. Serializer field instances are not warmed: DRF builds them per
+serializer instance, so they would not outlive the warm-up.
+"""
+import gc
+import importlib
+import time
+
+from django.apps import apps
+from django.conf import settings
+
+
+def import_modules():
+    for module in [*settings.WARM_UP_MODULES, *settings.WARM_UP_SERIALIZER_MODULES]:
+        importlib.import_module(module)
+
+
+def build_url_caches():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for _, namespace_resolver in resolver.namespace_dict.values():
+        namespace_resolver.reverse_dict
+    for path in settings.WARM_UP_PATHS:
+        resolver.resolve(path)
+
+
+def build_framework_caches():
+    from rest_framework.settings import api_settings
+
+    # Resolves and imports the configured authentication/permission/renderer classes.
+    api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    api_settings.DEFAULT_PERMISSION_CLASSES
+    api_settings.DEFAULT_RENDERER_CLASSES
+    api_settings.DEFAULT_PARSER_CLASSES
+
+    # Field lookups cached on each model's Options, used by every query and ModelSerializer.
+    for model in apps.get_models():
+        opts = model._meta
+        opts.get_fields()
+        opts.concrete_fields
+        opts.local_concrete_fields
+        opts.related_objects
+        opts.fields_map
+        opts._forward_fields_map
+
+
+def warm_up(freeze=True):
+    """Warm the process up; returns the time it took in seconds."""
+    started = time.perf_counter()
+    import_modules()
+    build_url_caches()
+    build_framework_caches()
+    gc.collect()
+    if freeze:
+        gc.freeze()
+    return time.perf_counter() - started
@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+from apps.users.login_tracking import login_tracker
+
+login_tracker.start()
+
+if settings.WARM_UP_ON_STARTUP:
+    from config.warmup import warm_up
+
+    warm_up()